@@ -58,7 +58,6 @@ if __name__ == '__main__':
     #installFromGit(owner='ikibalin', repo='cryspy', branch='transition-to-version-0.2', egg='cryspy_0.2.0_beta')
     install(
         'cryspy',
-        'dictdiffer',
         'asteval',
         'pytest',
         'pytest_mock',
@@ -2,16 +2,25 @@
 #  Copyright (c) of the author (github.com/wardsimon)
 #  Created: 12/3/2020
 
+import copyreg
+import io
 import os, re
-from typing import Tuple, Optional
+import pickle
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Event
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple, Optional
 
 import cryspy
 import pycifstar
-from asteval import Interpreter
+import scipy.optimize
 from cryspy.cif_like.cl_crystal import Crystal
 from cryspy.cif_like.cl_pd import Pd, PdBackground, PdBackgroundL, PdInstrResolution, PdMeas, PdMeasL, PhaseL, Setup, \
     Chi2, DiffrnRadiation
 from cryspy.cif_like.cl_pd import Phase as cryspyPhase
+from cryspy.common.cl_data_constr import DataConstr
+from cryspy.common.cl_loop_constr import LoopConstr
 from cryspy.corecif.cl_atom_site import AtomSite, AtomSiteL
 from cryspy.corecif.cl_atom_site_aniso import AtomSiteAniso, AtomSiteAnisoL
 # Imports needed to create a phase
@@ -25,8 +34,12 @@ from easyInterface.Diffraction.DataClasses.DataObj.Calculation import *
 from easyInterface.Diffraction.DataClasses.DataObj.Experiment import *
 from easyInterface.Diffraction.DataClasses.PhaseObj.Phase import *
 from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base
+from easyInterface.Utils.CifTools import CifLoop, readLoop, readWithoutLoop
 from easyInterface.Utils.Helpers import time_it
+from easyInterface.Utils.MappingTools import MappingCache
+from easyInterface.Utils.RefineTools import RefinementCancelled
 from easyInterface.Diffraction import DEFAULT_FILENAMES
+from easyInterface import logger as logging
 # Version info
 cryspy_version = 'Undefined'
 try:
@@ -42,6 +55,401 @@ CALCULATOR_INFO = {
 PHASE_SEGMENT = "_samples"
 EXPERIMENT_SEGMENT = "_experiments"
 
+CALCULATION_EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor
+}
+
+# Mapping strings of crystal parameters contain this, see `CryspyCalculator._constraintsChanged`
+_CRYSTALS_MAPPING = '.crystals['
+
+# Number of steps per cell edge at which atom positions are taken to coincide
+SITE_RESOLUTION = 100000
+
+# Symmetry operators of the space groups by (it_number, it_coordinate_system_code), see `_symmetryOperators`
+_SYMMETRY_OPERATORS = {}
+
+
+def _symmetryOperators(space_group: cpSpaceGroup) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Full set of symmetry operators of a space group, centring included, as rotation matrices of shape (n, 3, 3) and
+    translations of shape (n, 3). Reading them from cryspy is slow, so they are kept for each space group setting.
+    """
+    key = (space_group.it_number, space_group.it_coordinate_system_code)
+    operators = _SYMMETRY_OPERATORS.get(key)
+    if operators is None:
+        symop = space_group.full_space_group_symop
+        rotations = np.array([[symop.r_11, symop.r_12, symop.r_13],
+                              [symop.r_21, symop.r_22, symop.r_23],
+                              [symop.r_31, symop.r_32, symop.r_33]], dtype=float).transpose(2, 0, 1)
+        translations = np.array([symop.b_1, symop.b_2, symop.b_3], dtype=float).T
+        operators = _SYMMETRY_OPERATORS[key] = (rotations, translations)
+    return operators
+
+
+def _restoreCryspyObj(cls: type, state: dict):
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+
+def _reduceCryspyObj(obj) -> tuple:
+    return _restoreCryspyObj, (type(obj), obj.__dict__)
+
+
+def _cryspyDispatchTable() -> dict:
+    """
+    cryspy loops and data blocks answer any unknown attribute (`__getstate__` included) with None, which breaks pickle.
+    This is the copyreg dispatch table with them pickled by their `__dict__` instead. The global table is not changed.
+    """
+    table = copyreg.dispatch_table.copy()
+    classes = [LoopConstr, DataConstr]
+    while classes:
+        cls = classes.pop()
+        table[cls] = _reduceCryspyObj
+        classes.extend(cls.__subclasses__())
+    return table
+
+
+def _dumps(obj: Any) -> bytes:
+    """
+    Pickle an object which may hold cryspy objects, see `_cryspyDispatchTable`
+    """
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = _cryspyDispatchTable()
+    pickler.dump(obj)
+    return buffer.getvalue()
+
+
+def _callPickled(payload: bytes) -> bytes:
+    """
+    Call a function in a worker process. The function with its arguments and the result are pickled by `_dumps`, so
+    cryspy objects can be sent to and from a process pool.
+
+    :param payload: pickled tuple of the function and its arguments
+    :return: pickled result
+    """
+    func, args = pickle.loads(payload)
+    return _dumps(func(*args))
+
+
+def _calcProfile(experiment: Pd, crystals: List[Crystal]) -> tuple:
+    """
+    Calculate the profile of a single experiment. This is a module level function so that it can be sent to a process
+    pool, which is why the internal objects cryspy stores on the experiment are returned as well.
+
+    :param experiment: cryspy experiment
+    :param crystals: cryspy crystals
+    :return: calculated pattern, calculated bragg peaks and the internal objects of the experiment
+    """
+    calculated_pattern, calculated_bragg_peaks, _ = experiment.calc_profile(np.array(experiment.meas.ttheta), crystals)
+    return calculated_pattern, calculated_bragg_peaks, getattr(experiment, '__internal_objs', None)
+
+
+class _SweepRoot:
+    """
+    Stands in for the calculator when resolving mappings in a worker process, which only receives the cryspy object
+    """
+
+    def __init__(self, cryspy_obj: RhoChi):
+        self._cryspy_obj = cryspy_obj
+
+
+def _reflectionsKey(experiment: Pd, crystals: List[Crystal]) -> tuple:
+    """
+    Everything apart from the measured range which the reflections (hkl) of an experiment depend on
+    """
+    key = [float(experiment.setup.wavelength)]
+    for label in experiment.phase.label:
+        for crystal in crystals:
+            if crystal.data_name == label:
+                cell = crystal.cell
+                key.append((id(crystal.space_group), float(cell.length_a), float(cell.length_b), float(cell.length_c),
+                            float(cell.angle_alpha), float(cell.angle_beta), float(cell.angle_gamma)))
+                break
+    return tuple(key)
+
+
+def _calcProcs(experiments: List[Pd], ttheta: List[np.ndarray], crystals: List[Crystal], reflections: list,
+               keep_reflections: bool = False):
+    """
+    Calculate the profile of each experiment at its measured points. The reflections of each experiment are reused
+    for as long as the cells and the wavelength do not change.
+
+    :param experiments: cryspy experiments
+    :param ttheta: measured points of each experiment
+    :param crystals: cryspy crystals
+    :param reflections: (key, peaks) of the previous calculation of each experiment, updated in place
+    :param keep_reflections: Reuse the reflections even if the cells have changed, as cryspy does while refining
+    :return: generator of the calculated profile (cryspy `PdProc`) of each experiment
+    """
+    for exp_index, (experiment, tth) in enumerate(zip(experiments, ttheta)):
+        last_key, peaks = reflections[exp_index]
+        key = last_key if keep_reflections and peaks is not None else _reflectionsKey(experiment, crystals)
+        if key != last_key:
+            peaks = None
+        # Skipping the internal objects only avoids creating python objects for every point and reflection
+        proc, peaks, _ = experiment.calc_profile(tth, crystals, l_peak_in=peaks, flag_internal=False)
+        reflections[exp_index] = (key, peaks)
+        yield proc
+
+
+def _calcPattern(experiments: List[Pd], ttheta: List[np.ndarray], crystals: List[Crystal], reflections: list,
+                 pattern: np.ndarray, keep_reflections: bool = False) -> np.ndarray:
+    """
+    Calculate the total intensity of all experiments at their measured points, see `_calcProcs`
+
+    :param pattern: array to hold the concatenated patterns of all experiments
+    :return: pattern
+    """
+    start = 0
+    for tth, proc in zip(ttheta, _calcProcs(experiments, ttheta, crystals, reflections, keep_reflections)):
+        stop = start + len(tth)
+        pattern[start:stop] = proc.get_numpy_intensity_up_total() + proc.get_numpy_intensity_down_total()
+        start = stop
+    return pattern
+
+
+def _calcResiduals(experiment: Pd, y_calc_up: np.ndarray, y_calc_down: np.ndarray) -> np.ndarray:
+    """
+    Weighted residuals (calculated - measured) / sigma of an experiment from its calculated pattern at the measured
+    points, with the range, excluded regions and polarised terms of `Pd.calc_chi_sq`
+
+    :param experiment: cryspy experiment
+    :param y_calc_up: calculated total intensity up at every measured point
+    :param y_calc_down: calculated total intensity down at every measured point
+    :return: the residuals of the points in the range and not excluded. Points where the residual is NaN do not
+             count to chi squared.
+    """
+    meas = experiment.meas
+    tth = np.array(meas.ttheta, dtype=np.float64)
+    cond = np.ones(tth.shape, dtype=bool)
+    range_ = experiment.range
+    if range_ is not None:
+        cond &= (tth >= float(range_.ttheta_min)) & (tth <= float(range_.ttheta_max))
+    exclude = experiment.exclude
+    if exclude is not None:
+        for tth_min, tth_max in zip(exclude.ttheta_min, exclude.ttheta_max):
+            cond &= (tth < float(tth_min)) | (tth > float(tth_max))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if meas.is_polarized:
+            y_up = np.array(meas.intensity_up, dtype=np.float64)
+            sy_up = np.array(meas.intensity_up_sigma, dtype=np.float64)
+            y_down = np.array(meas.intensity_down, dtype=np.float64)
+            sy_down = np.array(meas.intensity_down_sigma, dtype=np.float64)
+            sy_sum = np.sqrt(np.square(sy_up) + np.square(sy_down))
+            chi2 = experiment.chi2
+            terms = []
+            if chi2.up:
+                terms.append((y_calc_up - y_up) / sy_up)
+            if chi2.down:
+                terms.append((y_calc_down - y_down) / sy_down)
+            if chi2.sum:
+                terms.append((y_calc_up + y_calc_down - y_up - y_down) / sy_sum)
+            if chi2.diff:
+                terms.append((y_calc_up - y_calc_down - y_up + y_down) / sy_sum)
+        else:
+            y_obs = np.array(meas.intensity, dtype=np.float64)
+            sy_obs = np.array(meas.intensity_sigma, dtype=np.float64)
+            terms = [(y_calc_up + y_calc_down - y_obs) / sy_obs]
+    if not terms:
+        return np.empty(0, dtype=np.float64)
+    return np.array(terms)[:, cond].ravel()
+
+
+def _calcChiSq(experiment: Pd, y_calc_up: np.ndarray, y_calc_down: np.ndarray) -> Tuple[float, int]:
+    """
+    Chi squared of an experiment from its calculated pattern at the measured points, see `_calcResiduals`
+
+    :return: chi squared and the number of points it is summed over
+    """
+    residuals = _calcResiduals(experiment, y_calc_up, y_calc_down)
+    residuals = residuals[~np.isnan(residuals)]
+    return float(np.square(residuals).sum()), len(residuals)
+
+
+def _calcSweep(root, mappings: List[str], values: np.ndarray) -> np.ndarray:
+    """
+    Calculate the total intensity of all experiments for each row of parameter values. This is a module level function
+    so that it can be sent to a process pool.
+
+    :param root: Object which `self` in the mappings refers to
+    :param mappings: Mappings of the swept parameters
+    :param values: 2D array with one row of parameter values per point of the sweep
+    :return: 2D array with the concatenated patterns of all experiments for each point of the sweep
+    """
+    cache = MappingCache(root)
+    cryspy_obj = root._cryspy_obj
+    experiments = cryspy_obj.experiments
+    ttheta = []
+    for experiment in experiments:
+        experiment.meas.transform_items_to_numpy_arrays()
+        ttheta.append(experiment.meas.get_numpy_ttheta())
+    # Reflections of the previous point, which are reused as long as the cell does not change
+    reflections = [((), None)] * len(experiments)
+    patterns = np.empty((len(values), sum(len(tth) for tth in ttheta)), dtype=np.float64)
+    for index, row in enumerate(values):
+        cache.setValues(mappings, row.tolist())
+        cryspy_obj.apply_constraint()
+        _calcPattern(experiments, ttheta, cryspy_obj.crystals, reflections, patterns[index])
+    return patterns
+
+
+class _ResidualsEvaluator:
+    """
+    Weighted residuals of all experiments as a function of the values of mapped parameters, for the least squares
+    refinement. Used in the refining process and in the worker processes which calculate the Jacobian. The
+    reflections (hkl) of the first evaluation are kept, as in `RhoChi.refine`.
+    """
+
+    def __init__(self, root, mappings: List[str], reflections: Optional[list] = None):
+        """
+        :param root: Object which `self` in the mappings refers to
+        :param mappings: Mappings of the refined parameters
+        :param reflections: Reflections of another evaluator to use, see `reflections`
+        """
+        self._cache = MappingCache(root)
+        self._cryspy_obj = root._cryspy_obj
+        self._mappings = mappings
+        self._experiments = self._cryspy_obj.experiments
+        self._ttheta = [np.array(experiment.meas.ttheta, dtype=np.float64) for experiment in self._experiments]
+        if reflections is None:
+            reflections = [((), None)] * len(self._experiments)
+        self.reflections = list(reflections)
+        # Points with measurements, which does not depend on the parameters. Residuals which are not finite elsewhere
+        # are left for the minimiser to step back from.
+        self._measured = np.concatenate([np.isfinite(_calcResiduals(experiment, np.zeros_like(tth), np.zeros_like(tth)))
+                                         for experiment, tth in zip(self._experiments, self._ttheta)])
+
+    def setValues(self, values: np.ndarray) -> NoReturn:
+        self._cache.setValues(self._mappings, values.tolist())
+        self._cryspy_obj.apply_constraint()
+
+    def __call__(self, values: np.ndarray) -> np.ndarray:
+        self.setValues(values)
+        procs = _calcProcs(self._experiments, self._ttheta, self._cryspy_obj.crystals, self.reflections, True)
+        residuals = [_calcResiduals(experiment, proc.get_numpy_intensity_up_total(),
+                                    proc.get_numpy_intensity_down_total())
+                     for experiment, proc in zip(self._experiments, procs)]
+        return np.concatenate(residuals)[self._measured]
+
+    def pattern(self, values: np.ndarray) -> np.ndarray:
+        """
+        Concatenated patterns of all experiments, as from `calculateSweep`
+        """
+        self.setValues(values)
+        pattern = np.empty(sum(len(tth) for tth in self._ttheta), dtype=np.float64)
+        return _calcPattern(self._experiments, self._ttheta, self._cryspy_obj.crystals, self.reflections, pattern,
+                            True)
+
+
+# Residuals evaluator of a refinement worker process, see `_initRefineWorker`
+_REFINE_WORKER = {}
+
+
+def _initRefineWorker(root, mappings: List[str], reflections: list) -> NoReturn:
+    """
+    Give a refinement worker process its own copy of the calculator
+    """
+    _REFINE_WORKER['evaluator'] = _ResidualsEvaluator(root, mappings, reflections)
+
+
+def _jacobianColumns(evaluator: _ResidualsEvaluator, values: np.ndarray, steps: np.ndarray, residuals: np.ndarray,
+                     columns: List[int]) -> np.ndarray:
+    """
+    Forward difference columns of the Jacobian of the residuals
+
+    :param evaluator: Residuals as a function of the parameter values
+    :param values: Parameter values at which the Jacobian is calculated
+    :param steps: Step of each parameter
+    :param residuals: Residuals at `values`
+    :param columns: Indices of the parameters to calculate the columns of
+    :return: 2D array of the residuals by the columns
+    """
+    jac = np.empty((len(residuals), len(columns)), dtype=np.float64)
+    for index, column in enumerate(columns):
+        shifted = values.copy()
+        shifted[column] += steps[column]
+        jac[:, index] = (evaluator(shifted) - residuals) / (shifted[column] - values[column])
+    return jac
+
+
+def _calcJacobianColumns(worker: Optional[tuple], values: np.ndarray, steps: np.ndarray, residuals: np.ndarray,
+                         columns: List[int]) -> np.ndarray:
+    """
+    `_jacobianColumns` in a worker process. This is a module level function so that it can be sent to a process pool.
+
+    :param worker: Arguments of `_initRefineWorker`, None to use the copy the worker was started with
+    """
+    if worker is None:
+        evaluator = _REFINE_WORKER['evaluator']
+    else:
+        evaluator = _ResidualsEvaluator(*worker)
+    return _jacobianColumns(evaluator, values, steps, residuals, columns)
+
+
+class _RefinementProgress:
+    """
+    Progress reports of a refinement, see `CryspyCalculator.refine`
+    """
+
+    def __init__(self, progress: Optional[Callable[[dict], Any]], every: Optional[int],
+                 pattern_interval: Optional[float], calc_pattern: Callable[[np.ndarray], np.ndarray]):
+        """
+        :param progress: Function which receives the reports, None for no reports
+        :param every: Report every this many objective evaluations rather than after every iteration
+        :param pattern_interval: Minimum number of seconds between reports which carry the calculated pattern
+        :param calc_pattern: Calculates the pattern for the values of the refined parameters
+        """
+        self.iteration = 0
+        self.nfev = 0
+        self._progress = progress
+        self._every = every
+        self._pattern_interval = pattern_interval
+        self._pattern_time = None
+        self._calc_pattern = calc_pattern
+
+    @property
+    def perIteration(self) -> bool:
+        """
+        Is a report wanted after every iteration
+        """
+        return self._progress is not None and not self._every
+
+    def evaluated(self, parameters: Callable[[], np.ndarray], chi_sq: float) -> NoReturn:
+        """
+        Count an objective evaluation
+
+        :param parameters: Returns the values of the refined parameters
+        :param chi_sq: chi squared per point
+        """
+        self.nfev += 1
+        if self._progress is not None and self._every and self.nfev % self._every == 0:
+            self._report(parameters(), chi_sq)
+
+    def iterated(self, parameters: Callable[[], np.ndarray], chi_sq: Callable[[], float]) -> NoReturn:
+        """
+        Count an iteration of the minimiser
+
+        :param parameters: Returns the values of the refined parameters
+        :param chi_sq: Returns chi squared per point
+        """
+        self.iteration += 1
+        if self.perIteration:
+            self._report(parameters(), chi_sq())
+
+    def _report(self, parameters: np.ndarray, chi_sq: float) -> NoReturn:
+        pattern = None
+        now = perf_counter()
+        if self._pattern_interval is not None and \
+                (self._pattern_time is None or now - self._pattern_time >= self._pattern_interval):
+            self._pattern_time = now
+            pattern = self._calc_pattern(parameters)
+        self._progress({'iteration': self.iteration, 'nfev': self.nfev, 'chi_sq': chi_sq,
+                        'parameters': parameters, 'pattern': pattern})
+
+
 class CryspyCalculator:
     def __init__(self, project_rcif_path: Union[str, type(None)] = None) -> None:
         self._log = logging.getLogger(__class__.__module__)
@@ -51,6 +459,19 @@ class CryspyCalculator:
         self._phases_path = ""
         self._phase_names = []
         self._experiments_path = ""
+        self._mapping_cache = MappingCache(self)
+        self._tracked_parameters = {}
+        self._dirty_parameters = set()
+        # Mapping cache version at which the constraints were last applied, None if they are out of date
+        self._constraints_version = None
+        self._constraint_calls = {'applied': 0, 'skipped': 0}
+        # Changes whenever a parameter value is set, see `_chiSqKey`
+        self._values_version = 0
+        self._chi_sq = {}
+        self._chi_sq_key = None
+        self._executor_kind = None
+        self._max_workers = None
+        self._executor = None
         self._cryspy_obj = self._createCryspyObj()
         self._log.info('Created cryspy calculator interface')
 
@@ -131,22 +552,19 @@ class CryspyCalculator:
         :param exp_path: Path to a experiment file (`.cif`)
         """
         self._log.debug('----> Start')
-        exp_rcif_content = ""
         if not isinstance(exp_path, (str, os.PathLike)):
             self._log.warning('Experiment definition is not a string or path')
             return
 
         # This will read the CIF file
         if os.path.isfile(exp_path):
-            with open(exp_path, 'r') as f:
-                self._log.debug('Reading experiment cif file')
-                exp_rcif_content = f.read()
+            self._log.debug('Reading experiment cif file')
+            experiment = self._readExperimentCif(exp_path)
             self._experiments_path = exp_path
         else:
             self._log.warning('Experiment cif can not be found')
             return
 
-        experiment = Pd.from_cif(exp_rcif_content)
         if experiment is None:
             self._log.error('Experiment cif data is malformed')
         self._cryspy_obj.experiments = [experiment]
@@ -154,6 +572,7 @@ class CryspyCalculator:
         self._log.info('Setting cryspy experiments from cif content')
         if self._cryspy_obj.crystals is not None:
             self._cryspy_obj.experiments[0].phase.items[0] = (self._phase_names[0])
+        self._mapping_cache.invalidate()
         self._log.debug('<---- End')
 
     def addExpDefinitionFromString(self, exp_rcif_content: str) -> NoReturn:
@@ -172,6 +591,7 @@ class CryspyCalculator:
         else:
             self._cryspy_obj.experiments = [*self._cryspy_obj.experiments, experiment]
         self._experiment_names = [experiment.data_name for experiment in self._cryspy_obj.experiments]
+        self._mapping_cache.invalidate()
         self._log.debug('<---- End')
 
     def addExpsDefinition(self, exp_path: str) -> NoReturn:
@@ -186,18 +606,15 @@ class CryspyCalculator:
             self._log.warning('Experiment definition is not a string or path')
             return
 
-        exp_rcif_content = ""
-
         # This will read the CIF file
         if os.path.isfile(exp_path):
-            with open(exp_path, 'r') as f:
-                self._log.debug('Reading cif content for experiment definition')
-                exp_rcif_content = f.read()
+            self._log.debug('Reading cif content for experiment definition')
+            experiment = self._readExperimentCif(exp_path)
             self._experiments_path = exp_path
         else:
             self._log.warning('Experiment cif can not be found')
+            experiment = Pd.from_cif("")
 
-        experiment = Pd.from_cif(exp_rcif_content)
         if experiment is None:
             self._log.error('Experiment cif data is malformed')
         if self._cryspy_obj.experiments is not None:
@@ -216,8 +633,52 @@ class CryspyCalculator:
             self._log.info('Experiment set from cif content')
             self._cryspy_obj.experiments = [experiment]
         self._experiment_names = [experiment.data_name for experiment in self._cryspy_obj.experiments]
+        self._mapping_cache.invalidate()
         self._log.debug('<---- End')
 
+    def _readExperimentCif(self, exp_path: str) -> Optional[Pd]:
+        """
+        Read an experiment cif file. The measured data loop is memory-mapped and parsed straight into numpy columns,
+        only the parameter blocks are parsed by cryspy. Files with measured data which is not purely numeric are read
+        in full by cryspy.
+
+        :param exp_path: Path to a experiment file (`.cif`)
+        :return: cryspy experiment or None if the file is malformed
+        """
+        loop = readLoop(exp_path, '_{}_'.format(PdMeas.PREFIX))
+        if loop is None:
+            with open(exp_path, 'r') as f:
+                return Pd.from_cif(f.read())
+        self._log.debug('Read %s', loop)
+        # cryspy parses a single row, which gives a correctly named measurement loop to fill
+        experiment = Pd.from_cif(readWithoutLoop(exp_path, loop))
+        if experiment is None or experiment.meas is None:
+            return experiment
+        experiment.meas.item = self._measItemsFromLoop(loop)
+        return experiment
+
+    @staticmethod
+    def _measItemsFromLoop(loop: CifLoop) -> List[PdMeas]:
+        """
+        Create cryspy measurement points from a measured data loop
+
+        :param loop: `_pd_meas_` loop read by `readLoop`
+        :return: list of measurement points
+        """
+        attributes = list(PdMeas.MANDATORY_ATTRIBUTE) + list(PdMeas.OPTIONAL_ATTRIBUTE)
+        cif_attributes = list(PdMeas.RELATED_CIF_MANDATORY_ATTRIBUTE) + list(PdMeas.RELATED_CIF_OPTIONAL_ATTRIBUTE)
+        lookup = dict(zip([attribute.lower() for attribute in cif_attributes], attributes))
+        prefix_length = len(PdMeas.PREFIX) + 2
+        names = []
+        columns = []
+        for tag, column in zip(loop.tags, loop.block):
+            name = tag[prefix_length:].lower()
+            name = lookup.get(name, name)
+            if name in attributes:
+                names.append(name)
+                columns.append(column.tolist())
+        return [PdMeas(**dict(zip(names, values))) for values in zip(*columns)]
+
     def removeExpsDefinition(self, experiment_name: str) -> NoReturn:
         """
         Remove a experiment from both the project dictionary and the calculator.
@@ -233,6 +694,7 @@ class CryspyCalculator:
             self._experiment_names = []
             if self._cryspy_obj.experiments:
                 self._experiment_names = [experiment.data_name for experiment in self._cryspy_obj.experiments]
+            self._mapping_cache.invalidate()
         else:
             raise KeyError
         self._log.debug('<---- End')
@@ -265,6 +727,7 @@ class CryspyCalculator:
         new_phase_name = phase.data_name
         self._cryspy_obj.crystals = [phase]
         self._phase_names = [phase.data_name for phase in self._cryspy_obj.crystals]
+        self._mapping_cache.invalidate()
 
         experiment_segment = ''
         if self._cryspy_obj.experiments is not None:
@@ -302,6 +765,7 @@ class CryspyCalculator:
             self._cryspy_obj.crystals = [*self._cryspy_obj.crystals, phase]
             self._log.warning(f"self._cryspy_obj.crystals: {self._cryspy_obj.crystals}")
         self._phase_names = [phase.data_name for phase in self._cryspy_obj.crystals]
+        self._mapping_cache.invalidate()
         self._log.debug('<---- End')
 
     def addPhaseDefinition(self, phases_path: str) -> NoReturn:
@@ -344,6 +808,7 @@ class CryspyCalculator:
             self._log.info('Setting cryspy crystal to phase')
             self._cryspy_obj.crystals = [phase]
         self._phase_names = [phase.data_name for phase in self._cryspy_obj.crystals]
+        self._mapping_cache.invalidate()
         self._log.debug('<---- End')
 
     def removePhaseDefinition(self, phase_name: str) -> NoReturn:
@@ -359,6 +824,7 @@ class CryspyCalculator:
             self._phase_names = []
             if self._cryspy_obj.crystals:
                 self._phase_names = [phase.data_name for phase in self._cryspy_obj.crystals]
+            self._mapping_cache.invalidate()
             self._log.info('Removing phase %s', phase_name)
         else:
             self._log.warning('Phase not found in cryspy crystals')
@@ -537,7 +1003,7 @@ class CryspyCalculator:
         if not isinstance(self._cryspy_obj, cryspy.scripts.cl_rhochi.RhoChi) or self._cryspy_obj.crystals is None:
             return Phases({})
 
-        self._cryspy_obj.apply_constraint()  # THIS IS 400ms !!!!!!
+        self._applyConstraints()
         phases = list(map(self._makePhase, self._cryspy_obj.crystals))
         phases = Phases(phases)
         self._log.info(phases)
@@ -576,7 +1042,7 @@ class CryspyCalculator:
         for key in atoms:
             phase['atoms'][key] = atoms[key]
 
-        # This is ~125ms per atom due to cryspy taking ~110ms :-(
+        # Symmetry equivalent positions, < 1ms for a few atoms
         self._makeAtomSites(phase, calculator_phase)
         return phase
 
@@ -686,43 +1152,57 @@ class CryspyCalculator:
 
     @staticmethod
     def _makeAtomSites(phase: Phase, calculator_phase: Crystal) -> NoReturn:
-        atom_site_list = [[], [], [], []]
-        # Atom sites for structure view (all the positions inside unit cell of 1x1x1)
-        for x, y, z, scat_length_neutron in zip(calculator_phase.atom_site.fract_x,
-                                                calculator_phase.atom_site.fract_y,
-                                                calculator_phase.atom_site.fract_z,
-                                                calculator_phase.atom_site.scat_length_neutron):
-            x_array, y_array, z_array, _ = calculator_phase.space_group.calc_xyz_mult(x.value, y.value, z.value)
-            scat_length_neutron_array = np.full_like(x_array, scat_length_neutron, dtype=complex)
-            atom_site_list[0] += x_array.tolist()
-            atom_site_list[1] += y_array.tolist()
-            atom_site_list[2] += z_array.tolist()
-            atom_site_list[3] += scat_length_neutron_array.tolist()
-        for x, y, z, scat_length_neutron in zip(atom_site_list[0], atom_site_list[1], atom_site_list[2],
-                                                atom_site_list[3]):
-            if x == 0.0:
-                atom_site_list[0].append(1.0)
-                atom_site_list[1].append(y)
-                atom_site_list[2].append(z)
-                atom_site_list[3].append(scat_length_neutron)
-            if y == 0.0:
-                atom_site_list[0].append(x)
-                atom_site_list[1].append(1.0)
-                atom_site_list[2].append(z)
-                atom_site_list[3].append(scat_length_neutron)
-            if z == 0.0:
-                atom_site_list[0].append(x)
-                atom_site_list[1].append(y)
-                atom_site_list[2].append(1.0)
-                atom_site_list[3].append(scat_length_neutron)
-
-        # convert complex numbers into strings without brackets to be recognizable in GUI
-        scat_length_neutron_str_array = [str(item)[1:-1] for item in atom_site_list[3]]
-
-        phase.setItemByPath(['sites', 'fract_x'], atom_site_list[0])
-        phase.setItemByPath(['sites', 'fract_y'], atom_site_list[1])
-        phase.setItemByPath(['sites', 'fract_z'], atom_site_list[2])
-        phase.setItemByPath(['sites', 'scat_length_neutron'], scat_length_neutron_str_array)
+        sites = CryspyCalculator._calcAtomSites(calculator_phase)
+        for key in sites.keys():
+            phase.setItemByPath(['sites', key], sites[key])
+
+    @staticmethod
+    def _calcAtomSites(calculator_phase: Crystal) -> dict:
+        """
+        Atom positions in the unit cell (1x1x1) for the structure view. These are the symmetry equivalent positions of
+        all atoms, plus the images on the far faces, edges and corner of the cell of the positions with x, y or z = 0.
+
+        :param calculator_phase: cryspy phase
+        :return: Arrays of the fractional coordinates and of the (complex) neutron scattering lengths of the positions
+        """
+        atom_site = calculator_phase.atom_site
+        xyz = np.array([[item.value for item in atom_site.fract_x],
+                        [item.value for item in atom_site.fract_y],
+                        [item.value for item in atom_site.fract_z]], dtype=float).T.reshape(-1, 3)
+        scat_length_neutron = np.array(atom_site.scat_length_neutron, dtype=complex)
+        rotations, translations = _symmetryOperators(calculator_phase.space_group)
+        # All operators on all atoms, (atom, operator, xyz)
+        positions = (np.einsum('oij,aj->aoi', rotations, xyz) + translations) % 1.0
+        # Positions of an atom which coincide are only kept once, in the order of the operators
+        steps = np.rint(positions * SITE_RESOLUTION).astype(np.int64) % SITE_RESOLUTION
+        position_key = (steps[..., 0] * SITE_RESOLUTION + steps[..., 1]) * SITE_RESOLUTION + steps[..., 2]
+        order = np.argsort(position_key, axis=1, kind='stable')
+        sorted_key = np.take_along_axis(position_key, order, axis=1)
+        keep = np.ones(position_key.shape, dtype=bool)
+        np.put_along_axis(keep, order[:, 1:], sorted_key[:, 1:] != sorted_key[:, :-1], axis=1)
+        positions = positions[keep]
+        positions[steps[keep] == 0] = 0.0
+        scat_length_neutron = np.repeat(scat_length_neutron, keep.sum(axis=1))
+        # Images on the far side of the cell of positions on the x, y and z = 0 faces
+        on_face = positions == 0.0
+        all_positions = [positions]
+        all_scat_lengths = [scat_length_neutron]
+        for axes in ((0,), (1,), (2,), (0, 1), (0, 2), (1, 2), (0, 1, 2)):
+            selected = on_face[:, axes].all(axis=1)
+            images = positions[selected]
+            images[:, axes] = 1.0
+            all_positions.append(images)
+            all_scat_lengths.append(scat_length_neutron[selected])
+        positions = np.concatenate(all_positions)
+        return {'fract_x': positions[:, 0],
+                'fract_y': positions[:, 1],
+                'fract_z': positions[:, 2],
+                'scat_length_neutron': np.concatenate(all_scat_lengths)}
+
+    def _getPhaseSites(self, phase_name: str) -> dict:
+        i = self._phase_names.index(phase_name)
+        calculator_phase = self._cryspy_obj.crystals[i]
+        return self._calcAtomSites(calculator_phase)
 
     def _getPhasesSpaceGroup(self, phase_name: str) -> SpaceGroup:
         i = self._phase_names.index(phase_name)
@@ -809,27 +1289,115 @@ class CryspyCalculator:
 
         return Experiments(experiments)
 
+    def setCalculationExecutor(self, executor: Optional[str] = None, max_workers: Optional[int] = None) -> NoReturn:
+        """
+        Calculate the profiles of the experiments in `getCalculations` concurrently. The results do not depend on the
+        executor.
+
+        :param executor: 'thread' or 'process' to use a pool of that kind, None to calculate serially
+        :param max_workers: Number of workers, defaults to the executor default (number of cores)
+        """
+        if executor is not None and executor not in CALCULATION_EXECUTORS.keys():
+            raise KeyError('Unknown executor {}, use one of {}'.format(executor, list(CALCULATION_EXECUTORS.keys())))
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._executor_kind = executor
+        self._max_workers = max_workers
+        self._log.info('Calculation executor set to %s with %s workers', executor, max_workers)
+
+    def _getExecutor(self) -> Optional[Executor]:
+        """
+        Returns the pool for calculating experiments, which is created on first use
+        """
+        if self._executor_kind is None:
+            return None
+        if self._executor is None:
+            self._executor = CALCULATION_EXECUTORS[self._executor_kind](max_workers=self._max_workers)
+        return self._executor
+
+    def _calcProfiles(self, experiments: list, crystals: list) -> List[tuple]:
+        """
+        Calculate the profiles of all experiments, concurrently if an executor has been set.
+
+        :param experiments: cryspy experiments
+        :param crystals: cryspy crystals
+        :return: calculated pattern and calculated bragg peaks of each experiment, in the order of `experiments`
+        """
+        executor = self._getExecutor()
+        if executor is None or len(experiments) < 2:
+            results = [_calcProfile(experiment, crystals) for experiment in experiments]
+        elif self._executor_kind == 'process':
+            payloads = [_dumps((_calcProfile, (experiment, crystals))) for experiment in experiments]
+            results = [pickle.loads(result) for result in executor.map(_callPickled, payloads)]
+        else:
+            results = list(executor.map(_calcProfile, experiments, [crystals] * len(experiments)))
+        profiles = []
+        for experiment, (calculated_pattern, calculated_bragg_peaks, internal_objs) in zip(experiments, results):
+            # A process pool has worked on a copy of the experiment
+            if internal_objs is not None:
+                setattr(experiment, '__internal_objs', internal_objs)
+            profiles.append((calculated_pattern, calculated_bragg_peaks))
+        return profiles
+
+    def calculateSweep(self, mappings: List[str], values: np.ndarray, processes: Optional[int] = None) -> np.ndarray:
+        """
+        Calculate the patterns for many sets of parameter values. No calculation objects are created and the swept
+        parameters are restored afterwards.
+
+        :param mappings: Mappings of the swept parameters
+        :param values: 2D array with one row of parameter values (one per mapping) for each point of the sweep
+        :param processes: Number of worker processes to split the sweep over, None to calculate in this process
+        :raises ValueError: If the number of values per point does not match the number of mappings
+        :return: 2D array with the calculated intensity (up + down) for each point of the sweep. The patterns of
+            multiple experiments are concatenated in experiment order.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(-1, len(mappings))
+        if values.ndim != 2 or values.shape[1] != len(mappings):
+            raise ValueError('Expected {} values per point, got array of shape {}'.format(len(mappings), values.shape))
+        experiments = self._cryspy_obj.experiments
+        if not experiments or not len(values):
+            return np.empty((len(values), 0), dtype=np.float64)
+
+        if processes is not None and processes > 1 and len(values) > 1:
+            self._log.info('Calculating sweep of %i points in %i processes', len(values), processes)
+            chunks = np.array_split(values, min(processes, len(values)))
+            root = _SweepRoot(self._cryspy_obj)
+            payloads = [_dumps((_calcSweep, (root, mappings, chunk))) for chunk in chunks]
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                return np.concatenate([pickle.loads(result) for result in executor.map(_callPickled, payloads)])
+
+        self._log.info('Calculating sweep of %i points', len(values))
+        originals = [self._mapping_cache.getItem(mapping).value for mapping in mappings]
+        internal_objs = [getattr(experiment, '__internal_objs', None) for experiment in experiments]
+        try:
+            return _calcSweep(self, mappings, values)
+        finally:
+            self._mapping_cache.setValues(mappings, originals)
+            self._cryspy_obj.apply_constraint()
+            for experiment, objs in zip(experiments, internal_objs):
+                setattr(experiment, '__internal_objs', objs)
+
     def getCalculations(self) -> Calculations:
         """
         Returns all calculations from the calculator object.
         """
         if not isinstance(self._cryspy_obj, cryspy.scripts.cl_rhochi.RhoChi) or self._cryspy_obj.experiments is None:
             return Calculations({})
-        self._cryspy_obj.apply_constraint()
+        self._applyConstraints()
         calculations = []
-        for calculator_experiment in self._cryspy_obj.experiments:
+        experiments = self._cryspy_obj.experiments
+        self._log.debug("+++++++++> start")
+        profiles = self._calcProfiles(experiments, self._cryspy_obj.crystals)
+        self._log.debug("<+++++++++ end")
+        chi_sq = {}
+        for calculator_experiment, (calculated_pattern, calculated_bragg_peaks) in zip(experiments, profiles):
             calculator_experiment_name = calculator_experiment.data_name
-            calculator_experiment_index = self._cryspy_obj.experiments.index(calculator_experiment)
-
-            # Calculated data
-            self._log.debug("+++++++++> start")
-            calculated_pattern, calculated_bragg_peaks, _ = calculator_experiment.calc_profile(
-                np.array(calculator_experiment.meas.ttheta),
-                self._cryspy_obj.crystals)
-            self._log.debug("<+++++++++ end")
 
             # Bragg peaks
-            offset = self._cryspy_obj.experiments[calculator_experiment_index].setup.offset_ttheta
+            offset = calculator_experiment.setup.offset_ttheta
             bragg_peaks = []
             for index, phase_info in enumerate(calculator_experiment.phase.item):
                 def getCrystal():
@@ -851,7 +1419,7 @@ class CryspyCalculator:
             bragg_peaks = BraggPeaks(bragg_peaks)
 
             # Calculated diffraction pattern
-            x_calc = np.array(calculated_pattern.ttheta).tolist()
+            x_calc = np.array(calculated_pattern.ttheta, dtype=np.float64)
             if calculator_experiment.meas.intensity[0] is not None:
                 y_obs = np.array(calculator_experiment.meas.intensity)
                 sy_obs = np.array(calculator_experiment.meas.intensity_sigma)
@@ -869,6 +1437,7 @@ class CryspyCalculator:
                 y_calc_down = np.array(calculated_pattern.intensity_down_total)
                 y_calc_bkg = np.multiply(np.array(calculated_pattern.intensity_bkg_calc), 2)
             y_calc = y_calc_up + y_calc_down
+            chi_sq[calculator_experiment_name] = _calcChiSq(calculator_experiment, y_calc_up, y_calc_down)
             y_obs_upper = y_obs + sy_obs
             y_obs_lower = y_obs - sy_obs
             y_diff_upper = y_obs + sy_obs - y_calc
@@ -881,6 +1450,8 @@ class CryspyCalculator:
             calculations.append(Calculation(calculator_experiment_name,
                                             bragg_peaks, calculated_pattern, limits))
         calculations = Calculations(calculations)
+        self._chi_sq = chi_sq
+        self._chi_sq_key = self._chiSqKey()
 
         self._log.info(calculations)
 
@@ -909,6 +1480,7 @@ class CryspyCalculator:
         """Set phases (sample model tab in GUI)"""
         self._log.info('-> start')
         self._cryspy_obj.crystals = []
+        self._mapping_cache.invalidate()
         for phase_name in phases.keys():
             self.addPhase(phases[phase_name])
         self._log.info('<- end')
@@ -917,16 +1489,18 @@ class CryspyCalculator:
         """Set experiments (Experimental data tab in GUI)"""
         self._log.info('-> start')
         self._cryspy_obj.experiments = []
+        self._mapping_cache.invalidate()
         for experiment_name in experiments.keys():
             self.addExperiment(experiments[experiment_name])
         self._log.info('<- end')
 
     def setObjFromProjectDicts(self, phases: Phases, experiments: Experiments) -> NoReturn:
-        """Set all the cryspy parameters from project dictionary"""
+        """
+        Set all the cryspy parameters from project dictionary. The crystals and experiments are built directly from the
+        project objects, there is no need to go through a cif string.
+        """
         self.setPhases(phases)
         self.setExperiments(experiments)
-        cif = self._cryspy_obj.to_cif()
-        self._cryspy_obj = RhoChi().from_cif(cif)
 
     def asCifDict(self) -> dict:
         """Returns dict of all the CIFs"""
@@ -953,37 +1527,395 @@ class CryspyCalculator:
         return { 'main': main, 'phases': phases, 'experiments': experiments, 'calculations': calculations }
 
     @time_it
-    def refine(self) -> Tuple[dict, dict]:
-        """refinement ..."""
-        refinement_res = self._cryspy_obj.refine()
-        scipy_refinement_res = refinement_res['res']
+    def refine(self, progress: Optional[Callable[[dict], Any]] = None, cancel: Optional[Event] = None,
+               every: Optional[int] = None, pattern_interval: Optional[float] = None) -> Tuple[dict, dict]:
+        """
+        Refine the parameters which are flagged for refinement. This is the minimisation of `RhoChi.refine` (BFGS on
+        log scaled parameters) with hooks to follow and to stop it.
+
+        :param progress: Called after every iteration with a dictionary of the `iteration`, the number of objective
+                         evaluations `nfev`, the chi squared per point `chi_sq`, the values of the refined
+                         `parameters` and the calculated `pattern`
+        :param cancel: Event which stops the refinement when set
+        :param every: Report every this many objective evaluations, rather than after every iteration
+        :param pattern_interval: Minimum number of seconds between reports which carry the calculated pattern, the
+                                 concatenated total intensity of all experiments at the measured points (as from
+                                 `calculateSweep`). The other reports, and all reports if None, have a `pattern` of None.
+        :return: cryspy refinement results and the scipy result, which is None if no parameters are refined
+        :raises RefinementCancelled: If the refinement was stopped. The parameters are restored.
+        """
+        cryspy_obj = self._cryspy_obj
+        self._markDirty(cryspy_obj.get_variables())
+        self._constraints_version = None
+        self._values_version += 1
+        cryspy_obj.remove_internal_objs
+        cryspy_obj.apply_constraint()
+        fitables = cryspy_obj.get_variables()
+        if not fitables:
+            chi_sq, n = cryspy_obj.calc_chi_sq()
+            return {'flag': True, 'res': None, 'chi_sq': chi_sq, 'n': n}, None
+
+        values = [fitable.value for fitable in fitables]
+        sigmas = [fitable.sigma for fitable in fitables]
+        val_0 = np.array(values, dtype=float)
+        sign = 2 * (np.array(val_0 >= 0., dtype=int) - 0.5)
+        param_0 = np.log(abs(val_0) * (np.e - 1.) + 1.) * sign
+        coeff_norm = np.where(val_0 == 0., 1., val_0) / np.where(param_0 == 0., 1., param_0)
+        _, n = cryspy_obj.calc_chi_sq(flag_internal=True)
+        experiments = cryspy_obj.experiments
+        ttheta = [experiment.meas.get_numpy_ttheta() for experiment in experiments]
+        reflections = [((), None)] * len(experiments)
+
+        def calc_pattern(parameters):
+            # After an iteration the parameters may have been moved on for the gradient
+            for fitable, value in zip(fitables, parameters):
+                fitable.value = value
+            cryspy_obj.apply_constraint()
+            # The objective reuses the reflections cryspy keeps on the experiments
+            internal_objs = [getattr(experiment, '__internal_objs', None) for experiment in experiments]
+            pattern = np.empty(sum(len(tth) for tth in ttheta), dtype=np.float64)
+            _calcPattern(experiments, ttheta, cryspy_obj.crystals, reflections, pattern)
+            for experiment, objs in zip(experiments, internal_objs):
+                setattr(experiment, '__internal_objs', objs)
+            return pattern
+
+        reporter = _RefinementProgress(progress, every, pattern_interval, calc_pattern)
+        # Objective values of the current iteration by parameter vector, for the progress report
+        evaluations = {}
+
+        def objective(params):
+            if cancel is not None and cancel.is_set():
+                raise RefinementCancelled
+            for fitable, param, coeff in zip(fitables, params, coeff_norm):
+                fitable.value = param * coeff
+            chi_sq, n_points = cryspy_obj.calc_chi_sq(flag_internal=False)
+            chi_sq = 1.0e+308 if n_points < n else chi_sq / float(n_points)
+            reporter.evaluated(lambda: params * coeff_norm, chi_sq)
+            if reporter.perIteration:
+                evaluations[params.tobytes()] = chi_sq
+            return chi_sq
+
+        def callback(params):
+            def chi_sq():
+                value = evaluations.get(params.tobytes())
+                return objective(params) if value is None else value
+
+            reporter.iterated(lambda: params * coeff_norm, chi_sq)
+            evaluations.clear()
 
-        return refinement_res, scipy_refinement_res
+        try:
+            res = scipy.optimize.minimize(objective, param_0, method='BFGS', callback=callback)
+        except BaseException:
+            for fitable, value, sigma in zip(fitables, values, sigmas):
+                fitable.value = value
+                fitable.sigma = sigma
+            raise
+        finally:
+            # Calculations made while the refinement ran do not belong to the final parameters
+            self._values_version += 1
+        hess_inv = res['hess_inv'] * np.outer(coeff_norm, coeff_norm)
+        sigma = (abs(np.diag(hess_inv) / float(n))) ** 0.5
+        for fitable, param_sigma, param, coeff in zip(fitables, sigma, res['x'], coeff_norm):
+            fitable.sigma = param_sigma
+            fitable.value = param * coeff
+        cryspy_obj.calc_chi_sq(flag_internal=True)
+        return {'flag': True, 'res': res}, res
+
+    @time_it
+    def refineLeastSquares(self, mappings: List[str], processes: Optional[int] = None,
+                           progress: Optional[Callable[[dict], Any]] = None, cancel: Optional[Event] = None,
+                           every: Optional[int] = None, pattern_interval: Optional[float] = None) -> Tuple[dict, dict]:
+        """
+        Refine mapped parameters by least squares on the weighted residuals of all experiments (trust region
+        reflective). The columns of the forward difference Jacobian can be calculated in parallel in a pool of worker
+        processes, each holding its own copy of the calculator.
+
+        :param mappings: Mappings of the refined parameters
+        :param processes: Number of worker processes for the Jacobian, None to calculate it in this process
+        :param progress: Called after every iteration, see `refine`
+        :param cancel: Event which stops the refinement when set
+        :param every: Report every this many residual evaluations (Jacobian columns excluded), see `refine`
+        :param pattern_interval: Minimum number of seconds between reports which carry the calculated pattern
+        :return: refinement results and the scipy result, which is None if no parameters are refined. `nfev` of the
+                 scipy result includes the evaluations for the Jacobian and `nit` is the number of Jacobian evaluations.
+        :raises RefinementCancelled: If the refinement was stopped. The parameters are restored.
+        """
+        items = [self._mapping_cache.getItem(mapping) for mapping in mappings]
+        self._markDirty(items)
+        self._constraints_version = None
+        self._values_version += 1
+        if not items or not self._cryspy_obj.experiments:
+            return {'flag': True, 'res': None}, None
+        self._applyConstraints()
+        values = [item.value for item in items]
+        sigmas = [item.sigma for item in items]
+        evaluator = _ResidualsEvaluator(self, mappings)
+        reporter = _RefinementProgress(progress, every, pattern_interval, evaluator.pattern)
+        # Residuals of the last evaluation, which the Jacobian is calculated around
+        last = {}
+
+        def residuals(params):
+            if cancel is not None and cancel.is_set():
+                raise RefinementCancelled
+            res = evaluator(params)
+            last['params'], last['residuals'] = params.tobytes(), res
+            reporter.evaluated(lambda: params.copy(), np.square(res).sum() / len(res))
+            return res
+
+        parallel = processes is not None and processes > 1 and len(mappings) > 1
+        if parallel:
+            processes = min(processes, len(mappings))
+            self._log.info('Calculating the Jacobian of %i parameters in %i processes', len(mappings), processes)
+        # Worker pool, started once the reflections have been calculated
+        pool = {}
+
+        def jacobian(params):
+            res = last['residuals'] if last.get('params') == params.tobytes() else residuals(params)
+            reporter.iterated(lambda: params.copy(), lambda: np.square(res).sum() / len(res))
+            if cancel is not None and cancel.is_set():
+                raise RefinementCancelled
+            steps = np.sqrt(np.finfo(np.float64).eps) * np.maximum(1.0, np.abs(params))
+            steps[params < 0] *= -1
+            if not parallel:
+                return _jacobianColumns(evaluator, params, steps, res, list(range(len(params))))
+            if not pool:
+                pool['executor'], pool['worker'] = self._startRefineWorkers(mappings, processes,
+                                                                            evaluator.reflections)
+            chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(params)), processes)]
+            jobs = [pool['executor'].submit(_callPickled, _dumps((_calcJacobianColumns,
+                                                                   (pool['worker'], params, steps, res, chunk))))
+                    for chunk in chunks]
+            return np.concatenate([pickle.loads(job.result()) for job in jobs], axis=1)
+
+        try:
+            res = scipy.optimize.least_squares(residuals, np.array(values, dtype=np.float64), jac=jacobian,
+                                               method='trf', x_scale='jac')
+        except BaseException:
+            self._mapping_cache.setValues(mappings, values)
+            for item, sigma in zip(items, sigmas):
+                item.sigma = sigma
+            raise
+        finally:
+            if pool:
+                pool['executor'].shutdown()
+            self._values_version += 1
+            # The parameters are set below (or were restored) without applying the constraints to their tied values
+            self._constraints_version = None
+        self._mapping_cache.setValues(mappings, res.x.tolist())
+        # Covariance from the Jacobian at the solution, scaled by the reduced chi squared
+        n_res, n_par = res.jac.shape
+        covariance = np.linalg.pinv(res.jac.T @ res.jac) * 2 * res.cost / max(n_res - n_par, 1)
+        for item, sigma in zip(items, np.sqrt(np.abs(np.diag(covariance)))):
+            item.sigma = sigma
+        res.nit = res.njev
+        res.nfev += res.njev * n_par
+        return {'flag': True, 'res': res}, res
+
+    def _startRefineWorkers(self, mappings: List[str], processes: int,
+                            reflections: list) -> Tuple[ProcessPoolExecutor, Optional[tuple]]:
+        """
+        Start the worker processes of `refineLeastSquares`, each with its own copy of the calculator. Before python 3.7
+        workers can not be initialised, so the copy is sent with every task instead.
+
+        :return: The pool and the worker argument of `_calcJacobianColumns`
+        """
+        worker = (_SweepRoot(self._cryspy_obj), mappings, reflections)
+        if sys.version_info >= (3, 7):
+            return ProcessPoolExecutor(max_workers=processes, initializer=_callPickled,
+                                       initargs=(_dumps((_initRefineWorker, worker)),)), None
+        return ProcessPoolExecutor(max_workers=processes), worker
+
+    def _chiSqKey(self) -> tuple:
+        """
+        State of the calculator which the chi squared of the last calculations belong to
+        """
+        return self._mapping_cache.version, self._values_version
+
+    def getChiSqPerExperiment(self) -> Dict[str, Tuple[float, int]]:
+        """
+        Chi squared of each experiment. The calculated patterns of the last `getCalculations` are used if no
+        parameter has changed since, otherwise the profiles are calculated.
+
+        :return: Dictionary of experiment name: (chi squared, number of points it is summed over)
+        """
+        if self._chi_sq_key == self._chiSqKey():
+            return dict(self._chi_sq)
+        chi_sq = {}
+        experiments = self._cryspy_obj.experiments
+        if experiments:
+            self._applyConstraints()
+            profiles = self._calcProfiles(experiments, self._cryspy_obj.crystals)
+            for experiment, (calculated_pattern, _) in zip(experiments, profiles):
+                chi_sq[experiment.data_name] = _calcChiSq(experiment,
+                                                          np.array(calculated_pattern.intensity_up_total),
+                                                          np.array(calculated_pattern.intensity_down_total))
+        self._chi_sq = chi_sq
+        self._chi_sq_key = self._chiSqKey()
+        return dict(chi_sq)
 
     def getChiSq(self) -> Tuple[float, float]:
-        chi_sq = 0.0
-        n_res = 1
-        # TODO this is bull, why is it like this!!!! :-(
-        if self._cryspy_obj.experiments is not None:
-            for calculator_experiment in self._cryspy_obj.experiments:
-                chi_sq, n_res = calculator_experiment.calc_chi_sq(self._cryspy_obj.crystals)
+        """
+        Chi squared summed over all experiments
 
-        return chi_sq, n_res
+        :return: chi squared and the number of points it is summed over (1 if there are none)
+        """
+        chi_sq = 0.0
+        n_res = 0
+        for experiment_chi_sq, experiment_n_res in self.getChiSqPerExperiment().values():
+            chi_sq += experiment_chi_sq
+            n_res += experiment_n_res
+        return chi_sq, max(n_res, 1)
 
     @property
     def final_chi_square(self) -> float:
         chi_sq, n_res = self.getChiSq()
         return chi_sq / n_res
 
-    def _mappedValueUpdater(self, item_str, value) -> NoReturn:
-        aeval = Interpreter(usersyms=dict(self=self))
-        item = aeval(item_str)
-        item.value = value
+    def _mappedValueUpdater(self, item_str: str, value) -> NoReturn:
+        """
+        Set the value of the calculator object pointed to by a mapping string
+
+        :param item_str: mapping string, e.g. `self._cryspy_obj.crystals[0].cell.length_a`
+        :param value: new value
+        :raises TypeError: If the mapping can not be resolved
+        """
+        self._mapping_cache.setValue(item_str, value)
+        self._values_version += 1
+        self._dirty_parameters.add(item_str)
+        self._constraintsChanged(item_str)
+
+    def _mappedRefineUpdater(self, item_str: str, value: bool) -> NoReturn:
+        """
+        Set the refinement flag of the calculator object pointed to by a mapping string
 
-    def _mappedRefineUpdater(self, item_str, value) -> NoReturn:
-        aeval = Interpreter(usersyms=dict(self=self))
-        item = aeval(item_str)
-        item.refinement = value
+        :param item_str: mapping string
+        :param value: should the parameter be refined
+        :raises TypeError: If the mapping can not be resolved
+        """
+        self._mapping_cache.setRefine(item_str, value)
+        self._dirty_parameters.add(item_str)
+        self._constraintsChanged(item_str)
+
+    def _mappedBulkValueUpdater(self, item_strs: List[str], values: List) -> NoReturn:
+        """
+        Set the values of many calculator objects pointed to by mapping strings
+
+        :param item_strs: list of mapping strings
+        :param values: list of new values
+        :raises TypeError: If a mapping can not be resolved
+        """
+        self._mapping_cache.setValues(item_strs, values)
+        self._values_version += 1
+        self._dirty_parameters.update(item_strs)
+        for item_str in item_strs:
+            if self._constraintsChanged(item_str):
+                break
+
+    def _constraintsChanged(self, item_str: str) -> bool:
+        """
+        Mark the constraints as out of date if a mapped parameter can affect them. Only the crystals (space group, cell,
+        atom sites, ADP/MSP) are constrained, so experiment parameters are skipped.
+
+        :param item_str: mapping string of the changed parameter
+        :return: True if the constraints have to be applied again
+        """
+        if _CRYSTALS_MAPPING in item_str or not item_str.lstrip().startswith('self'):
+            self._constraints_version = None
+            return True
+        return False
+
+    def _applyConstraints(self) -> NoReturn:
+        """
+        Apply the symmetry constraints of the crystals, unless nothing they depend on has changed since the last time.
+        This is expensive (hundreds of ms for a typical phase).
+        """
+        if self._cryspy_obj.crystals is None:
+            return
+        if self._constraints_version == self._mapping_cache.version:
+            self._constraint_calls['skipped'] += 1
+            return
+        self._cryspy_obj.apply_constraint()
+        self._constraint_calls['applied'] += 1
+        self._constraints_version = self._mapping_cache.version
+
+    def constraintInfo(self) -> dict:
+        """
+        Number of times the crystal constraints were applied and skipped as nothing had changed
+        """
+        return dict(self._constraint_calls)
+
+    @staticmethod
+    def _parameterState(obj) -> dict:
+        """
+        The project dictionary `store` fields which are set from a calculator object
+        """
+        if not isinstance(obj, cryspy.common.cl_fitable.Fitable):
+            return {'value': obj}
+        return {'value': obj.value,
+                'error': obj.sigma,
+                'constraint': obj.constraint,
+                'hide': obj.constraint_flag,
+                'refine': obj.refinement}
+
+    def trackParameters(self, group: str, mappings: List[str]) -> NoReturn:
+        """
+        Take a snapshot of mapped parameters so that `getChangedParameters` can report what has changed since.
+
+        :param group: Name of the group of parameters, e.g. `phases` or `experiments`
+        :param mappings: list of mapping strings in the group
+        """
+        state = {}
+        constrained = set()
+        fitables = {}
+        for mapping in mappings:
+            try:
+                obj = self._mapping_cache.getItem(mapping)
+            except TypeError:
+                continue
+            state[mapping] = self._parameterState(obj)
+            if isinstance(obj, cryspy.common.cl_fitable.Fitable):
+                fitables.setdefault(id(obj), []).append(mapping)
+                if obj.constraint_flag:
+                    constrained.add(mapping)
+        self._tracked_parameters[group] = dict(version=self._mapping_cache.version, state=state,
+                                               constrained=constrained, fitables=fitables)
+        self._dirty_parameters.difference_update(state.keys())
+
+    def _markDirty(self, fitables: list) -> NoReturn:
+        for tracked in self._tracked_parameters.values():
+            for fitable in fitables:
+                self._dirty_parameters.update(tracked['fitables'].get(id(fitable), []))
+
+    def getChangedParameters(self, group: str) -> Optional[dict]:
+        """
+        Report the parameters of a tracked group which have changed since the last call or `trackParameters`. Only
+        parameters set through the mapping updaters, refined or constrained are checked.
+
+        :param group: Name of the group of parameters
+        :return: Dictionary of mapping: `store` fields, or None if the group is not tracked or the calculator
+                 structure has changed and a full rebuild is needed.
+        """
+        tracked = self._tracked_parameters.get(group, None)
+        if tracked is None or tracked['version'] != self._mapping_cache.version:
+            return None
+        state = tracked['state']
+        candidates = self._dirty_parameters.intersection(state.keys())
+        if not candidates:
+            return {}
+        # Constrained parameters can only have moved if something else in the group did
+        self._applyConstraints()
+        candidates.update(tracked['constrained'])
+        changed = {}
+        for mapping in candidates:
+            try:
+                new_state = self._parameterState(self._mapping_cache.getItem(mapping))
+            except TypeError:
+                return None
+            if new_state != state[mapping]:
+                state[mapping] = new_state
+                changed[mapping] = new_state
+        self._dirty_parameters.difference_update(candidates)
+        return changed
 
     # TODO this section needs to be modified. Main rcif needs to be moved to interface and this implementation removed
     def getProjectName(self) -> str:
@@ -1017,7 +1949,8 @@ class CryspyCalculator:
         else:
             self._cryspy_obj.crystals = [phase_obj]
         self._phase_names = [phase.data_name for phase in self._cryspy_obj.crystals]
-        self._cryspy_obj.apply_constraint()
+        self._mapping_cache.invalidate()
+        self._applyConstraints()
 
     @time_it
     def addExperiment(self, experiment: Experiment) -> NoReturn:
@@ -1027,6 +1960,7 @@ class CryspyCalculator:
         else:
             self._cryspy_obj.experiments = [exp_obj]
         self._experiment_names = [experiment.data_name for experiment in self._cryspy_obj.experiments]
+        self._mapping_cache.invalidate()
 
     @staticmethod
     def _createPhaseObj(phase: Phase) -> Crystal:
@@ -1069,7 +2003,7 @@ class CryspyCalculator:
             atom = phase['atoms'][atom_label]
             atom_site = dict()
             atom_site['label'] = atom_label
-            atom_site['type_symbol'] = atom['type_symbol']
+            atom_site['type_symbol'] = atom['type_symbol'].value
             atom_site['fract_x'] = atom['fract_x'].value
             atom_site['fract_y'] = atom['fract_y'].value
             atom_site['fract_z'] = atom['fract_z'].value
@@ -1202,6 +2136,7 @@ class CryspyCalculator:
         idx = self._experiment_names.index(exp_name)
         self._cryspy_obj.experiments[idx].phase = PhaseL(
             [cryspyPhaseObj, *self._cryspy_obj.experiments[idx].phase.item])
+        self._mapping_cache.invalidate()
         self._log.info('Associated phase %s to experiment %s', phase_name, exp_name)
 
     def disassociatePhaseFromExp(self, exp_name: str, phase_name: str) -> NoReturn:
@@ -1210,6 +2145,7 @@ class CryspyCalculator:
         exp_phases = PhaseL(
             [exp_phases.item[i] for i, item in enumerate(exp_phases.item) if exp_phases.items[i][0] != phase_name])
         self._cryspy_obj.experiments[idx].phase = exp_phases
+        self._mapping_cache.invalidate()
         self._log.info('Disassociated phase %s from experiment %s', phase_name, exp_name)
 
     def getPhasesAssocatedToExp(self, exp_name: str) -> list:
@@ -1274,7 +2210,7 @@ class CryspyCalculator:
         resolution['y']['mapping'] = mapping_exp + '.resolution.y'
 
         # Measured data points
-        x_obs = np.array(calculator_experiment.meas.ttheta).tolist()
+        x_obs = np.array(calculator_experiment.meas.ttheta, dtype=np.float64)
         y_obs_up = None
         sy_obs_up = None
         y_obs_diff = None
@@ -1284,19 +2220,17 @@ class CryspyCalculator:
         y_obs = None
         sy_obs = None
         if calculator_experiment.meas.intensity[0] is not None:
-            y_obs = np.array(calculator_experiment.meas.intensity).tolist()
-            sy_obs = np.array(calculator_experiment.meas.intensity_sigma).tolist()
+            y_obs = np.array(calculator_experiment.meas.intensity, dtype=np.float64)
+            sy_obs = np.array(calculator_experiment.meas.intensity_sigma, dtype=np.float64)
         elif calculator_experiment.meas.intensity_up[0] is not None:
-            y_obs_up = np.array(calculator_experiment.meas.intensity_up)
-            sy_obs_up = np.array(calculator_experiment.meas.intensity_up_sigma).tolist()
-            y_obs_down = np.array(calculator_experiment.meas.intensity_down)
-            sy_obs_down = np.array(calculator_experiment.meas.intensity_down_sigma).tolist()
-            y_obs = (y_obs_up + y_obs_down).tolist()
-            y_obs_diff = (y_obs_up - y_obs_down).tolist()
-            sy_obs_diff = np.sqrt(np.square(sy_obs_up) + np.square(sy_obs_down)).tolist()
-            y_obs_up = y_obs_up.tolist()
-            y_obs_down = y_obs_down.tolist()
-            sy_obs = np.sqrt(np.square(sy_obs_up) + np.square(sy_obs_down)).tolist()
+            y_obs_up = np.array(calculator_experiment.meas.intensity_up, dtype=np.float64)
+            sy_obs_up = np.array(calculator_experiment.meas.intensity_up_sigma, dtype=np.float64)
+            y_obs_down = np.array(calculator_experiment.meas.intensity_down, dtype=np.float64)
+            sy_obs_down = np.array(calculator_experiment.meas.intensity_down_sigma, dtype=np.float64)
+            y_obs = y_obs_up + y_obs_down
+            y_obs_diff = y_obs_up - y_obs_down
+            sy_obs_diff = np.sqrt(np.square(sy_obs_up) + np.square(sy_obs_down))
+            sy_obs = np.sqrt(np.square(sy_obs_up) + np.square(sy_obs_down))
 
         data = MeasuredPattern(x_obs, y_obs, sy_obs, y_obs_diff, sy_obs_diff, y_obs_up, sy_obs_up, y_obs_down,
                                sy_obs_down)
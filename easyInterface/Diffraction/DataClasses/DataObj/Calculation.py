@@ -1,8 +1,7 @@
 from typing import Union
 
 import numpy as np
-from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedPathDict
-from easyInterface import logger as logging
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedPathDict, LoggedArrayDict
 
 
 class Limits(LoggedPathDict):
@@ -25,7 +24,6 @@ class Limits(LoggedPathDict):
                               y_max=np.amax(y_diff_upper).item())
 
         super().__init__(main=main, difference=difference)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('Created limits %s', self['main'])
 
 
@@ -36,7 +34,6 @@ class CrystalBraggPeaks(LoggedPathDict):
 
     def __init__(self, name: str, h: list, k: list, l: list, ttheta: list):
         super().__init__(name=name, h=h, k=k, l=l, ttheta=ttheta)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('Created a bragg peak %s set with %i peaks', name, len(h))
         
     def __repr__(self) -> str:
@@ -63,26 +60,28 @@ class BraggPeaks(LoggedPathDict):
                 theseCalculations[bragg_peak['name']] = bragg_peak
             bragg_peaks = theseCalculations
         super().__init__(**bragg_peaks)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self) -> str:
         return '{} Calculations'.format(len(self))
 
 
-class CalculatedPattern(LoggedPathDict):
+class CalculatedPattern(LoggedArrayDict):
     """
-    Storage container for a calculated pattern
+    Storage container for a calculated pattern. The data columns are float64 numpy arrays sharing a single block, see
+    `getArray` and `asBlock`. Item access returns them as lists, except for the sum and difference of up and down.
     """
+    _array_columns = ('y_calc_sum', 'y_calc_diff')
+
     def __init__(self, x: list, y_diff_lower: list, y_diff_upper: list, y_calc_up: list, y_calc_down: list = [], y_calc_bkg: list = []):
-        y_calc_down_temp = y_calc_down
+        y_calc_up_temp = np.asarray(y_calc_up, dtype=np.float64)
+        y_calc_down_temp = np.asarray(y_calc_down, dtype=np.float64)
         if len(y_calc_down) == 0:
-            y_calc_down_temp = [0]*len(y_calc_up)
+            y_calc_down_temp = np.zeros_like(y_calc_up_temp)
 
-        super().__init__(x=x, y_calc_sum=np.array(y_calc_up) + np.array(y_calc_down_temp), y_calc_diff=np.array(y_calc_up) - np.array(y_calc_down_temp),
+        super().__init__(x=x, y_calc_sum=y_calc_up_temp + y_calc_down_temp, y_calc_diff=y_calc_up_temp - y_calc_down_temp,
                          y_calc_up=y_calc_up, y_calc_down=y_calc_down,
                          y_diff_lower=y_diff_lower, y_diff_upper=y_diff_upper,
                          y_calc_bkg=y_calc_bkg)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self):
         return 'Pattern of {} points'.format(len(self['x']))
@@ -94,7 +93,6 @@ class Calculation(LoggedPathDict):
     """
     def __init__(self, name: str, bragg_peaks: BraggPeaks, calculated_pattern: CalculatedPattern, limits: Limits):
         super().__init__(name=name, bragg_peaks=bragg_peaks, calculated_pattern=calculated_pattern, limits=limits)
-        self._log = logging.getLogger(__class__.__module__)
 
     @classmethod
     def default(cls, name: str):
@@ -136,7 +134,6 @@ class Calculations(LoggedPathDict):
                 theseCalculations[calculation['name']] = calculation
             calculations = theseCalculations
         super().__init__(**calculations)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self) -> str:
         return '{} Calculations'.format(len(self))
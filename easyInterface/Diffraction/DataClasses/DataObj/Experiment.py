@@ -1,10 +1,7 @@
 from typing import Union
 
-import numpy as np
-
-from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedPathDict
-from ..Utils.BaseClasses import Base, ContainerObj
-from easyInterface import logger as logging
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedPathDict, LoggedArrayDict
+from ..Utils.BaseClasses import Base, ContainerObj, Details, setDetails
 
 EXPERIMENT_DETAILS = {
     'wavelength': {
@@ -74,6 +71,13 @@ class Resolution(LoggedPathDict):
     """
     Data store for the resolution parameters
     """
+    _parameter_details = {
+        'u': Details.fromTable(RESOLUTION_DETAILS['UVWXY']),
+        'v': Details.fromTable(RESOLUTION_DETAILS['UVWXY']),
+        'w': Details.fromTable(RESOLUTION_DETAILS['UVWXY']),
+        'x': Details.fromTable(RESOLUTION_DETAILS['UVWXY']),
+        'y': Details.fromTable(RESOLUTION_DETAILS['UVWXY']),
+    }
 
     def __init__(self, u: Base, v: Base, w: Base, x: Base, y: Base):
         """
@@ -86,27 +90,8 @@ class Resolution(LoggedPathDict):
         :param y:  resolution parameter y
         """
         super().__init__(u=u, v=v, w=w, x=x, y=y)
-        self._log = logging.getLogger(__class__.__module__)
-
-        self.setItemByPath(['u', 'header'], RESOLUTION_DETAILS['UVWXY']['header'])
-        self.setItemByPath(['u', 'tooltip'], RESOLUTION_DETAILS['UVWXY']['tooltip'])
-        self.setItemByPath(['u', 'url'], RESOLUTION_DETAILS['UVWXY']['url'])
-
-        self.setItemByPath(['v', 'header'], RESOLUTION_DETAILS['UVWXY']['header'])
-        self.setItemByPath(['v', 'tooltip'], RESOLUTION_DETAILS['UVWXY']['tooltip'])
-        self.setItemByPath(['v', 'url'], RESOLUTION_DETAILS['UVWXY']['url'])
 
-        self.setItemByPath(['w', 'header'], RESOLUTION_DETAILS['UVWXY']['header'])
-        self.setItemByPath(['w', 'tooltip'], RESOLUTION_DETAILS['UVWXY']['tooltip'])
-        self.setItemByPath(['w', 'url'], RESOLUTION_DETAILS['UVWXY']['url'])
-
-        self.setItemByPath(['x', 'header'], RESOLUTION_DETAILS['UVWXY']['header'])
-        self.setItemByPath(['x', 'tooltip'], RESOLUTION_DETAILS['UVWXY']['tooltip'])
-        self.setItemByPath(['x', 'url'], RESOLUTION_DETAILS['UVWXY']['url'])
-
-        self.setItemByPath(['y', 'header'], RESOLUTION_DETAILS['UVWXY']['header'])
-        self.setItemByPath(['y', 'tooltip'], RESOLUTION_DETAILS['UVWXY']['tooltip'])
-        self.setItemByPath(['y', 'url'], RESOLUTION_DETAILS['UVWXY']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'Resolution':
@@ -150,6 +135,9 @@ class Background(LoggedPathDict):
     """
     Data store for the background data parameters
     """
+    _parameter_details = {
+        'intensity': Details.fromTable(INTENSITY_DETAILS['intensity']),
+    }
 
     def __init__(self, ttheta: float, intensity: Base):
         """
@@ -160,10 +148,7 @@ class Background(LoggedPathDict):
         :return: Background data object
         """
         super().__init__(name=str(ttheta), ttheta=ttheta, intensity=intensity)
-        self._log = logging.getLogger(__class__.__module__)
-        self.setItemByPath(['intensity', 'header'], INTENSITY_DETAILS['intensity']['header'])
-        self.setItemByPath(['intensity', 'tooltip'], INTENSITY_DETAILS['intensity']['tooltip'])
-        self.setItemByPath(['intensity', 'url'], INTENSITY_DETAILS['intensity']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'Background':
@@ -204,7 +189,6 @@ class Backgrounds(ContainerObj):
         :param backgrounds: Background parameters formed from Background dicts
         """
         super().__init__(backgrounds, Background)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self):
         return '{} Backgrounds'.format(len(self))
@@ -218,9 +202,10 @@ class Backgrounds(ContainerObj):
         super().__init__(new_bg, Background)
 
 
-class MeasuredPattern(LoggedPathDict):
+class MeasuredPattern(LoggedArrayDict):
     """
-    Storage container for measured patterns
+    Storage container for measured patterns. The data columns are float64 numpy arrays sharing a single block, see
+    `getArray` and `asBlock`. Item access returns them as lists.
     """
 
     def __init__(self, x: list, y_obs: list, sy_obs: list,
@@ -243,7 +228,6 @@ class MeasuredPattern(LoggedPathDict):
         super().__init__(x=x, y_obs=y_obs, sy_obs=sy_obs, y_obs_diff=y_obs_diff, sy_obs_diff=sy_obs_diff,
                          y_obs_up=y_obs_up, sy_obs_up=sy_obs_up,
                          y_obs_down=y_obs_down, sy_obs_down=sy_obs_down)
-        self._log = logging.getLogger(__class__.__module__)
         # # 1d unpolarised powder diffraction data
         # else:
         #     super().__init__(x=x, y_obs=y_obs, sy_obs=sy_obs)
@@ -267,7 +251,7 @@ class MeasuredPattern(LoggedPathDict):
 
         :return: value of upper confidence bound
         """
-        return (np.array(self['y_obs']) + np.array(self['sy_obs'])).tolist()
+        return (self.getArray('y_obs') + self.getArray('sy_obs')).tolist()
 
     @property
     def y_obs_lower(self) -> list:
@@ -276,7 +260,7 @@ class MeasuredPattern(LoggedPathDict):
 
         :return: value of lower confidence bound
         """
-        return (np.array(self['y_obs']) - np.array(self['sy_obs'])).tolist()
+        return (self.getArray('y_obs') - self.getArray('sy_obs')).tolist()
 
     @classmethod
     def default(cls, polarised: bool = False):
@@ -309,6 +293,9 @@ class ExperimentPhase(LoggedPathDict):
     """
     Storage container for the Experimental Phase details
     """
+    _parameter_details = {
+        'scale': Details.fromTable(SCALE_DETAILS['scale']),
+    }
 
     def __init__(self, name: str, scale: Base):
         """
@@ -317,11 +304,8 @@ class ExperimentPhase(LoggedPathDict):
         :param scale: phase scale as data object
         """
         super().__init__(name=name, scale=scale)
-        self._log = logging.getLogger(__class__.__module__)
 
-        self.setItemByPath(['scale', 'header'], SCALE_DETAILS['scale']['header'])
-        self.setItemByPath(['scale', 'tooltip'], SCALE_DETAILS['scale']['tooltip'])
-        self.setItemByPath(['scale', 'url'], SCALE_DETAILS['scale']['url'])
+        setDetails(self, self._parameter_details)
 
         self._log.debug('Created phase: {}'.format(self))
 
@@ -361,7 +345,6 @@ class ExperimentPhases(ContainerObj):
         :param experiments: A collection of experimental dicts
         """
         super().__init__(experiment_phases, ExperimentPhase)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self) -> str:
         return '{} Experimental phases'.format(len(self))
@@ -399,16 +382,15 @@ class RefinementType(LoggedPathDict):
 
 
 class Polarization(LoggedPathDict):
+    _parameter_details = {
+        'polarization': Details.fromTable(POLARIZATION_DETAILS['polarization']),
+        'efficiency': Details.fromTable(POLARIZATION_DETAILS['efficiency']),
+    }
+
     def __init__(self, polarization: Base, efficiency: Base):
         super().__init__(polarization=polarization, efficiency=efficiency)
 
-        self.setItemByPath(['polarization', 'header'], POLARIZATION_DETAILS['polarization']['header'])
-        self.setItemByPath(['polarization', 'tooltip'], POLARIZATION_DETAILS['polarization']['tooltip'])
-        self.setItemByPath(['polarization', 'url'], POLARIZATION_DETAILS['polarization']['url'])
-
-        self.setItemByPath(['efficiency', 'header'], POLARIZATION_DETAILS['efficiency']['header'])
-        self.setItemByPath(['efficiency', 'tooltip'], POLARIZATION_DETAILS['efficiency']['tooltip'])
-        self.setItemByPath(['efficiency', 'url'], POLARIZATION_DETAILS['efficiency']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls):
@@ -427,6 +409,11 @@ class Experiment(LoggedPathDict):
     """
     Experimental details data container
     """
+    _parameter_details = {
+        'wavelength': Details.fromTable(EXPERIMENT_DETAILS['wavelength']),
+        'offset': Details.fromTable(EXPERIMENT_DETAILS['offset']),
+        'magnetic_field': Details.fromTable(EXPERIMENT_DETAILS['magnetic_field']),
+    }
 
     def __init__(self, name: str, wavelength: Base, offset: Base, magnetic_field: Base, phase: ExperimentPhases,
                  background: Backgrounds,
@@ -450,19 +437,8 @@ class Experiment(LoggedPathDict):
                          background=background,
                          resolution=resolution, measured_pattern=measured_pattern, refinement_type=refinement_type,
                          polarization=Polarization.default())
-        self._log = logging.getLogger(__class__.__module__)
-
-        self.setItemByPath(['wavelength', 'header'], EXPERIMENT_DETAILS['wavelength']['header'])
-        self.setItemByPath(['wavelength', 'tooltip'], EXPERIMENT_DETAILS['wavelength']['tooltip'])
-        self.setItemByPath(['wavelength', 'url'], EXPERIMENT_DETAILS['wavelength']['url'])
-
-        self.setItemByPath(['offset', 'header'], EXPERIMENT_DETAILS['offset']['header'])
-        self.setItemByPath(['offset', 'tooltip'], EXPERIMENT_DETAILS['offset']['tooltip'])
-        self.setItemByPath(['offset', 'url'], EXPERIMENT_DETAILS['offset']['url'])
 
-        self.setItemByPath(['magnetic_field', 'header'], EXPERIMENT_DETAILS['magnetic_field']['header'])
-        self.setItemByPath(['magnetic_field', 'tooltip'], EXPERIMENT_DETAILS['magnetic_field']['tooltip'])
-        self.setItemByPath(['magnetic_field', 'url'], EXPERIMENT_DETAILS['magnetic_field']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls, name: str) -> 'Experiment':
@@ -520,7 +496,6 @@ class Experiments(ContainerObj):
         :param experiments: A collection of experimental dicts
         """
         super().__init__(experiments, Experiment)
-        self._log = logging.getLogger(__class__.__module__)
 
     def __repr__(self) -> str:
         return '{} Experiments'.format(len(self))
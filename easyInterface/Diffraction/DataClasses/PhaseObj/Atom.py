@@ -1,7 +1,6 @@
 from typing import Union
 
-from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base, ContainerObj, LoggedPathDict
-from easyInterface import logger as logging
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base, ContainerObj, Details, LoggedPathDict, setDetails
 
 ATOM_DETAILS = {
     'type_symbol': {
@@ -61,6 +60,17 @@ class Atom(LoggedPathDict):
     """
     Storage for details about an atom
     """
+    _parameter_details = {
+        'type_symbol': Details.fromTable(ATOM_DETAILS['type_symbol']),
+        'scat_length_neutron': Details.fromTable(ATOM_DETAILS['scat_length_neutron']),
+        'fract_x': Details.fromTable(ATOM_DETAILS['fract'], header='x'),
+        'fract_y': Details.fromTable(ATOM_DETAILS['fract'], header='y'),
+        'fract_z': Details.fromTable(ATOM_DETAILS['fract'], header='z'),
+        'occupancy': Details.fromTable(ATOM_DETAILS['occupancy']),
+        'adp_type': Details.fromTable(ATOM_DETAILS['adp_type']),
+        'U_iso_or_equiv': Details.fromTable(ATOM_DETAILS['U_iso_or_equiv']),
+    }
+
     def __init__(self, atom_site_label: str, type_symbol: Base, scat_length_neutron: Base,
                  fract_x: Base, fract_y: Base, fract_z: Base, occupancy: Base, adp_type: Base, U_iso_or_equiv: Base,
                  ADp: 'ADP', MSp: 'MSP'):
@@ -82,40 +92,8 @@ class Atom(LoggedPathDict):
         super().__init__(atom_site_label=atom_site_label, type_symbol=type_symbol,
                          scat_length_neutron=scat_length_neutron, fract_x=fract_x, fract_y=fract_y, fract_z=fract_z,
                          occupancy=occupancy, adp_type=adp_type, U_iso_or_equiv=U_iso_or_equiv, ADP=ADp, MSP=MSp)
-        self._log = logging.getLogger(__class__.__module__)
-
-
-        self.setItemByPath(['type_symbol', 'header'], ATOM_DETAILS['type_symbol']['header'])
-        self.setItemByPath(['type_symbol', 'tooltip'], ATOM_DETAILS['type_symbol']['tooltip'])
-        self.setItemByPath(['type_symbol', 'url'], ATOM_DETAILS['type_symbol']['url'])
-
-        self.setItemByPath(['scat_length_neutron', 'header'], ATOM_DETAILS['scat_length_neutron']['header'])
-        self.setItemByPath(['scat_length_neutron', 'tooltip'], ATOM_DETAILS['scat_length_neutron']['tooltip'])
-        self.setItemByPath(['scat_length_neutron', 'url'], ATOM_DETAILS['scat_length_neutron']['url'])
-
-        self.setItemByPath(['fract_x', 'header'], 'x')
-        self.setItemByPath(['fract_x', 'tooltip'], ATOM_DETAILS['fract']['tooltip'])
-        self.setItemByPath(['fract_x', 'url'], ATOM_DETAILS['fract']['url'])
-
-        self.setItemByPath(['fract_y', 'header'], 'y')
-        self.setItemByPath(['fract_y', 'tooltip'], ATOM_DETAILS['fract']['tooltip'])
-        self.setItemByPath(['fract_y', 'url'], ATOM_DETAILS['fract']['url'])
 
-        self.setItemByPath(['fract_z', 'header'], 'z')
-        self.setItemByPath(['fract_z', 'tooltip'], ATOM_DETAILS['fract']['tooltip'])
-        self.setItemByPath(['fract_z', 'url'], ATOM_DETAILS['fract']['url'])
-
-        self.setItemByPath(['occupancy', 'header'], ATOM_DETAILS['occupancy']['header'])
-        self.setItemByPath(['occupancy', 'tooltip'], ATOM_DETAILS['occupancy']['tooltip'])
-        self.setItemByPath(['occupancy', 'url'], ATOM_DETAILS['occupancy']['url'])
-
-        self.setItemByPath(['adp_type', 'header'], ATOM_DETAILS['adp_type']['header'])
-        self.setItemByPath(['adp_type', 'tooltip'], ATOM_DETAILS['adp_type']['tooltip'])
-        self.setItemByPath(['adp_type', 'url'], ATOM_DETAILS['adp_type']['url'])
-
-        self.setItemByPath(['U_iso_or_equiv', 'header'], ATOM_DETAILS['U_iso_or_equiv']['header'])
-        self.setItemByPath(['U_iso_or_equiv', 'tooltip'], ATOM_DETAILS['U_iso_or_equiv']['tooltip'])
-        self.setItemByPath(['U_iso_or_equiv', 'url'], ATOM_DETAILS['U_iso_or_equiv']['url'])
+        setDetails(self, self._parameter_details)
 
         self._log.debug('Atom created: %s', self)
 
@@ -221,7 +199,6 @@ class Atoms(ContainerObj):
         :param atoms: Collection of atoms
         """
         super().__init__(atoms, Atom, 'atom_site_label')
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('Atoms created: %s', self)
 
     def __repr__(self) -> str:
@@ -232,37 +209,23 @@ class ADP(LoggedPathDict):
     """
     Data store for Atom site anisotropic displacement parameters
     """
+    _parameter_details = {
+        'u_11': Details.fromTable(ATOM_DETAILS['ADP'], header='U11'),
+        'u_12': Details.fromTable(ATOM_DETAILS['ADP'], header='U12'),
+        'u_13': Details.fromTable(ATOM_DETAILS['ADP'], header='U13'),
+        'u_22': Details.fromTable(ATOM_DETAILS['ADP'], header='U22'),
+        'u_23': Details.fromTable(ATOM_DETAILS['ADP'], header='U23'),
+        'u_33': Details.fromTable(ATOM_DETAILS['ADP'], header='U33'),
+    }
+
     def __init__(self,
                  u_11: Base, u_22: Base, u_33: Base,
                  u_12: Base, u_13: Base, u_23: Base):
         super().__init__(u_11=u_11, u_22=u_22, u_33=u_33,
                          u_12=u_12, u_13=u_13, u_23=u_23)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('ADP created: %s', self)
 
-        self.setItemByPath(['u_11', 'header'], 'U11')
-        self.setItemByPath(['u_11', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_11', 'url'], ATOM_DETAILS['ADP']['url'])
-
-        self.setItemByPath(['u_12', 'header'], 'U12')
-        self.setItemByPath(['u_12', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_12', 'url'], ATOM_DETAILS['ADP']['url'])
-
-        self.setItemByPath(['u_13', 'header'], 'U13')
-        self.setItemByPath(['u_13', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_13', 'url'], ATOM_DETAILS['ADP']['url'])
-
-        self.setItemByPath(['u_22', 'header'], 'U22')
-        self.setItemByPath(['u_22', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_22', 'url'], ATOM_DETAILS['ADP']['url'])
-
-        self.setItemByPath(['u_23', 'header'], 'U23')
-        self.setItemByPath(['u_23', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_23', 'url'], ATOM_DETAILS['ADP']['url'])
-
-        self.setItemByPath(['u_33', 'header'], 'U33')
-        self.setItemByPath(['u_33', 'tooltip'], ATOM_DETAILS['ADP']['tooltip'])
-        self.setItemByPath(['u_33', 'url'], ATOM_DETAILS['ADP']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'ADP':
@@ -301,39 +264,24 @@ class MSP(LoggedPathDict):
     """
     Data store for Atom site magnetic susceptibility parameters
     """
+    _parameter_details = {
+        'type': Details('Type', '', ''),
+        'chi_11': Details.fromTable(ATOM_DETAILS['MSP'], header='U11'),
+        'chi_12': Details.fromTable(ATOM_DETAILS['MSP'], header='U12'),
+        'chi_13': Details.fromTable(ATOM_DETAILS['MSP'], header='U13'),
+        'chi_22': Details.fromTable(ATOM_DETAILS['MSP'], header='U22'),
+        'chi_23': Details.fromTable(ATOM_DETAILS['MSP'], header='U23'),
+        'chi_33': Details.fromTable(ATOM_DETAILS['MSP'], header='U33'),
+    }
+
     def __init__(self, MSPtype: Base,
                  chi_11: Base, chi_22: Base, chi_33: Base,
                  chi_12: Base, chi_13: Base, chi_23: Base):
         super().__init__(type=MSPtype, chi_11=chi_11, chi_22=chi_22, chi_33=chi_33,
                          chi_12=chi_12, chi_13=chi_13, chi_23=chi_23)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('MSP created: %s', self)
 
-        self.setItemByPath(['type', 'header'], 'Type')
-
-        self.setItemByPath(['chi_11', 'header'], 'U11')
-        self.setItemByPath(['chi_11', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_11', 'url'], ATOM_DETAILS['MSP']['url'])
-
-        self.setItemByPath(['chi_12', 'header'], 'U12')
-        self.setItemByPath(['chi_12', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_12', 'url'], ATOM_DETAILS['MSP']['url'])
-
-        self.setItemByPath(['chi_13', 'header'], 'U13')
-        self.setItemByPath(['chi_13', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_13', 'url'], ATOM_DETAILS['MSP']['url'])
-
-        self.setItemByPath(['chi_22', 'header'], 'U22')
-        self.setItemByPath(['chi_22', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_22', 'url'], ATOM_DETAILS['MSP']['url'])
-
-        self.setItemByPath(['chi_23', 'header'], 'U23')
-        self.setItemByPath(['chi_23', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_23', 'url'], ATOM_DETAILS['MSP']['url'])
-
-        self.setItemByPath(['chi_33', 'header'], 'U33')
-        self.setItemByPath(['chi_33', 'tooltip'], ATOM_DETAILS['MSP']['tooltip'])
-        self.setItemByPath(['chi_33', 'url'], ATOM_DETAILS['MSP']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'MSP':
@@ -1,5 +1,4 @@
-from ..Utils.BaseClasses import Base, LoggedPathDict
-from easyInterface import logger as logging
+from ..Utils.BaseClasses import Base, Details, LoggedPathDict, setDetails
 
 CELL_DETAILS = {
     'length': {
@@ -21,6 +20,14 @@ class Cell(LoggedPathDict):
     """
     Container for crystallographic unit cell parameters
     """
+    _parameter_details = {
+        'length_a': Details.fromTable(CELL_DETAILS['length'], header='a (Å)'),
+        'length_b': Details.fromTable(CELL_DETAILS['length'], header='b (Å)'),
+        'length_c': Details.fromTable(CELL_DETAILS['length'], header='c (Å)'),
+        'angle_alpha': Details.fromTable(CELL_DETAILS['angle'], header='alpha (°)'),
+        'angle_beta': Details.fromTable(CELL_DETAILS['angle'], header='beta (°)'),
+        'angle_gamma': Details.fromTable(CELL_DETAILS['angle'], header='gamma (°)'),
+    }
 
     def __init__(self, length_a: Base, length_b: Base, length_c: Base,
                  angle_alpha: Base, angle_beta: Base, angle_gamma: Base):
@@ -37,32 +44,9 @@ class Cell(LoggedPathDict):
 
         super().__init__(length_a=length_a, length_b=length_b, length_c=length_c,
                          angle_alpha=angle_alpha, angle_beta=angle_beta, angle_gamma=angle_gamma)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('Cell created: %s', self)
 
-        self.setItemByPath(['length_a', 'header'], 'a (Å)')
-        self.setItemByPath(['length_a', 'tooltip'], CELL_DETAILS['length']['tooltip'])
-        self.setItemByPath(['length_a', 'url'], CELL_DETAILS['length']['url'])
-
-        self.setItemByPath(['length_b', 'header'], 'b (Å)')
-        self.setItemByPath(['length_b', 'tooltip'], CELL_DETAILS['length']['tooltip'])
-        self.setItemByPath(['length_b', 'url'], CELL_DETAILS['length']['url'])
-
-        self.setItemByPath(['length_c', 'header'], 'c (Å)')
-        self.setItemByPath(['length_c', 'tooltip'], CELL_DETAILS['length']['tooltip'])
-        self.setItemByPath(['length_c', 'url'], CELL_DETAILS['length']['url'])
-
-        self.setItemByPath(['angle_alpha', 'header'], 'alpha (°)')
-        self.setItemByPath(['angle_alpha', 'tooltip'], CELL_DETAILS['angle']['tooltip'])
-        self.setItemByPath(['angle_alpha', 'url'], CELL_DETAILS['angle']['url'])
-
-        self.setItemByPath(['angle_beta', 'header'], 'beta (°)')
-        self.setItemByPath(['angle_beta', 'tooltip'], CELL_DETAILS['angle']['tooltip'])
-        self.setItemByPath(['angle_beta', 'url'], CELL_DETAILS['angle']['url'])
-
-        self.setItemByPath(['angle_gamma', 'header'], 'gamma (°)')
-        self.setItemByPath(['angle_gamma', 'tooltip'], CELL_DETAILS['angle']['tooltip'])
-        self.setItemByPath(['angle_gamma', 'url'], CELL_DETAILS['angle']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'Cell':
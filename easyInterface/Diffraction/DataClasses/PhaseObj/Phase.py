@@ -3,7 +3,6 @@ from .Atom import *
 from .SpaceGroup import *
 from .Cell import *
 
-from easyInterface import logger as logging
 from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import ContainerObj, LoggedPathDict
 
 
@@ -26,7 +25,6 @@ class Phase(LoggedPathDict):
             }
         atoms = Atoms(atoms)
         super().__init__(phasename=name, spacegroup=spacegroup, cell=cell, atoms=atoms, sites=sites)
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('New phase created %s', name)
 
     @classmethod
@@ -66,7 +64,6 @@ class Phases(ContainerObj):
         :param phases: Collection of phases
         """
         super().__init__(phases, Phase, 'phasename')
-        self._log = logging.getLogger(__class__.__module__)
         self._log.debug('Phases created: %s', self)
 
     def renamePhase(self, old_phase_name: str, new_phase_name: str) -> NoReturn:
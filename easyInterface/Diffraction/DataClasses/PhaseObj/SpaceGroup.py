@@ -1,5 +1,4 @@
-from ..Utils.BaseClasses import Base, LoggedPathDict
-from easyInterface import logger as logging
+from ..Utils.BaseClasses import Base, Details, LoggedPathDict, setDetails
 
 SG_DETAILS = {
     'crystal_system': {
@@ -30,26 +29,19 @@ SG_DETAILS = {
 
 
 class SpaceGroup(LoggedPathDict):
+    _parameter_details = {
+        'crystal_system': Details.fromTable(SG_DETAILS['crystal_system']),
+        'space_group_name_HM_ref': Details.fromTable(SG_DETAILS['space_group_name_HM_ref']),
+        'space_group_IT_number': Details.fromTable(SG_DETAILS['space_group_IT_number']),
+        'origin_choice': Details.fromTable(SG_DETAILS['origin_choice']),
+    }
+
     def __init__(self, crystal_system: Base, space_group_name_HM_ref: Base, space_group_IT_number: Base, origin_choice: Base):
         super().__init__(crystal_system=crystal_system, space_group_name_HM_ref=space_group_name_HM_ref,
                          space_group_IT_number=space_group_IT_number, origin_choice=origin_choice)
-        self._log = logging.getLogger(__class__.__module__)
-
-        self.setItemByPath(['crystal_system', 'header'], SG_DETAILS['crystal_system']['header'])
-        self.setItemByPath(['crystal_system', 'tooltip'], SG_DETAILS['crystal_system']['tooltip'])
-        self.setItemByPath(['crystal_system', 'url'], SG_DETAILS['crystal_system']['url'])
-
-        self.setItemByPath(['space_group_name_HM_ref', 'header'], SG_DETAILS['space_group_name_HM_ref']['header'])
-        self.setItemByPath(['space_group_name_HM_ref', 'tooltip'], SG_DETAILS['space_group_name_HM_ref']['tooltip'])
-        self.setItemByPath(['space_group_name_HM_ref', 'url'], SG_DETAILS['space_group_name_HM_ref']['url'])
 
-        self.setItemByPath(['space_group_IT_number', 'header'], SG_DETAILS['space_group_IT_number']['header'])
-        self.setItemByPath(['space_group_IT_number', 'tooltip'], SG_DETAILS['space_group_IT_number']['tooltip'])
-        self.setItemByPath(['space_group_IT_number', 'url'], SG_DETAILS['space_group_IT_number']['url'])
+        setDetails(self, self._parameter_details)
 
-        self.setItemByPath(['origin_choice', 'header'], SG_DETAILS['origin_choice']['header'])
-        self.setItemByPath(['origin_choice', 'tooltip'], SG_DETAILS['origin_choice']['tooltip'])
-        self.setItemByPath(['origin_choice', 'url'], SG_DETAILS['origin_choice']['url'])
         self._log.debug('Spacegroup created: %s', self)
 
     def __repr__(self) -> str:
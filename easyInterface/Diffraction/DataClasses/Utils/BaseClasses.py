@@ -1,6 +1,10 @@
+import hashlib
+
 import numpy as np
 from copy import deepcopy
-from typing import Union, Optional, Any, NoReturn
+from collections import UserDict, namedtuple
+from collections.abc import MutableMapping
+from typing import Union, Optional, Any, NoReturn, Tuple, List
 
 from easyInterface.Utils.units import Unit
 from easyInterface.Utils.DictTools import PathDict, UndoableDict
@@ -9,7 +13,18 @@ from easyInterface import logger, VERBOSE
 from abc import abstractmethod
 
 
+class _ClassLogger:
+    """
+    Logger of the module of the class it is looked up on. It is taken from the logger registry, so all instances of a
+    class share one logger and nothing is stored on the objects themselves.
+    """
+
+    def __get__(self, obj, owner) -> logging.Logger:
+        return logger.getLogger(owner.__module__)
+
+
 class LoggedClasses:
+    _log = _ClassLogger()
 
     def __init__(self):
         pass
@@ -24,13 +39,16 @@ class LoggedClasses:
         newobj = cls.__new__(cls)
         memo[id(self)] = newobj
         log_key = None
-        for k, v in self.__dict__.items():
+        state = self.__getstate__() if isinstance(self, PathDict) else self.__dict__
+        for k, v in state.items():
             if isinstance(v, logging.Logger):
                 log_key = k
                 continue
             setattr(newobj, k, deepcopy(v, memo))
         if log_key is not None:
             setattr(newobj, log_key, logging.getLogger(self.__class__.__module__))
+        if isinstance(newobj, PathDict):
+            newobj._adoptChildren()
         return newobj
 
 
@@ -48,6 +66,150 @@ class LoggedPathDict(LoggedClasses, PathDict):
         PathDict.__init__(self, *args, **kwargs)
 
 
+# Marks a deepcopy memo in which the columns of `LoggedArrayDict`s are shared, see `snapshot`
+_SHARE_COLUMNS = object()
+
+
+def snapshot(obj: Any) -> Any:
+    """
+    Deep copy which shares the numpy columns of `LoggedArrayDict` based objects instead of copying them. The columns of
+    the copy are read-only views, so they can be replaced but not written into. The time taken depends on the number
+    of parameters and not on the size of the data.
+
+    :param obj: object to be copied
+    :return: Copy of obj
+    """
+    return deepcopy(obj, {_SHARE_COLUMNS: True})
+
+
+class LoggedArrayDict(LoggedPathDict):
+    """
+    LoggedPathDict for tabulated data. Columns are stored as float64 numpy arrays and columns of the same length are
+    rows of a single contiguous 2D block, so a table is one allocation and each column is a zero-copy view.
+
+    Item access returns the columns as lists, as before they were stored as arrays, except for the `_array_columns`.
+    The arrays themselves are given by `getArray` and `asBlock`. Changing a returned list does not change the column,
+    assign the changed list instead.
+    """
+
+    # Columns which item access returns as arrays
+    _array_columns = ()
+    _digest = None
+
+    def __init__(self, **columns):
+        self._block = None
+        self._block_rows = {}
+        super().__init__(**self._packColumns(columns))
+
+    def _packColumns(self, columns: dict) -> dict:
+        """
+        Copy the columns into a new block and return the columns as views of it
+        """
+        columns = dict(columns)
+        length = None
+        for value in columns.values():
+            if value is not None:
+                length = len(value)
+                break
+        names = [key for key, value in columns.items() if value is not None and len(value) == length]
+        block = np.empty((len(names), 0 if length is None else length), dtype=np.float64)
+        rows = {}
+        for index, name in enumerate(names):
+            block[index] = columns[name]
+            rows[name] = block[index]
+        columns.update(rows)
+        self._block = block
+        self._block_rows = rows
+        return columns
+
+    def __getitem__(self, key: str) -> Any:
+        value = super().__getitem__(key)
+        if isinstance(value, np.ndarray) and key not in self._array_columns:
+            return value.tolist()
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> NoReturn:
+        if isinstance(value, (list, tuple, np.ndarray)):
+            value = np.asarray(value, dtype=np.float64)
+        self._digest = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> NoReturn:
+        self._digest = None
+        super().__delitem__(key)
+
+    def __deepcopy__(self, memo):
+        if _SHARE_COLUMNS in memo:
+            for value in (self._block, *self.data.values()):
+                if isinstance(value, np.ndarray) and id(value) not in memo:
+                    view = value.view()
+                    view.flags.writeable = False
+                    memo[id(value)] = view
+        return super().__deepcopy__(memo)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, UserDict):
+            other = other.data
+        if not isinstance(other, dict):
+            return False
+        if self.data.keys() != other.keys():
+            return False
+        for key, value in self.data.items():
+            if isinstance(value, np.ndarray) or isinstance(other[key], np.ndarray):
+                if value is None or other[key] is None or not np.array_equal(value, other[key]):
+                    return False
+            elif value != other[key]:
+                return False
+        return True
+
+    def digest(self) -> bytes:
+        """
+        SHA1 digest of the column names and data. It is worked out once and kept until a column is replaced or removed,
+        so changes made in place to a column array are not seen.
+        """
+        if self._digest is None:
+            digest = hashlib.sha1()
+            for key, value in self.data.items():
+                digest.update(key.encode())
+                if isinstance(value, np.ndarray):
+                    digest.update(np.ascontiguousarray(value))
+                else:
+                    digest.update(repr(value).encode())
+            self._digest = digest.digest()
+        return self._digest
+
+    def getArray(self, key: str) -> np.ndarray:
+        """
+        Return a column as a numpy array. This is the stored array, not a copy.
+
+        :param key: column name
+        """
+        return self.data[key]
+
+    def asBlock(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        Return the columns of equal length as a single 2D float64 array along with the column names of its rows. No
+        copy is made unless columns have been replaced since the block was created.
+
+        :return: 2D array and list of column names
+        """
+        block = self._block
+        rows = self._block_rows
+        # The block of a snapshot is a view, so compare the arrays owning the memory
+        owner = block if block.base is None else block.base
+        packed = all(self.data.get(name, None) is row and row.base is owner for name, row in rows.items())
+        packed = packed and all(name in rows for name, value in self.data.items()
+                                if isinstance(value, np.ndarray) and len(value) == block.shape[1])
+        if not packed:
+            self.data.update(self._packColumns(self.data))
+        return self._block, list(self._block_rows.keys())
+
+    def asDict(self) -> dict:
+        """Returns self as a python dictionary, with the columns as lists."""
+        return {key: value.tolist() if isinstance(value, np.ndarray) else deepcopy(value)
+                for key, value in self.data.items()}
+
+
 class ContainerObj(LoggedPathDict):
     """
     Container for multiple objects
@@ -79,10 +241,189 @@ class ContainerObj(LoggedPathDict):
         return list(self.keys())
 
 
-class Data(LoggedPathDict):
+# Units are immutable, so parameters with the same unit share one object
+_UNITS = {}
+
+
+def _getUnit(unit: Union[str, Unit]) -> Unit:
+    if isinstance(unit, Unit):
+        return unit
+    if not isinstance(unit, str):
+        return Unit(unit)
+    cached = _UNITS.get(unit, None)
+    if cached is None:
+        cached = Unit(unit)
+        _UNITS[unit] = cached
+    return cached
+
+
+class Details(namedtuple('Details', ('header', 'tooltip', 'url'))):
+    """
+    Header, tooltip and url describing a parameter. Details are immutable and interned, so all parameters built from
+    the same `*_DETAILS` entry share one object.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fromTable(cls, entry: dict, header: Optional[str] = None) -> 'Details':
+        """
+        Shared details for an entry of a `*_DETAILS` table
+
+        :param entry: table entry with `header`, `tooltip` and `url`
+        :param header: header replacing the one of the entry
+        """
+        if header is None:
+            header = entry['header']
+        return _getDetails(cls(header, entry['tooltip'], entry['url']))
+
+
+_DETAILS = {}
+
+
+def _getDetails(details: Details) -> Details:
+    return _DETAILS.setdefault(details, details)
+
+
+_NO_DETAILS = _getDetails(Details('Undefined', '', ''))
+
+
+def setDetails(obj: MutableMapping, details: dict) -> NoReturn:
+    """
+    Point the parameters of an object to their shared details
+
+    :param obj: dictionary holding the parameters
+    :param details: `Details` by parameter key
     """
-    Data class which contains the value, error, constraint, hidden and refine attributes
+    for key, item in details.items():
+        parameter = obj[key]
+        if isinstance(parameter, Base):
+            parameter._details = item
+        else:
+            parameter['header'], parameter['tooltip'], parameter['url'] = item
+
+
+def _defaultMinMax(value: Any) -> Tuple[float, float]:
+    if not isinstance(value, (int, float)):
+        return -np.Inf, np.Inf
+    if abs(value) <= 1e-8:
+        return -1, 1
+    elif value > 0:
+        return 0.8*value, 1.2*value
+    elif value < 0:
+        return 1.2*value, 0.8*value
+    return -np.Inf, np.Inf
+
+
+class SlottedPathDict(MutableMapping):
     """
+    Dictionary with a fixed set of keys which are kept in `__slots__` instead of a dict. It offers the path access
+    methods of `PathDict`. Keys can not be added, deleting a key resets it to None.
+    """
+    __slots__ = ()
+    _keys = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._keys:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> NoReturn:
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> NoReturn:
+        self[key] = None
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def getItemByPath(self, keys: list, default=None) -> Any:
+        """Returns a value in a nested object by key sequence."""
+        return PathDict.getItemByPath(self, keys, default)
+
+    def setItemByPath(self, keys: list, value: Any) -> NoReturn:
+        """Set a value in a nested object by key sequence."""
+        self.getItemByPath(keys[:-1])[keys[-1]] = value
+
+    def getItem(self, key: Union[str, list], default=None) -> Any:
+        if isinstance(key, list):
+            return self.getItemByPath(key, default)
+        return self[key] if key in self._keys else default
+
+    def setItem(self, key: Union[str, list], value: Any) -> NoReturn:
+        if isinstance(key, list):
+            self.setItemByPath(key, value)
+        else:
+            self[key] = value
+
+    def asDict(self) -> dict:
+        """Returns self as a python dictionary."""
+        return {key: value.asDict() if hasattr(value, 'asDict') else deepcopy(value) for key, value in self.items()}
+
+
+# Field values which are never changed in place, so copies of a parameter can share them
+_IMMUTABLE = (type(None), bool, int, float, complex, str, Unit)
+
+
+def _copyField(value: Any, memo: dict) -> Any:
+    if type(value) in _IMMUTABLE:
+        return value
+    return deepcopy(value, memo)
+
+
+class _Fields:
+    """
+    Value, unit, limits and refinement details of a parameter
+    """
+    __slots__ = ('value', 'unit', '_limits', 'error', 'constraint', 'hide', 'refine')
+
+    def __init__(self, value: Optional[Any] = None, unit: Optional[Union[str, Unit]] = ''):
+        self.value = value
+        self.unit = _getUnit(unit)
+        # Either a (min, max) tuple or the number from which the default min and max follow
+        self._limits = (-np.Inf, np.Inf)
+        self.error = 0
+        self.constraint = None
+        self.hide = True
+        self.refine = False
+
+    def _getLimits(self) -> Tuple[float, float]:
+        limits = self._limits
+        if type(limits) is tuple:
+            return limits
+        return _defaultMinMax(limits)
+
+    @property
+    def min(self) -> float:
+        return self._getLimits()[0]
+
+    @min.setter
+    def min(self, value):
+        self._limits = (value, self._getLimits()[1])
+
+    @property
+    def max(self) -> float:
+        return self._getLimits()[1]
+
+    @max.setter
+    def max(self, value):
+        self._limits = (self._getLimits()[0], value)
+
+
+class Data(SlottedPathDict):
+    """
+    Data class which contains the value, error, constraint, hidden and refine attributes. The `store` of a `Base` is a
+    Data object which reads and writes the fields of the `Base` itself.
+    """
+    __slots__ = ('_fields',)
+    _keys = ('value', 'unit', 'min', 'max', 'error', 'constraint', 'hide', 'refine')
 
     def __init__(self, value: Optional[Any] = None, unit: Optional[Union[str, Unit]] = ''):
         """
@@ -90,107 +431,170 @@ class Data(LoggedPathDict):
         :param value: default value for the data
         :param unit: default unit for the data in the form of a easyInterface.Untils.unit
         """
-        if not isinstance(unit, Unit):
-            # Try to convert the unit to a string
-            unit = Unit(unit)
-        super().__init__(value=value, unit=unit, min=-np.Inf, max=np.Inf, error=0, constraint=None, hide=True, refine=False)
-        self._log = logger.getLogger(__class__.__module__)
+        self._fields = _Fields(value, unit)
+
+    @classmethod
+    def _view(cls, fields: _Fields) -> 'Data':
+        obj = cls.__new__(cls)
+        obj._fields = fields
+        return obj
 
     def __repr__(self) -> str:
         return '{}'.format(self['value'])
 
+    def __getitem__(self, key: str) -> Any:
+        if key in self._keys:
+            return getattr(self._fields, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> NoReturn:
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self._fields, key, value)
+
+    def __deepcopy__(self, memo):
+        # A copy owns its fields, also when this is the store of a `Base`
+        obj = Data.__new__(Data)
+        memo[id(self)] = obj
+        fields = _Fields.__new__(_Fields)
+        for slot in _Fields.__slots__:
+            setattr(fields, slot, _copyField(getattr(self._fields, slot), memo))
+        obj._fields = fields
+        return obj
+
     @property
     def min(self) -> float:
-        return self['min']
+        return self._fields.min
 
     @min.setter
     def min(self, value):
-        self['min'] = value
+        self._fields.min = value
 
     @property
     def max(self) -> float:
-        return self['max']
+        return self._fields.max
 
     @max.setter
     def max(self, value):
-        self['max'] = value
+        self._fields.max = value
+
+
+class Base(_Fields, SlottedPathDict):
+    """
+    A parameter. Its value with unit, limits and refinement details are presented as `store`, next to the `header`,
+    `tooltip`, `url` and `mapping` which describe it. Everything is held in slots of this one object, apart from the
+    header, tooltip and url which are read from shared `Details`.
+    """
+    __slots__ = ('_details', 'mapping')
+    _keys = ('header', 'tooltip', 'url', 'mapping', 'store')
 
-class Base(LoggedPathDict):
     def __init__(self, value: object = None, unit: object = '') -> object:
-        super().__init__(header='Undefined', tooltip='', url='', mapping=None, store=Data(value, unit))
-        self._log = logger.getLogger(__class__.__module__)
+        super().__init__(value, unit)
+        self._details = _NO_DETAILS
+        self.mapping = None
         self.updateMinMax()
 
     def __repr__(self) -> str:
-        return '{} {}'.format(self.value, self.getItemByPath(['store', 'unit']))
-
-    def updateMinMax(self):
-        if not isinstance(self.value, (int, float)):
+        return '{} {}'.format(self.value, self.unit)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'store':
+            return Data._view(self)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> NoReturn:
+        if key == 'store':
+            if isinstance(value, Data):
+                if value._fields is not self:
+                    for slot in _Fields.__slots__:
+                        setattr(self, slot, getattr(value._fields, slot))
+            else:
+                for data_key, data_value in value.items():
+                    self.store[data_key] = data_value
             return
-        # unstacked changes (for initial min and max values)
-        if self.min == -np.Inf:
-            if np.isclose([self.value], [0]):
-                self['store'].min = -1
-            elif self.value > 0:
-                self['store'].min = 0.8*self.value
-            elif self.value < 0:
-                self['store'].min = 1.2*self.value
-        if self.max == np.Inf:
-            if np.isclose([self.value], [0]):
-                self['store'].max = 1
-            elif self.value > 0:
-                self['store'].max = 1.2*self.value
-            elif self.value < 0:
-                self['store'].max = 0.8*self.value
+        super().__setitem__(key, value)
+
+    def __deepcopy__(self, memo):
+        cls = self.__class__
+        newobj = cls.__new__(cls)
+        memo[id(self)] = newobj
+        for slot in _Fields.__slots__:
+            setattr(newobj, slot, _copyField(getattr(self, slot), memo))
+        # Details are immutable and shared
+        newobj._details = self._details
+        newobj.mapping = deepcopy(self.mapping, memo)
+        return newobj
+
+    @property
+    def store(self) -> Data:
+        return Data._view(self)
+
+    @property
+    def details(self) -> Details:
+        return self._details
 
     @property
-    def value(self) -> Any:
-        return self.getItemByPath(['store', 'value'])
+    def header(self) -> str:
+        return self._details.header
 
-    @value.setter
-    def value(self, value: Any) -> NoReturn:
-        self.setItemByPath(['store', 'value'], value)
+    @header.setter
+    def header(self, value: str):
+        self._details = self._details._replace(header=value)
 
     @property
-    def refine(self) -> bool:
-        return self.getItemByPath(['store', 'refine'])
+    def tooltip(self) -> str:
+        return self._details.tooltip
+
+    @tooltip.setter
+    def tooltip(self, value: str):
+        self._details = self._details._replace(tooltip=value)
 
-    @refine.setter
-    def refine(self, value: bool) -> NoReturn:
-        self.setItemByPath(['store', 'refine'], value)
+    @property
+    def url(self) -> str:
+        return self._details.url
+
+    @url.setter
+    def url(self, value: str):
+        self._details = self._details._replace(url=value)
+
+    @staticmethod
+    def defaultMinMax(value: Any) -> Tuple[float, float]:
+        """
+        Initial min and max for a parameter with a given value
+        """
+        return _defaultMinMax(value)
+
+    def updateMinMax(self):
+        value = self.value
+        if not isinstance(value, (int, float)):
+            return
+        # unstacked changes (for initial min and max values)
+        if self.min == -np.Inf and self.max == np.Inf:
+            # Both follow from the value, they are worked out when asked for
+            self._limits = value
+            return
+        min_value, max_value = _defaultMinMax(value)
+        if self.min == -np.Inf:
+            self.min = min_value
+        if self.max == np.Inf:
+            self.max = max_value
 
     def get(self, item: str) -> Any:
-        return self.getItemByPath(['store', item])
+        return self.store[item]
 
     def set(self, item: str, value: Any) -> NoReturn:
-        self.setItemByPath(['store', item], value)
+        self.store[item] = value
 
     def unitConversionFactor(self, newUnit: str) -> float:
-        if self.getItemByPath(['store', 'unit']) is None:
+        if self.unit is None:
             return 1
-        return self.getItemByPath(['store', 'unit']).get_conversion_factor(newUnit)
+        return self.unit.get_conversion_factor(newUnit)
 
     def convertUnits(self, newUnit: str) -> NoReturn:
         cf = self.unitConversionFactor(newUnit)
-        self.setItemByPath(['store', 'value'], cf * self.value)
-        self.setItemByPath(['store', 'unit'], Unit(newUnit))
+        self.value = cf * self.value
+        self.unit = _getUnit(newUnit)
 
     def valueInUnit(self, newUnit: str) -> float:
         cf = self.unitConversionFactor(newUnit)
         return cf * self.value
-
-    @property
-    def min(self) -> float:
-        return self.getItemByPath(['store', 'min'])
-
-    @min.setter
-    def min(self, value):
-        self.setItemByPath(['store', 'min'], value)
-
-    @property
-    def max(self) -> float:
-        return self.getItemByPath(['store', 'max'])
-
-    @max.setter
-    def max(self, value):
-        self.setItemByPath(['store', 'max'], value)
@@ -1,5 +1,5 @@
 from easyInterface.Utils.DictTools import PathDict
-from .BaseClasses import Base
+from .BaseClasses import Base, Details, setDetails
 from datetime import datetime
 from easyInterface.Utils.Helpers import getReleaseInfo
 from os.path import dirname, join
@@ -35,18 +35,17 @@ INTERFACE_INFO = getReleaseInfo(join(dirname(dirname(dirname(dirname(__file__)))
 
 
 class Info(PathDict):
+    _parameter_details = {
+        'chi_squared': Details.fromTable(INFO_DETAILS['chi_squared']),
+        'n_res': Details.fromTable(INFO_DETAILS['n_res']),
+    }
+
     def __init__(self, phase_ids: list, experiment_ids: list, modified_datetime: str, refinement_datetime: str,
                  chi_squared: Base, n_res: Base):
         super().__init__(name='', phase_ids=phase_ids, experiment_ids=experiment_ids, modified_datetime=modified_datetime,
                          refinement_datetime=refinement_datetime, chi_squared=chi_squared, n_res=n_res)
 
-        self.setItemByPath(['chi_squared', 'header'], INFO_DETAILS['chi_squared']['header'])
-        self.setItemByPath(['chi_squared', 'tooltip'], INFO_DETAILS['chi_squared']['tooltip'])
-        self.setItemByPath(['chi_squared', 'url'], INFO_DETAILS['chi_squared']['url'])
-
-        self.setItemByPath(['n_res', 'header'], INFO_DETAILS['n_res']['header'])
-        self.setItemByPath(['n_res', 'tooltip'], INFO_DETAILS['n_res']['tooltip'])
-        self.setItemByPath(['n_res', 'url'], INFO_DETAILS['n_res']['url'])
+        setDetails(self, self._parameter_details)
 
     @classmethod
     def default(cls) -> 'Info':
@@ -1,21 +1,49 @@
 __author__ = 'simonward'
 __version__ = "2020_03_09"
 
+import hashlib
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial, wraps
+from threading import Event
 from copy import deepcopy
-from typing import List, Callable, Any, Union, Optional, NoReturn
+from typing import List, Callable, Any, Dict, Union, Optional, NoReturn
 
 from easyInterface.Diffraction.DataClasses.DataObj.Calculation import Calculation, Calculations
 from easyInterface.Diffraction.DataClasses.DataObj.Experiment import Experiments, Experiment, ExperimentPhase
 from easyInterface.Diffraction.DataClasses.PhaseObj.Phase import Phases, Phase
-from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedUndoableDict
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import LoggedUndoableDict, LoggedArrayDict, Base, \
+    snapshot
 from easyInterface.Diffraction.DataClasses.Utils.InfoObjs import Interface, App, Calculator, Info
+from easyInterface.Utils.CacheTools import CACHE_SIZE, LRUCache
+from easyInterface.Utils.DictTools import PathDict, UNDO_STACK_SIZE
+from easyInterface.Utils.RefineTools import CANCELLED_MESSAGE, RefinementCancelled, RefinementTask
 from easyInterface.Utils.Helpers import time_it
 from easyInterface import logger as logging
 
+import numpy as np
 from numpy import datetime64
 
+# Minimisers of `CalculatorInterface.refine`, see `CalculatorInterface.setRefinementMethod`
+REFINEMENT_METHODS = ['bfgs', 'least_squares']
+
+
+def _notWhileRefining(func):
+    """
+    Makes a method of `CalculatorInterface` raise a RuntimeError while a refinement of `refineAsync` is running or its
+    results have not been collected.
+    :param func: method which changes the project or uses the calculator
+    :return: guarded method
+    """
+
+    @wraps(func)
+    def _guarded(self, *args, **kwargs):
+        self._checkNotRefining()
+        return func(self, *args, **kwargs)
+
+    return _guarded
+
 
 class ProjectDict(LoggedUndoableDict):
     """
@@ -38,7 +66,8 @@ class ProjectDict(LoggedUndoableDict):
         """
         super().__init__(interface=interface, calculator=calculator, app=app, info=info, phases=phases,
                          experiments=experiments, calculations=calculations)
-        self._log = logging.getLogger(__class__.__module__)
+        self.setUndoStackSize(UNDO_STACK_SIZE)
+        self.indexPaths()
         self._log.debug('Created a project dictionary')
 
     @classmethod
@@ -105,6 +134,13 @@ class CalculatorInterface:
             self.project_dict['calculator'][key] = CALCULATOR_INFO[key]
         self.__last_updated: datetime = datetime.max
         self.__last_calculated: datetime = datetime.min
+        self.__sync_index: dict = {}
+        self.__calculation_cache: LRUCache = LRUCache(CACHE_SIZE)
+        self.__group_states: dict = {}
+        self.__refine_executor: Optional[ThreadPoolExecutor] = None
+        self.__refinement: Optional[RefinementTask] = None
+        self.__refine_method: str = 'bfgs'
+        self.__refine_processes: Optional[int] = None
         self.setProjectFromCalculator()
         self._log.info("Created: %s", self)
 
@@ -115,6 +151,7 @@ class CalculatorInterface:
             self.project_dict['calculator']['version'])
 
     @property
+    @_notWhileRefining
     def final_chi_square(self) -> float:
         """
         Calculates the final chi squared of the simulation. Where the final chi squared is the chi squared divided by
@@ -124,6 +161,18 @@ class CalculatorInterface:
         """
         return self.calculator.final_chi_square
 
+    @_notWhileRefining
+    def chiSquaredPerExperiment(self) -> Dict[str, float]:
+        """
+        Calculates the final chi squared of each experiment. The calculated patterns are reused if nothing has changed
+        since they were calculated.
+
+        :return: Dictionary of experiment name: chi squared divided by the number of data points
+        """
+        return {name: chi_sq / max(n_res, 1)
+                for name, (chi_sq, n_res) in self.calculator.getChiSqPerExperiment().items()}
+
+    @_notWhileRefining
     def setProjectFromCalculator(self) -> NoReturn:
         """
         Sets the project dictionary from the calculator given on initialisation. Calling this function will regenerate
@@ -154,6 +203,7 @@ class CalculatorInterface:
     ###
 
     # Phase section
+    @_notWhileRefining
     def setPhaseDefinition(self, phase_path: str) -> NoReturn:
         """
         Parse a phases cif file and replace existing crystal phases
@@ -171,6 +221,7 @@ class CalculatorInterface:
         self.updatePhases()
         self.updateExperiments()
 
+    @_notWhileRefining
     def addPhaseDefinitionFromString(self, phase_cif_string: str) -> NoReturn:
         """
         Set a phase/s to be simulated from a string.
@@ -181,6 +232,7 @@ class CalculatorInterface:
         # This will re-create all local directories
         self.updatePhases()
 
+    @_notWhileRefining
     def addPhaseDefinition(self, phase_path: str) -> NoReturn:
         """
         Add new phases from a cif file to the list of existing crystal phases in the calculator.
@@ -196,6 +248,7 @@ class CalculatorInterface:
         self.calculator.addPhaseDefinition(phase_path)
         self.updatePhases()
 
+    @_notWhileRefining
     def addPhase(self, phase: Phase) -> NoReturn:
         """
         Add a new phase from an easyInterface phase object to the list of existing crystal phases in the calculator.
@@ -209,6 +262,7 @@ class CalculatorInterface:
             self.calculator.addPhase(phase)
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def removePhase(self, phase_name: str) -> NoReturn:
         """
         Remove a phase of a given name from the dictionary and the calculator object.
@@ -219,6 +273,7 @@ class CalculatorInterface:
         self.project_dict.rmItemByPath(['phases', phase_name])
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def addPhaseToExp(self, exp_name: str, phase_name: str, scale: float = 0.0) -> NoReturn:
         """
         Link a phase in the project dictionary to an experiment in the project dictionary. Links in the calculator will
@@ -239,6 +294,7 @@ class CalculatorInterface:
         self.project_dict.setItemByPath(['experiments', exp_name, 'phase'], currentPhases)
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def removePhaseFromExp(self, exp_name: str, phase_name: str) -> NoReturn:
         """
         Remove the link between an experiment and a crystallographic phase. Links in the calculator will also be removed.
@@ -252,6 +308,7 @@ class CalculatorInterface:
         self.__last_updated = datetime.now()
 
     # Experiment section
+    @_notWhileRefining
     def setExperimentDefinition(self, exp_path: str) -> NoReturn:
         """
         Set an experiment/s to be simulated from a cif file. Note that this will not have any crystallographic phases
@@ -263,6 +320,7 @@ class CalculatorInterface:
         # This will re-create all local directories
         self.updateExperiments()
 
+    @_notWhileRefining
     def addExperimentDefinitionFromString(self, exp_cif_string: str) -> NoReturn:
         """
         Set an experiment/s to be simulated from a string. Note that this will not have any crystallographic phases
@@ -274,6 +332,7 @@ class CalculatorInterface:
         # This will re-create all local directories
         self.updateExperiments()
 
+    @_notWhileRefining
     def addExperimentDefinition(self, exp_path: str) -> NoReturn:
         """
         Add an experiment to be simulated from a cif file. Note that this will not have any crystallographic phases
@@ -284,6 +343,7 @@ class CalculatorInterface:
         self.calculator.addExpsDefinition(exp_path)
         self.updateExperiments()
 
+    @_notWhileRefining
     def addExperiment(self, experiment: Experiment) -> NoReturn:
         """
         Add an experiment to the list of experiments in both the project dict and the calculator.
@@ -297,6 +357,7 @@ class CalculatorInterface:
             self.calculator.setExperiments(self.project_dict['experiments'])
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def removeExperiment(self, experiment_name: str) -> NoReturn:
         """
         Remove a experiment from both the project dictionary and the calculator.
@@ -308,6 +369,7 @@ class CalculatorInterface:
         self.__last_updated = datetime.now()
 
     # Output section
+    @_notWhileRefining
     def writeMainCif(self, save_dir: str) -> NoReturn:
         """
         Write the `main.cif` where links to the experiments and phases are stored and other generalised project
@@ -317,6 +379,7 @@ class CalculatorInterface:
         """
         self.calculator.writeMainCif(save_dir)
 
+    @_notWhileRefining
     def writePhaseCif(self, save_dir: str) -> NoReturn:
         """
         Write the `samples.cif` where all phases in the project dictionary are saved to file. This cif file should be
@@ -326,6 +389,7 @@ class CalculatorInterface:
         """
         self.calculator.writePhaseCif(save_dir)
 
+    @_notWhileRefining
     def writeExpCif(self, save_dir: str) -> NoReturn:
         """
         Write the `experiments.cif` where all experiments in the project dictionary are saved to file. This includes the
@@ -335,6 +399,7 @@ class CalculatorInterface:
         """
         self.calculator.writeExpCif(save_dir)
 
+    @_notWhileRefining
     def writeCalcCif(self, save_dir: str) -> NoReturn:
         """
         Write the `calculations.cif` where all calculations in the calculator are saved to file.
@@ -343,6 +408,7 @@ class CalculatorInterface:
         """
         self.calculator.writeCalcCif(save_dir)
 
+    @_notWhileRefining
     def saveCifs(self, save_dir: str) -> NoReturn:
         """
         Write project cif files (`main.cif`, `samples.cif`, `experiments.cif` and `calculations.cif`) to a user
@@ -356,11 +422,17 @@ class CalculatorInterface:
     # Syncing between Calculator/Dict
     ###
     @time_it
+    @_notWhileRefining
     def updatePhases(self) -> NoReturn:
         """
-        Synchronise the phases in project dictionary by queering the calculator object.
+        Synchronise the phases in project dictionary by queering the calculator object. If the calculator structure has
+        not changed since the last synchronisation, only the changed parameters are updated.
         """
+        if self._syncFromCalculator('phases'):
+            self.__last_updated = datetime.now()
+            return
         phases = self.calculator.getPhases()
+        self._trackParameters('phases', phases)
 
         if len(self.project_dict['phases']) == 0:
             self.project_dict.startBulkUpdate('Bulk update of phases')
@@ -377,11 +449,7 @@ class CalculatorInterface:
             keys.append(['info', 'phase_ids'])
             values.append(list(phases.keys()))
 
-            if self.project_dict.macro_running:
-                for key, value in zip(keys, values):
-                    self.project_dict.setItemByPath(key, value)
-            else:
-                self.project_dict.bulkUpdate(keys, values, 'Bulk update of phases')
+            self.project_dict.bulkUpdate(keys, values, 'Bulk update of phases')
         self.__last_updated = datetime.now()
 
     def getPhase(self, phase_name: Union[str, None]) -> Phase:
@@ -390,22 +458,28 @@ class CalculatorInterface:
         phases are returned. If the phase name does not exist KeyError is thrown.
 
         :param phase_name: Name of the phase to be returned or None for all phases
-        :return: Copy of the project dictionaries phase object with name phase_name
+        :return: Copy of the project dictionaries phase object with name phase_name, see `snapshot`
         :raises KeyError: The supplied key is not a valid phase name
         """
         if phase_name in self.project_dict['phases']:
-            return deepcopy(self.project_dict['phases'][phase_name])
+            return snapshot(self.project_dict['phases'][phase_name])
         elif phase_name is None:
-            return deepcopy(self.project_dict['phases'])
+            return snapshot(self.project_dict['phases'])
         else:
             raise KeyError
 
     @time_it
+    @_notWhileRefining
     def updateExperiments(self) -> NoReturn:
         """
-        Synchronise the experiments portion of the project dictionary from the calculator.
+        Synchronise the experiments portion of the project dictionary from the calculator. If the calculator structure
+        has not changed since the last synchronisation, only the changed parameters are updated.
         """
+        if self._syncFromCalculator('experiments'):
+            self.__last_updated = datetime.now()
+            return
         experiments = self.calculator.getExperiments()
+        self._trackParameters('experiments', experiments)
 
         if len(self.project_dict['experiments']) == 0:
             self.project_dict.startBulkUpdate('Bulk update of experiments')
@@ -422,11 +496,7 @@ class CalculatorInterface:
             keys.append(['info', 'experiment_ids'])
             values.append(list(experiments.keys()))
 
-            if self.project_dict.macro_running:
-                for key, value in zip(keys, values):
-                    self.project_dict.setItemByPath(key, value)
-            else:
-                self.project_dict.bulkUpdate(keys, values, 'Bulk update of experiments')
+            self.project_dict.bulkUpdate(keys, values, 'Bulk update of experiments')
         self.__last_updated = datetime.now()
 
     def getExperiment(self, experiment_name: Union[str, None]) -> Experiment:
@@ -435,13 +505,14 @@ class CalculatorInterface:
         all experiments are returned. If the experiment name does not exist KeyError is thrown.
 
         :param experiment_name: Name of the experiment to be returned or None for all experiments
-        :return: Copy of the project dictionaries phase object with name experiment_name
+        :return: Copy of the project dictionaries experiment object with name experiment_name. The measured data is
+            shared with the project dictionary as read-only arrays, see `snapshot`
         :raises KeyError: The supplied key is not a valid experiment name
         """
         if experiment_name in self.project_dict['experiments']:
-            return deepcopy(self.project_dict['experiments'][experiment_name])
+            return snapshot(self.project_dict['experiments'][experiment_name])
         elif experiment_name is None:
-            return deepcopy(self.project_dict['experiments'])
+            return snapshot(self.project_dict['experiments'])
         else:
             raise KeyError
 
@@ -469,12 +540,38 @@ class CalculatorInterface:
         Calculate all experiments and populate the calculations field in the project dictionary. Note that this will
         only occur if a member of the phases or experiments section of the project dictionary has been modified since
         the last call to `updateCalculations`.
+
+        :raises RuntimeError: If there is something to calculate while a refinement of `refineAsync` is running
         """
         if self.__last_updated > self.__last_calculated:
-            calculations = self.calculator.getCalculations()
-            self.project_dict['calculations'] = calculations
+            self._checkNotRefining()
+            # Calculations follow from the phases and experiments, they are not undoable changes themselves
+            self.project_dict.setItemWithoutUndo('calculations', self._cachedCalculations())
             self.__last_calculated = datetime.now()
 
+    def setCalculationCacheSize(self, max_bytes: int) -> NoReturn:
+        """
+        Set the memory budget of the cache of calculations. Calculations are cached by the values of the parameters and
+        the measured data, so returning to an already calculated state (e.g. by undo/redo) does not recalculate.
+
+        :param max_bytes: Memory budget in bytes, 0 disables the cache
+        """
+        self.__calculation_cache.resize(max_bytes)
+
+    def calculationCacheInfo(self) -> dict:
+        """
+        Returns the state of the cache of calculations.
+
+        :return: Dictionary with the fields "entries", "bytes", "max_bytes", "hits" and "misses"
+        """
+        return self.__calculation_cache.info()
+
+    def clearCalculationCache(self) -> NoReturn:
+        """
+        Removes all cached calculations and resets the hit/miss counters.
+        """
+        self.__calculation_cache.clear()
+
     def getCalculations(self) -> Calculations:
         """
         Returns all calculations in the project dictionary. Calculations will be updated if members of the phases or
@@ -497,6 +594,30 @@ class CalculatorInterface:
         calculation = self.project_dict['calculations'][calculation_name]
         return calculation
 
+    @_notWhileRefining
+    def calculateSweep(self, paths: List[List[str]], values: np.ndarray, processes: Optional[int] = None) -> np.ndarray:
+        """
+        Calculate the patterns for a sweep over one or more parameters, e.g. a lattice constant. Neither the project
+        dictionary nor the undo stack are modified.
+
+        :param paths: Locations of the swept parameters, e.g. ['phases', 'Fe3O4', 'cell', 'length_a']
+        :param values: 2D array with one row of values (one per path) for each point of the sweep
+        :param processes: Number of worker processes to split the sweep over, None to calculate in this process
+        :raises KeyError: If a path is not a parameter known to the calculator
+        :return: 2D array with the calculated pattern (`y_calc_sum`) for each point of the sweep. The patterns of
+            multiple experiments are concatenated in experiment order.
+        """
+        mappings = []
+        for path in paths:
+            if path[-2:] == ['store', 'value']:
+                path = path[:-2]
+            item = self.project_dict.getItemByPath(path)
+            if not isinstance(item, Base) or not isinstance(item['mapping'], str):
+                raise KeyError('{} is not a mapped parameter'.format(path))
+            mappings.append(item['mapping'])
+        return self.calculator.calculateSweep(mappings, values, processes)
+
+    @_notWhileRefining
     def setPhase(self, phase: Phase) -> NoReturn:
         """
         Modify a phase in the calculator. The phase will be added if it does not currently exist.
@@ -516,6 +637,7 @@ class CalculatorInterface:
         else:
             raise TypeError
 
+    @_notWhileRefining
     def setPhases(self, phases: Union[Phase, Phases]) -> NoReturn:
         """
         Set the phases in the calculator to an easyInterface phases object. If a phase in the supplied phases exists
@@ -536,6 +658,7 @@ class CalculatorInterface:
         self._mappedBulkUpdate(self._mappedValueUpdater, keys, values)
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def setPhaseRefine(self, phase: str, key: List[str], value: bool = True) -> NoReturn:
         """
         Shortcut for setting the refinement key for items in the phase list.
@@ -553,6 +676,7 @@ class CalculatorInterface:
         self.project_dict.setItemByPath(['phases', phase, *key, 'store', 'refine'], value)
         self._mappedRefineUpdater(['phases', phase, *key], value)
 
+    @_notWhileRefining
     def setPhaseValue(self, phase: str, key: List[str], value) -> NoReturn:
         """
         Shortcut for setting the value key for items in the phase list.
@@ -570,6 +694,7 @@ class CalculatorInterface:
         self.project_dict.setItemByPath(['phases', phase, *key, 'store', 'value'], value)
         self._mappedValueUpdater(['phases', phase, *key], value)
 
+    @_notWhileRefining
     def setExperiment(self, experiment: Experiment) -> NoReturn:
         """
         Set an experiment to the project dictionary. If an experiment by the same name exists, the necessary changes will
@@ -590,6 +715,7 @@ class CalculatorInterface:
             raise TypeError
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def setExperiments(self, experiments: Union[Experiment, Experiments]):
         """
         Overwrite all experiments in the project dictionary with supplied experiments.
@@ -609,6 +735,7 @@ class CalculatorInterface:
         self.calculator.setExperiments(self.project_dict['experiments'])
         self.__last_updated = datetime.now()
 
+    @_notWhileRefining
     def setExperimentRefine(self, experiment: str, key: List[str], value: bool = True) -> NoReturn:
         """
         Shortcut for setting the refinement key for items in the experiment list.
@@ -626,6 +753,7 @@ class CalculatorInterface:
         self.project_dict.setItemByPath(['experiments', experiment, *key, 'store', 'refine'], value)
         self._mappedRefineUpdater(['experiments', experiment, *key], value)
 
+    @_notWhileRefining
     def setExperimentValue(self, experiment: str, key: List[str], value):
         """
         Shortcut for setting the value key for items in the experiment list.
@@ -643,6 +771,7 @@ class CalculatorInterface:
         self.project_dict.setItemByPath(['experiments', experiment, *key, 'store', 'value'], value)
         self._mappedValueUpdater(['experiments', experiment, *key], value)
 
+    @_notWhileRefining
     def setCalculatorFromProject(self) -> NoReturn:
         """
         Resets the project phases and experiments fields of the project dictionary from the calculator.
@@ -661,6 +790,7 @@ class CalculatorInterface:
         """
         return self.project_dict.getItemByPath(keys)
 
+    @_notWhileRefining
     def setDictByPath(self, keys: List[str], value: Any) -> NoReturn:
         """
         Set an object in the project dictionary by a key path.
@@ -740,16 +870,120 @@ class CalculatorInterface:
     # Refinement
     ###
 
-    def refine(self) -> dict:
+    @_notWhileRefining
+    def refine(self, progress: Optional[Callable[[dict], Any]] = None, every: Optional[int] = None,
+               pattern_interval: Optional[float] = None) -> dict:
         """
         Perform a refinement on parameters which are marked in the project dictionary. If the refinement fails then only
         the "refinement_message" will be returned in the results dictionary with an explanation of the error.
 
+        :param progress: Called after every iteration with a dictionary of the "iteration", "nfev", "chi_sq", the
+                         values of the refined "parameters" and the calculated "pattern" (or None). Neither the
+                         project dictionary nor the undo stack are touched before the refinement has finished.
+        :param every: Report every this many objective evaluations, rather than after every iteration
+        :param pattern_interval: Minimum number of seconds between reports which carry the calculated pattern, the
+                                 concatenated patterns of all experiments as from `calculateSweep`. None for no pattern.
         :return: Refinement results of the following fields: "num_refined_parameters", "refinement_message",
                 "nfev", "nit", "njev", "final_chi_sq"
         """
-        refinement_res, scipy_refinement_res = self.calculator.refine()
+        refinement_res, scipy_refinement_res = self._calculatorRefinement(progress, None, every, pattern_interval)()
+        return self._applyRefinement(scipy_refinement_res)
+
+    @_notWhileRefining
+    def setRefinementMethod(self, method: str = 'bfgs', processes: Optional[int] = None) -> NoReturn:
+        """
+        Choose the minimiser of `refine` and `refineAsync`.
 
+        :param method: 'bfgs' for the refinement of the calculator, 'least_squares' for a least squares refinement of
+                       the parameters flagged for refinement in the project dictionary
+        :param processes: Number of worker processes to calculate the Jacobian of a least squares refinement in, None
+                          to calculate it in this process
+        :raises KeyError: If the method is not known
+        """
+        if method not in REFINEMENT_METHODS:
+            raise KeyError('Unknown refinement method {}, use one of {}'.format(method, REFINEMENT_METHODS))
+        self.__refine_method = method
+        self.__refine_processes = processes
+
+    def refineAsync(self, progress: Optional[Callable[[dict], Any]] = None, every: Optional[int] = None,
+                    pattern_interval: Optional[float] = None) -> RefinementTask:
+        """
+        Start a refinement in a worker thread and return straight away. Only the calculator is refined in the worker.
+        The project dictionary is updated in one undoable step, as by `refine`, when the results are collected with
+        `RefinementTask.result` or by awaiting the task, in the thread which does so. A cancelled refinement restores
+        the calculator and leaves the project dictionary untouched.
+
+        Until the results have been collected, the methods which change the project or use the calculator raise a
+        RuntimeError.
+
+        :param progress: Called in the worker thread after every iteration, see `refine`
+        :param every: Report every this many objective evaluations, see `refine`
+        :param pattern_interval: Minimum number of seconds between reports with the calculated pattern, see `refine`
+        :return: Task which gives the refinement results of `refine` and can be cancelled or awaited
+        :raises RuntimeError: If a refinement is running or its results have not been collected
+        """
+        self._checkNotRefining()
+        if self.__refine_executor is None:
+            self.__refine_executor = ThreadPoolExecutor(max_workers=1)
+        cancel = Event()
+        future = self.__refine_executor.submit(self._calculatorRefinement(progress, cancel, every, pattern_interval))
+        self.__refinement = RefinementTask(future, cancel, self._collectRefinement)
+        return self.__refinement
+
+    def _checkNotRefining(self) -> NoReturn:
+        """
+        :raises RuntimeError: If a refinement of `refineAsync` is running or its results have not been collected
+        """
+        if self.__refinement is not None:
+            raise RuntimeError('The project can not be changed or calculated while a refinement is running, '
+                               'collect its results with RefinementTask.result first')
+
+    def _collectRefinement(self, future: Future) -> dict:
+        """
+        Update the project dictionary from a finished refinement of `refineAsync`, in the thread collecting the results
+
+        :param future: Future of the refinement worker
+        :return: Refinement results dictionary, see `refine`
+        """
+        self.__refinement = None
+        try:
+            refinement_res, scipy_refinement_res = future.result()
+        except RefinementCancelled:
+            self._log.info('Refinement cancelled')
+            return {"refinement_message": CANCELLED_MESSAGE}
+        return self._applyRefinement(scipy_refinement_res)
+
+    def _calculatorRefinement(self, progress: Optional[Callable[[dict], Any]], cancel: Optional[Event],
+                              every: Optional[int], pattern_interval: Optional[float]) -> Callable[[], tuple]:
+        """
+        Refinement of the calculator with the method of `setRefinementMethod`. The project dictionary is read here, the
+        refinement itself only uses the calculator.
+
+        :return: Function which refines and returns the refinement results and the result of the minimiser
+        """
+        if self.__refine_method == 'least_squares':
+            return partial(self.calculator.refineLeastSquares, self._refinedMappings(), self.__refine_processes,
+                           progress, cancel, every, pattern_interval)
+        return partial(self.calculator.refine, progress, cancel, every, pattern_interval)
+
+    def _refinedMappings(self) -> List[str]:
+        """
+        Mappings of the parameters which are flagged for refinement in the project dictionary, in project order
+        """
+        _, parameters = self._projectState()
+        mappings = []
+        for mapping, _, refine in parameters.values():
+            if refine and mapping not in mappings:
+                mappings.append(mapping)
+        return mappings
+
+    def _applyRefinement(self, scipy_refinement_res) -> dict:
+        """
+        Update the project dictionary from the refined calculator in one undoable step.
+
+        :param scipy_refinement_res: Result of the minimiser, None if no parameters were refined
+        :return: Refinement results dictionary, see `refine`
+        """
         self.project_dict.startBulkUpdate('Refinement')
         self.setProjectFromCalculator()
         self.project_dict.endBulkUpdate()
@@ -803,22 +1037,228 @@ class CalculatorInterface:
         """
         self.project_dict.clearUndoStack()
 
+    def setUndoStackSize(self, max_bytes: Optional[int]) -> NoReturn:
+        """
+        Set the memory budget of the Undo/Redo stack. The oldest edits are dropped when it is exceeded.
+
+        :param max_bytes: Budget in bytes, None for no limit.
+        """
+        self.project_dict.setUndoStackSize(max_bytes)
+
+    def compactUndoStack(self) -> NoReturn:
+        """
+        Merge consecutive edits of the same item on the Undo/Redo stack, so they are undone in one step.
+        """
+        self.project_dict.compactUndoStack()
+
+    def undoStackInfo(self) -> dict:
+        """
+        Size of the Undo/Redo stack.
+
+        :return: Number of undo and redo steps, approximate memory held in bytes and the limits of the stack.
+        """
+        return self.project_dict.undoStackInfo()
+
+    @_notWhileRefining
     def undo(self) -> NoReturn:
         """
-        Perform an undo operation on the project dictionary.
+        Perform an undo operation on the project dictionary. The calculator and the calculations are brought back to
+        the restored state.
         """
+        state = self._projectState()
         self.project_dict.undo()
+        self.__sync_index = {}
+        self._syncCalculatorFromProject(state)
 
+    @_notWhileRefining
     def redo(self) -> NoReturn:
         """
-        Perform an redo operation on the project dictionary.
+        Perform an redo operation on the project dictionary. The calculator and the calculations are brought forward to
+        the restored state.
         """
+        state = self._projectState()
         self.project_dict.redo()
+        self.__sync_index = {}
+        self._syncCalculatorFromProject(state)
 
     ###
     # Hidden internal logic
     ###
 
+    def _trackParameters(self, group: str, items: PathDict) -> NoReturn:
+        """
+        Index the mapped parameters of a freshly built phases/experiments object by their path in the project
+        dictionary and ask the calculator to track them.
+
+        :param group: Either `phases` or `experiments`
+        :param items: Phases or experiments object as returned by the calculator
+        """
+        index = {}
+
+        def walk(item, path):
+            for key in item.keys():
+                value = item[key]
+                if isinstance(value, Base):
+                    if isinstance(value['mapping'], str):
+                        index.setdefault(value['mapping'], []).append([*path, key])
+                elif isinstance(value, (PathDict, dict)):
+                    walk(value, [*path, key])
+
+        walk(items, [group])
+        self.__sync_index[group] = index
+        self.calculator.trackParameters(group, list(index.keys()))
+
+    def _syncFromCalculator(self, group: str) -> bool:
+        """
+        Apply the parameters which the calculator reports as changed to the project dictionary.
+
+        :param group: Either `phases` or `experiments`
+        :return: False if a full rebuild of the group is needed.
+        """
+        index = self.__sync_index.get(group, None)
+        if index is None or len(self.project_dict[group]) == 0:
+            return False
+        changed = self.calculator.getChangedParameters(group)
+        if changed is None:
+            return False
+        keys = []
+        values = []
+        touched = set()
+        for mapping, state in changed.items():
+            state = dict(state)
+            state['min'], state['max'] = Base.defaultMinMax(state['value'])
+            for path in index[mapping]:
+                store = self.project_dict.getItemByPath([*path, 'store'])
+                for field, value in state.items():
+                    if store[field] != value:
+                        keys.append([*path, 'store', field])
+                        values.append(value)
+                if path[2] == 'atoms':
+                    touched.add(path[1])
+        if group == 'phases':
+            # Atom positions in the unit cell are derived from the atom coordinates
+            for phase_name in touched:
+                sites = self.calculator._getPhaseSites(phase_name)
+                for key in sites.keys():
+                    if not np.array_equal(self.project_dict.getItemByPath(['phases', phase_name, 'sites', key]),
+                                          sites[key]):
+                        keys.append(['phases', phase_name, 'sites', key])
+                        values.append(sites[key])
+        if not keys:
+            return True
+        self.project_dict.bulkUpdate(keys, values, 'Bulk update of {}'.format(group))
+        return True
+
+    def _projectState(self) -> tuple:
+        """
+        Summarise the phases and experiments of the project dictionary. Mapped parameters are returned by path, all
+        other content (names, structure, unmapped values and measured data) is reduced to a digest.
+
+        :return: Digest of the unmapped content and a dictionary of path: (mapping, value, refine) of the parameters
+        """
+        phases = self._groupState('phases')
+        experiments = self._groupState('experiments')
+        return phases[0] + experiments[0], {**phases[2], **experiments[2]}
+
+    def _groupState(self, group: str) -> tuple:
+        """
+        Summarise the phases or the experiments of the project dictionary, see `_projectState`. The summary is kept
+        until the group is changed through the project dictionary, see `PathDict.version`. Parameters changed directly
+        on the objects in the project dictionary are not seen.
+
+        :param group: Either `phases` or `experiments`
+        :return: Digest of the unmapped content, digest of the parameter values and a dictionary of
+                 path: (mapping, value, refine) of the parameters
+        """
+        items = self.project_dict[group]
+        cached = self.__group_states.get(group, None)
+        if cached is not None and cached[0] is items and cached[1] == items.version:
+            return cached[2]
+        version = items.version
+        digest = hashlib.sha1()
+        parameters = {}
+
+        def walk(item, path):
+            for key in item.keys():
+                value = item[key]
+                item_path = (*path, key)
+                digest.update(repr(item_path).encode())
+                if isinstance(value, Base):
+                    if isinstance(value['mapping'], str):
+                        parameters[item_path] = (value['mapping'], value.value, value['store']['refine'])
+                    else:
+                        digest.update(repr(value.value).encode())
+                elif isinstance(value, LoggedArrayDict):
+                    # Measured data is hashed once per load
+                    digest.update(value.digest())
+                elif isinstance(value, (PathDict, dict)):
+                    # Atom sites are derived from the atoms
+                    if path[0] != 'phases' or key != 'sites':
+                        walk(value, item_path)
+                else:
+                    digest.update(repr(value).encode())
+
+        walk(items, (group,))
+        values = hashlib.sha1()
+        for path, (_, value, _) in parameters.items():
+            values.update(repr((path, value)).encode())
+        state = (digest.digest(), values.digest(), parameters)
+        self.__group_states[group] = (items, version, state)
+        return state
+
+    def _calculationKey(self) -> str:
+        """
+        Key of the calculations of the current project state: a hash of the parameter values and the identity (names,
+        setup and measured data) of the phases and experiments.
+        """
+        phases = self._groupState('phases')
+        experiments = self._groupState('experiments')
+        return hashlib.sha1(phases[0] + phases[1] + experiments[0] + experiments[1]).hexdigest()
+
+    def _cachedCalculations(self) -> Calculations:
+        """
+        Return the calculations of the current state from the cache, calculating and caching them if they are not
+        known. The cache holds its own copies. Calculations from the cache share its data columns as read-only
+        arrays, so changes to the returned calculations do not leak into it.
+        """
+        key = self._calculationKey()
+        calculations = self.__calculation_cache.get(key)
+        if calculations is None:
+            calculations = self.calculator.getCalculations()
+            self.__calculation_cache.put(key, deepcopy(calculations))
+            return calculations
+        self._log.debug('Calculations found in cache')
+        return snapshot(calculations)
+
+    def _syncCalculatorFromProject(self, state: tuple) -> NoReturn:
+        """
+        Bring the calculator and the calculations in line with the project dictionary after an undo/redo. Changed
+        parameter values are set one by one, any other change rebuilds the calculator.
+
+        :param state: `_projectState` before the undo/redo
+        """
+        structure, parameters = self._projectState()
+        if structure != state[0] or parameters.keys() != state[1].keys():
+            self.setCalculatorFromProject()
+        else:
+            changed = False
+            for path, (mapping, value, refine) in parameters.items():
+                _, old_value, old_refine = state[1][path]
+                try:
+                    if value != old_value:
+                        self.calculator._mappedValueUpdater(mapping, value)
+                        changed = True
+                    if refine != old_refine:
+                        self.calculator._mappedRefineUpdater(mapping, refine)
+                except TypeError:
+                    self.setCalculatorFromProject()
+                    break
+            else:
+                if not changed:
+                    return
+        self.__last_updated = datetime.now()
+        self.updateCalculations()
+
     def _mappedBulkUpdate(self, func: Callable, keys: List[List], values: List[Any]) -> NoReturn:
         """
         Perform a bulk update on the project dictionary
@@ -844,6 +1284,7 @@ class CalculatorInterface:
         """
 
         def code_error(keys):
+            self.__sync_index = {}
             if keys[0] == 'phases':
                 self.updatePhases()
             else:
@@ -857,7 +1298,7 @@ class CalculatorInterface:
                 self.calculator._mappedValueUpdater(update_str, value)
             except TypeError:
                 code_error(key)
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, IndexError):
             code_error(key)
         self.__last_updated = datetime.now()
 
@@ -870,6 +1311,7 @@ class CalculatorInterface:
         """
 
         def code_error(keys):
+            self.__sync_index = {}
             if keys[0] == 'phases':
                 self.updatePhases()
             else:
@@ -883,7 +1325,7 @@ class CalculatorInterface:
                 self.calculator._mappedRefineUpdater(update_str, value)
             except TypeError:
                 code_error(key)
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, IndexError):
             code_error(key)
 
     # TODO this section needs to be modified. Main rcif needs to be moved to interface and this implementation removed
@@ -0,0 +1,125 @@
+import sys
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Hashable, NoReturn, Optional
+
+import numpy as np
+
+# Default memory budget of a `LRUCache`
+CACHE_SIZE = 1 << 27
+
+
+def sizeOf(obj: Any) -> int:
+    """
+    Estimate the memory held by an object in bytes, counting numpy arrays by their data and walking dictionaries,
+    `UserDict` based classes, lists and tuples.
+
+    :param obj: object to be measured
+    """
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) if obj.base is None else obj.nbytes + sys.getsizeof(obj)
+    data = getattr(obj, 'data', None)
+    if isinstance(data, dict):
+        obj = data
+    if isinstance(obj, Mapping):
+        return sys.getsizeof(obj) + sum(sizeOf(key) + sizeOf(value) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(sizeOf(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """
+    Least recently used cache with a memory budget. The least recently used entries are dropped once the estimated
+    size of all entries exceeds the budget. Cached objects are shared, not copied, so they should not be modified.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_SIZE):
+        """
+        :param max_bytes: memory budget in bytes, 0 disables the cache
+        """
+        self._entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __repr__(self) -> str:
+        return 'LRU cache of {} entries ({} of {} bytes), {} hits, {} misses'.format(
+            len(self), self.bytes, self.max_bytes, self.hits, self.misses)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return a cached object and mark it as the most recently used
+
+        :param key: cache key
+        :return: The cached object or None if there is no entry for `key`
+        """
+        entry = self._entries.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> NoReturn:
+        """
+        Add an object to the cache. Objects larger than the whole budget are not cached.
+
+        :param key: cache key
+        :param value: object to be cached
+        """
+        self.discard(key)
+        size = sizeOf(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        self._shrink(self.max_bytes)
+
+    def discard(self, key: Hashable) -> NoReturn:
+        """
+        Remove an entry if there is one
+
+        :param key: cache key
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self) -> NoReturn:
+        """
+        Remove all entries and reset the counters
+        """
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def resize(self, max_bytes: int) -> NoReturn:
+        """
+        Change the memory budget, dropping the least recently used entries which no longer fit
+
+        :param max_bytes: memory budget in bytes, 0 disables the cache
+        """
+        self.max_bytes = max_bytes
+        self._shrink(max_bytes)
+
+    def info(self) -> dict:
+        """
+        :return: The number of entries, their size, the budget and the hit/miss counters
+        """
+        return {'entries': len(self), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _shrink(self, max_bytes: int) -> NoReturn:
+        while self.bytes > max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
@@ -0,0 +1,156 @@
+import mmap
+import os
+import re
+import warnings
+from typing import List, Optional, Union
+
+import numpy as np
+
+from easyInterface import logger
+
+_log = logger.getLogger(__name__)
+
+# Default size of the blocks in which loop data is parsed
+CHUNK_SIZE = 1 << 22
+
+_LOOP_HEADER = re.compile(rb'^[ \t]*loop_[ \t]*\r?\n((?:[ \t]*_[^\s]+[ \t]*\r?\n)+)', re.MULTILINE | re.IGNORECASE)
+_LOOP_END = re.compile(rb'^[ \t]*(?:_|loop_|data_|save_|global_|stop_)', re.MULTILINE | re.IGNORECASE)
+
+
+class CifLoop:
+    """
+    A numeric CIF loop read into numpy columns, together with the position of the loop in the file it came from.
+    """
+
+    def __init__(self, tags: List[str], block: np.ndarray, start: int, end: int):
+        """
+        :param tags: loop tags, in file order
+        :param block: 2D float64 array with one row per tag
+        :param start: offset of the `loop_` keyword in the file
+        :param end: offset of the first byte after the loop data
+        """
+        self.tags = tags
+        self.block = block
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.block.shape[1]
+
+    def __getitem__(self, tag: str) -> np.ndarray:
+        return self.block[self.tags.index(tag)]
+
+    def __repr__(self) -> str:
+        return 'Loop of {} rows: {}'.format(len(self), ', '.join(self.tags))
+
+    def header(self, rows: int = 0) -> str:
+        """
+        Return the loop as CIF text, keeping only the first few data rows
+
+        :param rows: number of data rows to write
+        """
+        lines = ['loop_', *self.tags]
+        for row in self.block[:, :rows].T:
+            lines.append(' '.join(repr(value) for value in row.tolist()))
+        return '\n'.join(lines) + '\n'
+
+
+def _parseValues(buffer: Union[mmap.mmap, bytes], start: int, end: int, columns: int,
+                 chunk_size: int) -> Optional[np.ndarray]:
+    """
+    Parse whitespace separated numbers into a (columns, rows) array, one chunk of lines at a time so that only the
+    result and a single chunk are held in memory
+    """
+    block = None
+    filled = 0
+    leftover = np.empty(0)
+    pos = start
+    while pos < end:
+        stop = min(pos + chunk_size, end)
+        if stop < end:
+            # Never split a line, numbers could be cut in two
+            newline = buffer.rfind(b'\n', pos, stop)
+            if newline < 0:
+                newline = buffer.find(b'\n', stop, end)
+            stop = end if newline < 0 else newline + 1
+        chunk = buffer[pos:stop]
+        pos = stop
+        if chunk.isspace():
+            continue
+        with warnings.catch_warnings():
+            # Anything which is not a plain number (`?`, `.`, su brackets, comments) makes this fail
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                values = np.fromstring(chunk, dtype=np.float64, sep=' ')
+            except (DeprecationWarning, ValueError):
+                return None
+        if len(leftover):
+            values = np.concatenate((leftover, values))
+        rows = len(values) // columns
+        leftover = values[rows * columns:]
+        if block is None:
+            # Guess the final size from the first chunk, it is grown if the guess is too small
+            capacity = max(rows, int(rows * (end - start) / (stop - start) * 1.05) + 1)
+            block = np.empty((columns, capacity), dtype=np.float64)
+        if filled + rows > block.shape[1]:
+            grown = np.empty((columns, max(filled + rows, 2 * block.shape[1])), dtype=np.float64)
+            grown[:, :filled] = block[:, :filled]
+            block = grown
+        block[:, filled:filled + rows] = values[:rows * columns].reshape(rows, columns).T
+        filled += rows
+    if len(leftover):
+        return None
+    if block is None:
+        return np.empty((columns, 0), dtype=np.float64)
+    # Each row of the trimmed view is still contiguous
+    return block[:, :filled]
+
+
+def readLoop(file_path: Union[str, os.PathLike], prefix: str,
+             chunk_size: int = CHUNK_SIZE) -> Optional[CifLoop]:
+    """
+    Memory-map a CIF file and read the first loop whose tags all start with `prefix` into numpy columns.
+
+    :param file_path: path to a `.cif` file
+    :param prefix: tag prefix of the loop, e.g. `_pd_meas_`
+    :param chunk_size: size in bytes of the blocks in which the data is parsed
+    :return: The loop, or None if there is no such loop or its data is not purely numeric
+    """
+    prefix = prefix.lower()
+    with open(file_path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return None
+        try:
+            for header in _LOOP_HEADER.finditer(buffer):
+                tags = [tag.decode() for tag in header.group(1).split()]
+                if not all(tag.lower().startswith(prefix) for tag in tags):
+                    continue
+                footer = _LOOP_END.search(buffer, header.end())
+                end = len(buffer) if footer is None else footer.start()
+                block = _parseValues(buffer, header.end(), end, len(tags), chunk_size)
+                if block is None:
+                    _log.debug('Loop %s is not purely numeric', prefix)
+                    return None
+                return CifLoop(tags, block, header.start(), end)
+        finally:
+            buffer.close()
+    return None
+
+
+def readWithoutLoop(file_path: Union[str, os.PathLike], loop: CifLoop, rows: int = 1) -> str:
+    """
+    Read a CIF file as text, replacing the data of a loop by its first few rows
+
+    :param file_path: path to the `.cif` file the loop was read from
+    :param loop: loop returned by `readLoop`
+    :param rows: number of data rows to keep
+    :return: CIF content
+    """
+    with open(file_path, 'rb') as f:
+        before = f.read(loop.start)
+        f.seek(loop.end)
+        after = f.read()
+    return before.decode() + loop.header(rows) + after.decode()
@@ -1,30 +1,88 @@
 __author__ = 'simonward'
 __version__ = "2020_02_01"
 
+import sys
 from collections import deque, UserDict
+from collections.abc import MutableMapping, MutableSequence, MutableSet
 from copy import deepcopy
-from typing import Union, Any, NoReturn, Tuple, List
+from itertools import count
+from typing import Union, Any, NoReturn, Tuple, List, Optional
 import abc
 
-import dictdiffer
+import numpy as np
+
+from easyInterface.Utils.CacheTools import sizeOf
+
+# Default memory budget of the undo stack of the project dictionary
+UNDO_STACK_SIZE = 1 << 28
+
+# Arrays and lists of which at most this fraction of the items changed are kept on the undo stack as a delta
+ARRAY_DELTA_FRACTION = 0.5
+
+# Relative difference below which two numbers are taken to be equal by `PathDict.dictComparison`
+COMPARISON_TOLERANCE = 1E-8
+
+# Source of the `PathDict.version` stamps. All nodes share it, so the versions of different nodes can be compared
+_VERSIONS = count(1)
+
+# Counts replacements and removals of dictionaries held by PathDicts without a path index, see `PathDict.indexPaths`
+_structure_version = 0
+
+# Values which are compared directly and need not be copied
+_LEAF_TYPES = (type(None), bool, int, float, complex, str)
+_NUMBER_TYPES = (int, float)
+
+# Stands for an item which is not there, as opposed to one holding None
+_MISSING = object()
 
 
 class UndoStack:
     """
-    Implement a version of QUndoStack without the QT
+    Implement a version of QUndoStack without the QT. The stack can be limited by the number of commands and by the
+    approximate memory held by the commands, in which case the oldest commands are dropped.
     """
 
-    def __init__(self, max_history: Union[int, type(None)] = None):
+    def __init__(self, max_history: Union[int, type(None)] = None, max_bytes: Optional[int] = None):
+        """
+        :param max_history: maximum number of commands, None for no limit
+        :param max_bytes: memory budget of the commands in bytes, None for no limit
+        """
         self._history = deque(maxlen=max_history)
         self._future = deque(maxlen=max_history)
         self._macro_running = False
         self._macro = dict(text="", commands=[])
         self._max_history = max_history
+        self.max_bytes = max_bytes
+        # Running total of the sizes of the commands in history and future, see `bytes`
+        self._bytes = 0
 
     @property
     def history(self) -> deque:
         return self._history
 
+    @property
+    def bytes(self) -> int:
+        """
+        Approximate memory held by the commands on the stack in bytes. Values shared between commands or with the
+        dictionary are counted for every command holding them.
+        """
+        return self._bytes
+
+    def _prepend(self, stack: deque, command: Union[dict, 'UndoCommand']) -> NoReturn:
+        """
+        Put a command on top of the history or the future, dropping the size of the command which falls off the bottom
+        """
+        if len(stack) > 0 and len(stack) == stack.maxlen:
+            self._bytes -= _commandSize(stack[-1])
+        stack.appendleft(command)
+
+    def _count(self, command: Union[dict, 'UndoCommand']) -> NoReturn:
+        """
+        Add the size of a command which has been put on the history to the total
+        """
+        if len(self._history) > 0 and self._history[0] is command:
+            self._bytes += _commandSize(command)
+
     def push(self, command) -> NoReturn:
         """
         Add a command to the history stack
@@ -32,9 +90,17 @@ class UndoStack:
         if self._macro_running:
             self._macro['commands'].append(command)
         else:
-            self._history.appendleft(command)
-        command.redo()
+            self._prepend(self._history, command)
+        try:
+            command.redo()
+        finally:
+            # Commands are sized once they have been done
+            if not self._macro_running:
+                self._count(command)
+        self._bytes -= sum(_commandSize(command) for command in self._future)
         self._future = deque(maxlen=self._max_history)
+        if not self._macro_running:
+            self._shrink()
 
     def clear(self) -> NoReturn:
         """
@@ -44,6 +110,49 @@ class UndoStack:
         self._future = deque(maxlen=self._max_history)
         self._macro_running = False
         self._macro = dict(text="", commands=[])
+        self._bytes = 0
+
+    def resize(self, max_bytes: Optional[int]) -> NoReturn:
+        """
+        Change the memory budget, dropping the oldest commands which no longer fit
+
+        :param max_bytes: memory budget in bytes, None for no limit
+        """
+        self.max_bytes = max_bytes
+        self._shrink()
+
+    def compact(self) -> NoReturn:
+        """
+        Merge consecutive commands setting the same item into one command, also within bulk updates. Undoing the merged
+        command restores the value from before the first of them.
+        """
+        if self._macro_running:
+            return
+        history = _compactCommands(list(reversed(self._history)))
+        self._history = deque(reversed(history), maxlen=self._max_history)
+        for command in history:
+            if isinstance(command, dict):
+                command['commands'] = _compactCommands(command['commands'])
+                command.pop('size', None)
+        self._bytes = sum(_commandSize(command) for command in (*self._history, *self._future))
+
+    def info(self) -> dict:
+        """
+        :return: The number of commands which can be undone and redone, their approximate size and the limits
+        """
+        return {'undo': len(self._history), 'redo': len(self._future), 'bytes': self.bytes,
+                'max_bytes': self.max_bytes, 'max_history': self._max_history}
+
+    def _shrink(self) -> NoReturn:
+        """
+        Drop the oldest commands until the stack fits in the memory budget. The last command is always kept.
+        """
+        if self.max_bytes is None:
+            return
+        while self._bytes > self.max_bytes and len(self._future) > 0:
+            self._bytes -= _commandSize(self._future.pop())
+        while self._bytes > self.max_bytes and len(self._history) > 1:
+            self._bytes -= _commandSize(self._history.pop())
 
     def undo(self) -> NoReturn:
         """
@@ -51,7 +160,7 @@ class UndoStack:
         """
         if self.canUndo():
             command = self._history[0]
-            self._future.appendleft(command)
+            self._prepend(self._future, command)
             self._history.popleft()
             if isinstance(command, dict):
                 for item in command['commands'][::-1]:
@@ -65,8 +174,10 @@ class UndoStack:
         """
         if len(self._future) > 0:
             command = self._future[0]
-            if not self._macro_running:
-                self._history.appendleft(command)
+            if self._macro_running:
+                self._bytes -= _commandSize(command)
+            else:
+                self._prepend(self._history, command)
             self._future.popleft()
             if isinstance(command, dict):
                 for item in command['commands']:
@@ -90,7 +201,9 @@ class UndoStack:
         if not self._macro_running:
             raise AssertionError
         self._macro_running = False
-        self._history.appendleft(self._macro)
+        self._prepend(self._history, self._macro)
+        self._count(self._macro)
+        self._shrink()
 
     def canUndo(self) -> bool:
         """
@@ -112,7 +225,7 @@ class UndoStack:
             if isinstance(self._future[0], dict):
                 return self._future[0]['text']
             else:
-                return self._future[0]._text
+                return self._future[0].text()
         else:
             return ''
 
@@ -124,7 +237,7 @@ class UndoStack:
             if isinstance(self._history[0], dict):
                 return self._history[0]['text']
             else:
-                return self._history[0]._text
+                return self._history[0].text()
         else:
             return ''
 
@@ -155,6 +268,9 @@ class UndoCommand(metaclass=abc.ABCMeta):
     def setText(self, text: str) -> NoReturn:
         self._text = text
 
+    def text(self) -> str:
+        return self._text
+
 
 class _EmptyCommand(UndoCommand):
     """
@@ -176,9 +292,10 @@ class _AddItemCommand(_EmptyCommand):
     the UndoableDict-base_dict dictionary.
     """
 
-    def __init__(self, dictionary: 'UndoableDict', key: Union[str, list], value: Any):
-        super().__init__(dictionary, key, value)
-        self.setText("Adding: {} = {}".format(self._key, self._new_value))
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "Adding: {} = {}".format(self._key, self._new_value)
+        return self._text
 
     def undo(self) -> NoReturn:
         self._dictionary._realDelItem(self._key)
@@ -193,9 +310,11 @@ class _SetItemCommand(_EmptyCommand):
     the existing key in the UndoableDict-base_dict dictionary.
     """
 
-    def __init__(self, dictionary: 'UndoableDict', key: Union[str, list], value: Any):
-        super().__init__(dictionary, key, value)
-        self.setText("Setting: {} = {}".format(self._key, self._new_value))
+    def text(self) -> str:
+        # Written out when asked for, as the value can be a whole experiment
+        if self._text is None:
+            self._text = "Setting: {} = {}".format(self._key, self._new_value)
+        return self._text
 
     def undo(self) -> NoReturn:
         if self._new_value is not self._old_value:
@@ -208,6 +327,58 @@ class _SetItemCommand(_EmptyCommand):
         if self._new_value is not self._old_value:
             self._dictionary._realSetItem(self._key, self._new_value)
 
+    def merge(self, command: UndoCommand) -> bool:
+        """
+        Fold a command setting the same item right after this one into this command
+
+        :param command: the following command
+        :return: True if the command was merged
+        """
+        if type(command) is not type(self) or command._dictionary is not self._dictionary or \
+                command._key != self._key:
+            return False
+        self._new_value = command._new_value
+        self._text = command._text
+        self._size = None
+        return True
+
+
+class _SetArrayCommand(_SetItemCommand):
+    """
+    The _SetArrayCommand class implements a command to replace an array or a
+    list by one of the same length, keeping only the changed items on the
+    stack. The values before and after the command are rebuilt from the value
+    in the dictionary, so the command has to be undone and redone in stack order.
+    """
+
+    def __init__(self, dictionary: 'UndoableDict', key: Union[str, list], value: Any, delta: tuple):
+        super().__init__(dictionary, key, value)
+        self._old_value = None
+        self._delta = delta
+        self.setText("Setting: {} ({} of {} items changed)".format(self._key, len(delta[0]), len(value)))
+
+    def undo(self) -> NoReturn:
+        index, old_items, _ = self._delta
+        self._dictionary._realSetItem(self._key, _applyDelta(self._dictionary.getItem(self._key), index, old_items))
+
+    def redo(self) -> NoReturn:
+        if self._new_value is None:
+            index, _, new_items = self._delta
+            value = _applyDelta(self._dictionary.getItem(self._key), index, new_items)
+        else:
+            # The first time round the new value is set as given and released afterwards
+            value, self._new_value = self._new_value, None
+        self._dictionary._realSetItem(self._key, value)
+
+    def merge(self, command: UndoCommand) -> bool:
+        if type(command) is not type(self) or command._dictionary is not self._dictionary or \
+                command._key != self._key:
+            return False
+        self._delta = _mergeDeltas(self._delta, command._delta)
+        self._text = command._text
+        self._size = None
+        return True
+
 
 class _RemoveItemCommand(_EmptyCommand):
     """
@@ -226,24 +397,514 @@ class _RemoveItemCommand(_EmptyCommand):
         self._dictionary._realDelItem(self._key)
 
 
+class _SetItemsCommand(UndoCommand):
+    """
+    The _SetItemsCommand class implements a command to set or remove many
+    items of the UndoableDict-base_dict dictionary in one step. The paths are
+    walked in order and the part shared with the previous path is not walked
+    again, so sorted paths are resolved in a single pass.
+    """
+
+    # Kinds of change
+    _SET, _DELTA, _REMOVE, _ADD = range(4)
+
+    def __init__(self, dictionary: 'UndoableDict', keys: list, values: list, text: str):
+        super().__init__(self)
+        self._dictionary = dictionary
+        self._keys = keys
+        self._values = values
+        self._entries = []
+        self.setText(text)
+
+    def _store(self, parent: Any, key: Any, value: Any) -> NoReturn:
+        if parent is self._dictionary:
+            self._dictionary._realSetItem(key, value)
+        else:
+            parent[key] = value
+
+    def _remove(self, parent: Any, key: Any) -> NoReturn:
+        if parent is self._dictionary:
+            self._dictionary._realDelItem(key)
+        else:
+            del parent[key]
+
+    def _firstRedo(self) -> NoReturn:
+        """
+        Make the changes, noting what they replace. Empty tuples remove an item as in `UndoableDict.setItemByPath`.
+        """
+        walker = _PathWalker(self._dictionary)
+        # Kept as they are made, so that a failing bulk update can still be undone
+        self._entries = entries = []
+        for key, value in zip(self._keys, self._values):
+            path = key if isinstance(key, list) else [key]
+            if isinstance(value, tuple):
+                if len(value) == 0:
+                    parent = walker.parent(path)
+                    entries.append([path, self._REMOVE, _childOf(parent, path[-1]), None])
+                    self._remove(parent, path[-1])
+                continue
+            parent = walker.parent(path)
+            old_value = _childOf(parent, path[-1])
+            if old_value is value:
+                continue
+            if old_value is _MISSING:
+                entries.append([path, self._ADD, None, value])
+                self._store(parent, path[-1], value)
+                continue
+            delta = _arrayDelta(old_value, value) if isinstance(value, (np.ndarray, list)) else None
+            if delta is None:
+                entries.append([path, self._SET, old_value, value])
+            else:
+                entries.append([path, self._DELTA, delta, None])
+            self._store(parent, path[-1], value)
+        walker.stamp()
+        self._keys = self._values = None
+
+    def undo(self) -> NoReturn:
+        walker = _PathWalker(self._dictionary)
+        for path, kind, old, new in reversed(self._entries):
+            parent = walker.parent(path)
+            if kind == self._REMOVE:
+                if isinstance(parent, MutableSequence):
+                    parent.insert(path[-1], old)
+                else:
+                    self._store(parent, path[-1], old)
+            elif kind == self._DELTA:
+                index, old_items, _ = old
+                self._store(parent, path[-1], _applyDelta(parent[path[-1]], index, old_items))
+            elif kind == self._ADD:
+                self._remove(parent, path[-1])
+            else:
+                self._store(parent, path[-1], old)
+        walker.stamp()
+
+    def redo(self) -> NoReturn:
+        if self._keys is not None:
+            self._firstRedo()
+            return
+        walker = _PathWalker(self._dictionary)
+        for path, kind, old, new in self._entries:
+            parent = walker.parent(path)
+            if kind == self._REMOVE:
+                self._remove(parent, path[-1])
+            elif kind == self._DELTA:
+                index, _, new_items = old
+                self._store(parent, path[-1], _applyDelta(parent[path[-1]], index, new_items))
+            else:
+                self._store(parent, path[-1], new)
+        walker.stamp()
+
+
+class _PathWalker:
+    """
+    Finds the parents of the items at a sequence of paths, starting from where the previous path branches off
+    """
+
+    def __init__(self, root: 'PathDict'):
+        self._path = []
+        self._nodes = [root]
+        self._walked = []
+
+    def parent(self, path: list) -> Any:
+        """
+        :param path: path of an item
+        :return: the object holding the item
+        """
+        parent_path = path[:-1]
+        common = 0
+        for previous, key in zip(self._path, parent_path):
+            if previous != key:
+                break
+            common += 1
+        nodes = self._nodes[:common + 1]
+        item = nodes[-1]
+        for key in parent_path[common:]:
+            item = item[key]
+            nodes.append(item)
+            if isinstance(item, PathDict):
+                self._walked.append(item)
+        self._path = parent_path
+        self._nodes = nodes
+        return item
+
+    def stamp(self) -> NoReturn:
+        """
+        Give the root and the PathDicts walked through a new version, see `PathDict.version`
+        """
+        version = next(_VERSIONS)
+        self._nodes[0]._stamp(version)
+        for item in self._walked:
+            item._version = version
+
+
+def _childOf(item: Any, key: Any) -> Any:
+    """
+    Item at key of a dictionary or a list, `_MISSING` if there is none. Lists and arrays are indexed as in
+    `PathDict.getItemByPath`.
+    """
+    if isinstance(item, (list, np.ndarray)):
+        return item[key]
+    if key in item.keys():
+        return item[key]
+    return _MISSING
+
+
+def _itemByPath(item: Any, keys: Union[list, tuple], default=None) -> Any:
+    """
+    Walk a nested object by key sequence, see `PathDict.getItemByPath`
+    """
+    for key in keys:
+        if isinstance(item, (list, np.ndarray)):
+            item = item[key]
+        elif key in item:
+            item = item[key]
+        else:
+            return default
+    return item
+
+
+def _pathEntry(root: 'PathDict', path: tuple) -> tuple:
+    """
+    Deepest dictionary on a path which is reached through PathDicts only, with the keys left to walk from it. Those
+    dictionaries can only be replaced through a PathDict, which keeps `PathDict.indexPaths` up to date.
+    """
+    item = root
+    depth = 0
+    for key in path[:-1]:
+        if not isinstance(item, PathDict):
+            break
+        child = item.data.get(key)
+        if not isinstance(child, MutableMapping):
+            break
+        item = child
+        depth += 1
+    return item, path[depth:]
+
+
+def _commandSize(command: Union[dict, UndoCommand]) -> int:
+    """
+    Approximate memory held by a command or a bulk update, worked out once and kept with the command
+    """
+    if isinstance(command, dict):
+        size = command.get('size', None)
+        if size is None:
+            size = sys.getsizeof(command) + sum(_commandSize(item) for item in command['commands'])
+            command['size'] = size
+        return size
+    size = getattr(command, '_size', None)
+    if size is None:
+        size = sys.getsizeof(command) + sum(sizeOf(getattr(command, name, None))
+                                            for name in ('_new_value', '_old_value', '_delta', '_entries'))
+        command._size = size
+    return size
+
+
+def _compactCommands(commands: list) -> list:
+    """
+    Merge runs of `_SetItemCommand`s on the same item in a list of commands, oldest first
+    """
+    compacted = []
+    for command in commands:
+        last = compacted[-1] if compacted else None
+        if isinstance(last, _SetItemCommand) and last.merge(command):
+            continue
+        compacted.append(command)
+    return compacted
+
+
+def _setItemCommand(dictionary: 'UndoableDict', key: Union[str, list], value: Any) -> _SetItemCommand:
+    """
+    Command setting an existing item. Arrays and lists replaced by ones of the same length are stored as a delta if few
+    enough of their items changed.
+    """
+    if isinstance(value, (np.ndarray, list)):
+        delta = _arrayDelta(dictionary.getItem(key), value)
+        if delta is not None:
+            return _SetArrayCommand(dictionary, key, value, delta)
+    return _SetItemCommand(dictionary, key, value)
+
+
+def _arrayDelta(old_value: Any, new_value: Any) -> Optional[tuple]:
+    """
+    Items which differ between two numeric arrays of the same shape and type, or two lists of numbers and strings of
+    the same length
+
+    :return: Flat indices of the changed items with their old and new values, None if the values can not be compared
+    this way or more than `ARRAY_DELTA_FRACTION` of the items changed
+    """
+    if isinstance(new_value, np.ndarray):
+        if type(old_value) is not type(new_value) or old_value.shape != new_value.shape or \
+                old_value.dtype != new_value.dtype or new_value.dtype.kind not in 'biufc':
+            return None
+        old_items = old_value.ravel()
+        new_items = new_value.ravel()
+        with np.errstate(invalid='ignore'):
+            changed = old_items != new_items
+            if new_value.dtype.kind in 'fc':
+                changed &= ~(np.isnan(old_items) & np.isnan(new_items))
+        index = np.flatnonzero(changed)
+        if len(index) > ARRAY_DELTA_FRACTION * new_value.size:
+            return None
+        return index, old_items[index], new_items[index]
+    if type(old_value) is not list or type(new_value) is not list or len(old_value) != len(new_value):
+        return None
+    index = []
+    for i, (old, new) in enumerate(zip(old_value, new_value)):
+        if type(old) not in _LEAF_TYPES or type(new) not in _LEAF_TYPES:
+            return None
+        if old != new and (old == old or new == new):
+            index.append(i)
+    if len(index) > ARRAY_DELTA_FRACTION * len(new_value):
+        return None
+    return index, [old_value[i] for i in index], [new_value[i] for i in index]
+
+
+def _applyDelta(value: Union[np.ndarray, list], index: Union[np.ndarray, list],
+                items: Union[np.ndarray, list]) -> Union[np.ndarray, list]:
+    """
+    Copy of an array or list with the items at the flat indices replaced
+    """
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        np.put(value, index, items)
+        return value
+    value = list(value)
+    for i, item in zip(index, items):
+        value[i] = item
+    return value
+
+
+def _mergeDeltas(first: tuple, second: tuple) -> tuple:
+    """
+    Delta of two deltas applied one after the other
+    """
+    first_index, first_old, first_new = first
+    second_index, second_old, second_new = second
+    if isinstance(first_index, np.ndarray):
+        index = np.union1d(first_index, second_index)
+        first_position = np.searchsorted(index, first_index)
+        second_position = np.searchsorted(index, second_index)
+        old_items = np.empty(len(index), dtype=first_old.dtype)
+        old_items[second_position] = second_old
+        old_items[first_position] = first_old
+        new_items = np.empty(len(index), dtype=first_new.dtype)
+        new_items[first_position] = first_new
+        new_items[second_position] = second_new
+        return index, old_items, new_items
+    old_items = dict(zip(second_index, second_old))
+    old_items.update(zip(first_index, first_old))
+    new_items = dict(zip(first_index, first_new))
+    new_items.update(zip(second_index, second_new))
+    index = sorted(old_items)
+    return index, [old_items[i] for i in index], [new_items[i] for i in index]
+
+
+def _valuesDiffer(first: Any, second: Any) -> bool:
+    """
+    Numbers differ if they are further apart than the relative `COMPARISON_TOLERANCE`, NaN equals NaN. Anything else
+    is compared with ==.
+    """
+    if first == second:
+        return False
+    first_is_nan, second_is_nan = bool(first != first), bool(second != second)
+    if first_is_nan or second_is_nan:
+        return not (first_is_nan and second_is_nan)
+    if isinstance(first, _NUMBER_TYPES) and isinstance(second, _NUMBER_TYPES):
+        return abs(first - second) > COMPARISON_TOLERANCE * max(abs(first), abs(second))
+    return True
+
+
+def _arraysDiffer(first: Any, second: Any) -> bool:
+    """
+    Vectorised `_valuesDiffer` for arrays, arrays of a different shape differ
+    """
+    first = np.asarray(first)
+    second = np.asarray(second)
+    if first.shape != second.shape:
+        return True
+    if first.dtype.kind not in 'biufc' or second.dtype.kind not in 'biufc':
+        return not np.array_equal(first, second)
+    with np.errstate(invalid='ignore'):
+        same = first == second
+        if same.all():
+            return False
+        scale = np.maximum(np.abs(first), np.abs(second))
+        same |= np.abs(first - second) <= COMPARISON_TOLERANCE * scale
+        same |= np.isnan(first) & np.isnan(second)
+    return not same.all()
+
+
+def _detached(value: Any) -> Any:
+    if type(value) in _LEAF_TYPES or isinstance(value, np.ndarray):
+        return value
+    return deepcopy(value)
+
+
+class _Comparison:
+    """
+    Walks two nested dictionaries and collects the updates which turn the first into the second, see
+    `PathDict.dictComparison`.
+
+    * Objects which are identical are not walked, so shared subtrees and interned values are skipped.
+    * Numbers and strings are compared directly, numbers with the relative `COMPARISON_TOLERANCE`.
+    * Numpy arrays are compared in one go and replaced as a whole when they differ.
+    * Dictionaries and lists are walked, added and removed items are reported as such.
+    """
+
+    def __init__(self, target: 'PathDict', ignore: Optional[set] = None):
+        self.target = target
+        self.ignore = ignore
+        self.keys = []
+        self.values = []
+        self.modifiers = []
+        self._path = []
+
+    def _add(self, path: list, value: Any, modifier) -> NoReturn:
+        self.keys.append(path)
+        self.values.append(value)
+        self.modifiers.append(modifier)
+
+    def _ignored(self, key: Any) -> bool:
+        path = (*self._path, key)
+        if path in self.ignore:
+            return True
+        return all(isinstance(item, str) and '.' not in item for item in path) and '.'.join(path) in self.ignore
+
+    def compare(self, first: Any, second: Any) -> NoReturn:
+        if first is second:
+            return
+        if type(first) in _LEAF_TYPES and type(second) in _LEAF_TYPES:
+            if _valuesDiffer(first, second):
+                self._add(list(self._path), second, self.target.setItemByPath)
+        elif isinstance(first, MutableMapping) and isinstance(second, MutableMapping):
+            self._compareMappings(first, second)
+        elif (isinstance(first, np.ndarray) or isinstance(second, np.ndarray)) and \
+                isinstance(first, (np.ndarray, MutableSequence)) and isinstance(second, (np.ndarray, MutableSequence)):
+            if _arraysDiffer(first, second):
+                self._add(list(self._path), second, self.target.setItemByPath)
+        elif isinstance(first, MutableSequence) and isinstance(second, MutableSequence):
+            self._compareLists(first, second)
+        elif isinstance(first, MutableSet) and isinstance(second, MutableSet):
+            if first != second:
+                self._add(list(self._path), _detached(second), self.target.setItemByPath)
+        elif _valuesDiffer(first, second):
+            self._add(list(self._path), _detached(second), self.target.setItemByPath)
+
+    def _compareMappings(self, first: MutableMapping, second: MutableMapping) -> NoReturn:
+        if isinstance(first, UserDict):
+            first = first.data
+        if isinstance(second, UserDict):
+            second = second.data
+        ignore = self.ignore
+        path = self._path
+        for key in first:
+            if key in second and (ignore is None or not self._ignored(key)):
+                path.append(key)
+                self.compare(first[key], second[key])
+                path.pop()
+        for key in second:
+            if key not in first and (ignore is None or not self._ignored(key)):
+                self._add([*path, key], _detached(second[key]), self.target.setItemByPath)
+        for key in first:
+            if key not in second and (ignore is None or not self._ignored(key)):
+                self._add([*path, key], (), self.target.rmItemByPath)
+
+    def _compareLists(self, first: MutableSequence, second: MutableSequence) -> NoReturn:
+        path = self._path
+        common = min(len(first), len(second))
+        for index in range(common):
+            path.append(index)
+            self.compare(first[index], second[index])
+            path.pop()
+        if len(second) > common:
+            # Lists are replaced as a whole when they grow
+            self._add(list(path), _detached(second), self.target.setItemByPath)
+        for index in reversed(range(common, len(first))):
+            self._add([*path, index], (), self.target.rmItemByPath)
+
+
 class PathDict(UserDict):
     """
     The PathDict class extends a python dictionary with methods to access its nested
     elements by list-base_dict path of keys.
+
+    Every change made through a PathDict gives it, its ancestors and the PathDicts on the path to the changed item a
+    new `version`. A PathDict knows its parent once it has been stored in another PathDict.
     """
+    _version = 0
+    _path_index = None
+    _parent = None
 
     # Private methods
 
+    def _touch(self, keys: Union[str, list] = ()) -> NoReturn:
+        """Stamp self, its ancestors and the PathDicts on the way to the item at keys with a new version."""
+        version = next(_VERSIONS)
+        self._stamp(version)
+        if isinstance(keys, list):
+            item = self
+            for key in keys[:-1]:
+                item = item[key]
+                if isinstance(item, PathDict):
+                    item._version = version
+
+    def _stamp(self, version: int) -> NoReturn:
+        """Give self and its ancestors a version."""
+        item = self
+        while item is not None:
+            item._version = version
+            item = item._parent
+
+    def _adopt(self, value: Any) -> NoReturn:
+        """Make self the parent of a PathDict which is stored in it, unless it is self or one of its ancestors."""
+        if not isinstance(value, PathDict):
+            return
+        item = self
+        while item is not None:
+            if item is value:
+                return
+            item = item._parent
+        value._parent = self
+
+    def _release(self, key: Any) -> NoReturn:
+        """Drop the parent of the PathDict at key, if it is about to be replaced or removed."""
+        value = self.data.get(key)
+        if isinstance(value, PathDict) and value._parent is self:
+            value._parent = None
+
+    def _adoptChildren(self) -> NoReturn:
+        """Make self the parent of the PathDicts it holds which have none, e.g. after a copy."""
+        for value in self.data.values():
+            if isinstance(value, PathDict) and value._parent is None:
+                self._adopt(value)
+
+    def _restructure(self, key: Any) -> NoReturn:
+        """Drop the indexed paths through the item at key, if it is a dictionary which is about to be replaced."""
+        if isinstance(self.data.get(key), MutableMapping):
+            if self._path_index is None:
+                global _structure_version
+                _structure_version += 1
+            else:
+                self._path_index.pop(key, None)
+
     def _realSetItem(self, key: Union[str, List], value: Any) -> NoReturn:
         """Actually changes the value for the existing key in dictionary."""
         if isinstance(key, list):
             self.getItemByPath(key[:-1])[key[-1]] = value
         else:
+            self._restructure(key)
+            self._release(key)
             super().__setitem__(key, value)
+            self._adopt(value)
+        self._touch(key)
 
     def _realAddItem(self, key: str, value: Any) -> NoReturn:
         """Actually adds a key-value pair to dictionary."""
+        self._restructure(key)
+        self._release(key)
         super().__setitem__(key, value)
+        self._adopt(value)
+        self._touch(key)
 
     def _realDelItem(self, key: Union[str, list]) -> NoReturn:
         """Actually deletes a key-value pair from dictionary."""
@@ -251,25 +912,59 @@ class PathDict(UserDict):
             if isinstance(key, list):
                 del self.getItemByPath(key[:-1])[key[-1]]
             else:
+                self._restructure(key)
+                self._release(key)
                 super().__delitem__(key)
                 # del self[key]
         except TypeError as ex:
             raise KeyError(str(ex))
+        self._touch(key)
 
     def _realSetItemByPath(self, keys: list, value: Any) -> NoReturn:
         """Actually sets the value in a nested object by the key sequence."""
         self.getItemByPath(keys[:-1])[keys[-1]] = value
+        self._touch(keys)
 
     def _realAddItemByPath(self, keys: list, value: Any) -> NoReturn:
         """Actually sets the value in a nested object by the key sequence."""
         item = self.getItemByPath(keys[:-1])
-        if isinstance(item, dictdiffer.LIST_TYPES):
+        if isinstance(item, MutableSequence):
             item.insert(keys[-1], value)
         else:
             item[keys[-1]] = value
+        self._touch(keys)
+
+    def __getstate__(self) -> dict:
+        # The parent is not copied or pickled along, copies are given their parent by `__setstate__` of the parent
+        state = self.__dict__.copy()
+        state.pop('_parent', None)
+        return state
+
+    def __setstate__(self, state: dict) -> NoReturn:
+        self.__dict__.update(state)
+        self._adoptChildren()
 
     # Public methods
 
+    @property
+    def version(self) -> int:
+        """
+        Version stamp of the last change made through this PathDict, one of its descendants or one of its parents.
+        Versions only grow and are shared by all PathDicts, so a version taken from one PathDict can be used with
+        `changedSince` of any other. Changes made to an item directly, e.g. to a parameter, or to a plain dictionary
+        which is not a PathDict are not seen above it.
+        """
+        return self._version
+
+    def changedSince(self, version: int) -> bool:
+        """
+        Has the PathDict changed after a given version?
+
+        :param version: version stamp, e.g. from `version`
+        :return: True if there has been a change since `version`
+        """
+        return self._version > version
+
     def __setitem__(self, key: str, val: Any) -> NoReturn:
         """Overrides default dictionary assignment to self[key] implementation."""
         if key in self:
@@ -277,6 +972,10 @@ class PathDict(UserDict):
         else:
             self._realAddItem(key, val)
 
+    def __delitem__(self, key: str) -> NoReturn:
+        """Overrides default dictionary deletion of self[key] implementation."""
+        self._realDelItem(key)
+
     def setItemByPath(self, keys: list, value: Any) -> NoReturn:
         """Set a value in a nested object by key sequence."""
         self._realSetItem(keys, value)
@@ -290,16 +989,31 @@ class PathDict(UserDict):
 
     def getItemByPath(self, keys: list, default=None) -> Any:
         """Returns a value in a nested object by key sequence."""
-        item = self
-        for key in keys:
-            if isinstance(item, list):
-                item = item[key]
-            else:
-                if key in item.keys():
-                    item = item[key]
-                else:
-                    return default
-        return item
+        index = getattr(self, '_path_index', None)
+        if index is None or not keys:
+            return _itemByPath(self, keys, default)
+        if self._path_index_version != _structure_version:
+            index.clear()
+            self._path_index_version = _structure_version
+        path = tuple(keys)
+        entries = index.get(path[0])
+        if entries is None:
+            entries = index[path[0]] = {}
+        entry = entries.get(path)
+        if entry is None:
+            entry = entries[path] = _pathEntry(self, path)
+        return _itemByPath(entry[0], entry[1], default)
+
+    def indexPaths(self, enable: bool = True) -> NoReturn:
+        """
+        Keep an index of the paths looked up with `getItemByPath`, so that looking a path up again starts from the last
+        dictionary on it instead of the root. The indexed paths through a dictionary are dropped when it is replaced or
+        removed through a PathDict. Changes made to the underlying `data` directly are not seen.
+
+        :param enable: False to drop the index
+        """
+        self._path_index = {} if enable else None
+        self._path_index_version = _structure_version
 
     def rmItemByPath(self, keys: list) -> NoReturn:
         self._realDelItem(keys)
@@ -323,7 +1037,9 @@ class PathDict(UserDict):
 
     def dictComparison(self, another_dict: Union['PathDict', dict], ignore=None) -> Tuple[list, list, list]:
         """
-        Compare self to a dictionary or PathDict and return the update path and value
+        Compare self to a dictionary or PathDict and return the update path and value. Identical subtrees are skipped
+        and numpy arrays are compared as a whole, see `_Comparison`.
+
         :param ignore: What to ignore e.g. set(['a']))
         :param another_dict: dict or PathDict to compare self to
         :return: path and value updates for self to become newDict
@@ -332,71 +1048,9 @@ class PathDict(UserDict):
         if not isinstance(another_dict, (PathDict, dict)):
             raise TypeError
 
-        type_list = []
-        key_list = []
-        value_list = []
-
-        items = list(dictdiffer.diff(self, another_dict, ignore=ignore, tolerance=1E-8))
-
-        for item in items:
-            type = item[0]
-            node = item[1]
-            changes = item[2]
-            if type == dictdiffer.CHANGE:
-                dest = dictdiffer.utils.dot_lookup(self, node, parent=True)
-                if isinstance(node, dictdiffer.string_types):
-                    path = node.split('.')
-                    last_node = path[-1]
-                    path = path[:-1]
-                else:
-                    path = node[:-1]
-                    last_node = node[-1]
-                if isinstance(dest, dictdiffer.LIST_TYPES):
-                    last_node = int(last_node)
-                path.append(last_node)
-                _, new_value = changes
-                modifier = self.setItemByPath
-                key_list.append(path)
-                value_list.append(new_value)
-                type_list.append(modifier)
-            elif type == dictdiffer.ADD:
-                for key, value in changes:
-                    dest = dictdiffer.utils.dot_lookup(self, node)
-                    path = node.split('.')
-                    if isinstance(dest, (dictdiffer.LIST_TYPES, dictdiffer.SET_TYPES)):
-                        if isinstance(dest, dictdiffer.LIST_TYPES):
-                            dest = deepcopy(dest)
-                            dest.insert(key, value)
-                        else:
-                            dest = value
-                        new_value = dest
-                        modifier = self.setItemByPath
-                    else:
-                        path.append(key)
-                        new_value = value
-                        modifier = self.setItemByPath
-                    key_list.append(path)
-                    value_list.append(new_value)
-                    type_list.append(modifier)
-
-            elif type == dictdiffer.REMOVE:
-                for key, value in changes:
-                    dest = dictdiffer.utils.dot_lookup(self, node)
-                    path = node.split('.')
-                    if isinstance(dest, dictdiffer.SET_TYPES):
-                        new_value = ()
-                        modifier = self.setItemByPath
-                    else:
-                        if path[-1] == '':
-                            path = path[:-1]
-                        path.append(key)
-                        new_value = ()
-                        modifier = self.rmItemByPath
-                    key_list.append(path)
-                    value_list.append(new_value)
-                    type_list.append(modifier)
-
-        return key_list, value_list, type_list
+        comparison = _Comparison(self, ignore)
+        comparison.compare(self, another_dict)
+        return comparison.keys, comparison.values, comparison.modifiers
 
 
 class UndoableDict(PathDict):
@@ -417,7 +1071,7 @@ class UndoableDict(PathDict):
         implementation and pushes this command on the stack.
         """
         if key in self:
-            self.__stack.push(_SetItemCommand(self, key, val))
+            self.__stack.push(_setItemCommand(self, key, val))
         else:
             self.__stack.push(_AddItemCommand(self, key, val))
 
@@ -438,11 +1092,18 @@ class UndoableDict(PathDict):
             if len(value) == 0:
                 self.__stack.push(_RemoveItemCommand(self, keys))
         else:
-            self.__stack.push(_SetItemCommand(self, keys, value))
+            self.__stack.push(_setItemCommand(self, keys, value))
 
     def rmItemByPath(self, keys: list) -> NoReturn:
         self.__stack.push(_RemoveItemCommand(self, keys))
 
+    def setItemWithoutUndo(self, key: Union[str, list], value: Any) -> NoReturn:
+        """
+        Set a value by simple key or key sequence without putting a command on the stack. This is meant for content
+        which follows from the undoable content, e.g. calculated results. Undo and redo do not restore it.
+        """
+        self._realSetItem(key, value)
+
     # Public methods: undo/redo-related
 
     def clearUndoStack(self) -> NoReturn:
@@ -452,6 +1113,27 @@ class UndoableDict(PathDict):
         """
         self.__stack.clear()
 
+    def setUndoStackSize(self, max_bytes: Optional[int]) -> NoReturn:
+        """
+        Limit the approximate memory held by the command stack. The oldest commands are dropped once it is exceeded.
+
+        :param max_bytes: memory budget in bytes, None for no limit
+        """
+        self.__stack.resize(max_bytes)
+
+    def compactUndoStack(self) -> NoReturn:
+        """
+        Merges consecutive commands which set the same item into one command.
+        """
+        self.__stack.compact()
+
+    def undoStackInfo(self) -> dict:
+        """
+        :return: The number of commands available for undo and redo, their approximate size in bytes and the limits
+        of the stack.
+        """
+        return self.__stack.info()
+
     def canUndo(self) -> bool:
         """
         :return true if there is a command available for undo;
@@ -515,9 +1197,4 @@ class UndoableDict(PathDict):
         :param item_list: the value to be updated
         :return: None
         """
-        if text != 'Bulk update':
-            self.startBulkUpdate(text)
-        for key, value in zip(key_list, item_list):
-            self.setItemByPath(key, value)
-        if text != 'Bulk update':
-            self.endBulkUpdate()
+        self.__stack.push(_SetItemsCommand(self, key_list, item_list, text))
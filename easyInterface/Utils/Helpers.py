@@ -1,13 +1,28 @@
 import os
 import json
+import logging
 import operator
 import webbrowser
+from collections import deque
 from functools import reduce
-from time import time
 from functools import wraps
 
+import numpy as np
+
 from easyInterface import logger
 
+try:
+    from time import perf_counter_ns
+except ImportError:
+    # Python 3.6
+    from time import perf_counter
+
+    def perf_counter_ns() -> int:
+        return int(perf_counter() * 1e9)
+
+# Number of most recent calls of each function used for the percentiles of `TimeStatistics`
+TIMING_SAMPLES = 1000
+
 
 def nested_get(dictionary: dict, keys_list: list):
     """Access a nested object in root by key sequence."""
@@ -111,9 +126,73 @@ def counted(func):
     return wrapped
 
 
+class TimeStatistics:
+    """
+    Call statistics of the functions decorated with `time_it`. Calls are recorded while the `timer.` logger of the
+    function is enabled for debug messages.
+    """
+
+    def __init__(self, samples: int = TIMING_SAMPLES):
+        """
+        :param samples: number of most recent calls of each function used for the 95th percentile
+        """
+        self._samples = samples
+        self._entries = {}
+
+    def add(self, name: str, duration: int):
+        """
+        Record a call
+
+        :param name: function name
+        :param duration: duration of the call in ns
+        """
+        entry = self._entries.get(name, None)
+        if entry is None:
+            entry = [0, 0, duration, duration, deque(maxlen=self._samples)]
+            self._entries[name] = entry
+        entry[0] += 1
+        entry[1] += duration
+        if duration < entry[2]:
+            entry[2] = duration
+        elif duration > entry[3]:
+            entry[3] = duration
+        entry[4].append(duration)
+
+    def table(self) -> dict:
+        """
+        :return: Dictionary of function name: dict of count and the total, min, max and p95 durations in ms
+        """
+        return {name: {'count': count, 'total': total / 1e6, 'min': low / 1e6, 'max': high / 1e6,
+                       'p95': float(np.percentile(samples, 95)) / 1e6}
+                for name, (count, total, low, high, samples) in self._entries.items()}
+
+    def dump(self) -> str:
+        """
+        :return: The statistics as a text table, slowest total first
+        """
+        table = self.table()
+        lines = ['{:<60} {:>8} {:>12} {:>10} {:>10} {:>10}'.format('function', 'count', 'total ms', 'min ms',
+                                                                   'max ms', 'p95 ms')]
+        for name in sorted(table, key=lambda key: table[key]['total'], reverse=True):
+            row = table[name]
+            lines.append('{:<60} {:>8} {:>12.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                name, row['count'], row['total'], row['min'], row['max'], row['p95']))
+        return '\n'.join(lines)
+
+    def reset(self):
+        """
+        Forget all recorded calls
+        """
+        self._entries = {}
+
+
+time_statistics = TimeStatistics()
+
+
 def time_it(func):
     """
-    Times a function and reports the time either to the class' log or the base logger
+    Times a function and reports the time to the `timer.` logger of the function and to `time_statistics`. When that
+    logger is not enabled for debug messages the function is called straight away.
     :param func: function to be timed
     :return: callable function with timer
     """
@@ -122,11 +201,14 @@ def time_it(func):
 
     @wraps(func)
     def _time_it(*args, **kwargs):
-        start = int(round(time() * 1000))
+        if not time_logger.isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
+        start = perf_counter_ns()
         try:
             return func(*args, **kwargs)
         finally:
-            end_ = int(round(time() * 1000)) - start
-            time_logger.debug(f"\033[1;34;49mExecution time: {end_ if end_ > 0 else 0} ms\033[0m")
+            duration = perf_counter_ns() - start
+            time_statistics.add(name, duration)
+            time_logger.debug('\033[1;34;49mExecution time: %.3f ms\033[0m', duration / 1e6)
 
     return _time_it
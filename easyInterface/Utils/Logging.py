@@ -43,13 +43,14 @@ class Logger:
         self.logging_level = level
         self.output_format = self._makeColorText()
         self._handlers = dict(sys=[], file=[])
-        self._loggers = []
+        # Registry of the loggers handed out, by name
+        self._loggers = {}
         self._filters = []
 
         # Gets or creates a logger
         self.logger = logging.getLogger(__name__)
 
-        self._loggers.append(self.logger)
+        self._loggers[__name__] = self.logger
 
         # set log level
         self.setLevel(self.logging_level)
@@ -73,7 +74,7 @@ class Logger:
         :return: None
         """
         if loggers is None:
-            loggers = self._loggers
+            loggers = self._loggers.values()
         elif not isinstance(loggers, list):
             loggers = [loggers]
 
@@ -90,7 +91,7 @@ class Logger:
             formatter = logging.Formatter(self.output_format)
             console_handler.setFormatter(formatter)
             self._handlers['sys'].append(console_handler)
-        for logger in self._loggers:
+        for logger in self._loggers.values():
             logger.addHandler(self._handlers['sys'][0])
 
     def addFileHandler(self, location: str):
@@ -105,7 +106,7 @@ class Logger:
         file_handler.setFormatter(formatter)
         self._handlers['file'].append(file_handler)
         # add file handler to logger
-        for logger in self._loggers:
+        for logger in self._loggers.values():
             logger.addHandler(file_handler)
 
     def removeFileHandlers(self):
@@ -114,7 +115,7 @@ class Logger:
         :return: None
         """
         for handler in self._handlers['file']:
-            for logger in self._loggers:
+            for logger in self._loggers.values():
                 logger.removeHandler(handler)
         self._handlers['file'] = []
 
@@ -153,12 +154,16 @@ class Logger:
 
     def getLogger(self, logger_name, color: str = '32', defaults: bool = True) -> logging:
         """
-        Create a logger
+        Create a logger, or return the one already created with this name. Loggers are set up once, later calls are a
+        lookup in the registry
         :param color:
         :param logger_name: logger name. Usually __name__ on creation
         :param defaults: Do you want to associate any current file loggers with this logger
         :return: A logger
         """
+        logger = self._loggers.get(logger_name, None)
+        if logger is not None:
+            return logger
         logger = logging.getLogger(logger_name)
         self.applyLevel(logger)
         for handler_type in self._handlers:
@@ -167,5 +172,5 @@ class Logger:
                     handler.formatter._fmt = self._makeColorText(color)
                     logger.addHandler(handler)
         logger.propagate = False
-        self._loggers.append(logger)
+        self._loggers[logger_name] = logger
         return logger
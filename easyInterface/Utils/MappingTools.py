@@ -0,0 +1,176 @@
+import re
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, List, NoReturn, Tuple
+
+from asteval import Interpreter
+
+# A mapping is `self` followed by any number of `.attribute` or `[index]` accessors
+_MAPPING_ROOT = 'self'
+_MAPPING_TOKEN = re.compile(r'\.([A-Za-z_]\w*)|\[(-?\d+)\]')
+
+
+class MappedItem:
+    """
+    A mapping string such as `self._cryspy_obj.crystals[0].atom_site.fract_x[3]` parsed once into a chain of
+    attribute/index getters.
+    """
+
+    __slots__ = ('mapping', '_getters', '_expression')
+
+    def __init__(self, mapping: str):
+        if not isinstance(mapping, str):
+            raise TypeError('Mapping must be a string, not {}'.format(type(mapping).__name__))
+        self.mapping = mapping
+        self._getters = []
+        self._expression = False
+        text = mapping.strip()
+        if not text.startswith(_MAPPING_ROOT):
+            self._expression = True
+            return
+        pos = len(_MAPPING_ROOT)
+        while pos < len(text):
+            match = _MAPPING_TOKEN.match(text, pos)
+            if match is None:
+                # Not a plain accessor chain, evaluate the whole thing when resolving
+                self._getters = []
+                self._expression = True
+                return
+            attribute, index = match.groups()
+            if attribute is not None:
+                self._getters.append(attrgetter(attribute))
+            else:
+                self._getters.append(itemgetter(int(index)))
+            pos = match.end()
+        if not self._getters:
+            self._expression = True
+
+    @property
+    def isExpression(self) -> bool:
+        """
+        Can this mapping only be resolved by evaluating it
+        """
+        return self._expression
+
+    def resolveParent(self, root: Any) -> Tuple[Any, Callable]:
+        """
+        Walk the chain up to the last accessor.
+
+        :param root: Object which `self` refers to
+        :return: The owner of the mapped item and the getter which returns the item from it
+        """
+        obj = root
+        for getter in self._getters[:-1]:
+            obj = getter(obj)
+        return obj, self._getters[-1]
+
+    def resolve(self, root: Any) -> Any:
+        """
+        Return the object the mapping points to.
+
+        :param root: Object which `self` refers to
+        """
+        obj = root
+        for getter in self._getters:
+            obj = getter(obj)
+        return obj
+
+
+class MappingCache:
+    """
+    Resolves calculator mapping strings through cached handles. Each mapping is parsed once, and the owner of the
+    mapped item is kept until `invalidate` is called, so that a lookup is a single attribute/index access.
+    """
+
+    def __init__(self, root: Any):
+        """
+        :param root: Object which `self` in the mapping strings refers to
+        """
+        self._root = root
+        self.version = 0
+        self._items = {}
+        self._handles = {}
+        self._interpreter = None
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def __contains__(self, mapping: str) -> bool:
+        return mapping in self._handles
+
+    def invalidate(self) -> NoReturn:
+        """
+        Drop all resolved handles. Must be called whenever the structure of the root object changes
+        """
+        self._handles = {}
+        self.version += 1
+
+    def _evaluate(self, mapping: str) -> Any:
+        if self._interpreter is None:
+            self._interpreter = Interpreter(usersyms=dict(self=self._root))
+        return self._interpreter(mapping)
+
+    def _handle(self, mapping: str) -> Tuple[Any, Callable]:
+        handle = self._handles.get(mapping, None)
+        if handle is not None:
+            return handle
+        item = self._items.get(mapping, None)
+        if item is None:
+            item = MappedItem(mapping)
+            self._items[mapping] = item
+        try:
+            if item.isExpression:
+                obj = self._evaluate(mapping)
+                if obj is None:
+                    raise TypeError
+                handle = (obj, None)
+            else:
+                parent, getter = item.resolveParent(self._root)
+                getter(parent)
+                handle = (parent, getter)
+        except (AttributeError, IndexError, KeyError, TypeError):
+            raise TypeError('Mapping {} can not be resolved'.format(mapping))
+        self._handles[mapping] = handle
+        return handle
+
+    def getItem(self, mapping: str) -> Any:
+        """
+        Return the object which a mapping points to
+
+        :param mapping: mapping string
+        :raises TypeError: If the mapping is not a string or does not point to anything
+        """
+        parent, getter = self._handle(mapping)
+        if getter is None:
+            return parent
+        obj = getter(parent)
+        if obj is None:
+            raise TypeError('Mapping {} points to nothing'.format(mapping))
+        return obj
+
+    def setValue(self, mapping: str, value: Any) -> NoReturn:
+        """
+        Set the value of a mapped parameter
+
+        :param mapping: mapping string
+        :param value: new value
+        """
+        self.getItem(mapping).value = value
+
+    def setRefine(self, mapping: str, value: bool) -> NoReturn:
+        """
+        Set the refinement flag of a mapped parameter
+
+        :param mapping: mapping string
+        :param value: should the parameter be refined
+        """
+        self.getItem(mapping).refinement = value
+
+    def setValues(self, mappings: List[str], values: List[Any]) -> NoReturn:
+        """
+        Set the values of many mapped parameters
+
+        :param mappings: list of mapping strings
+        :param values: list of new values
+        """
+        for mapping, value in zip(mappings, values):
+            self.getItem(mapping).value = value
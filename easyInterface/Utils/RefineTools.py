@@ -0,0 +1,112 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Event, Lock
+from typing import Any, Callable, Optional, NoReturn
+
+# Refinement message of the results of a cancelled refinement
+CANCELLED_MESSAGE = 'Refinement cancelled'
+
+
+class RefinementCancelled(Exception):
+    """
+    Raised by a calculator when a refinement is stopped through its cancel event. The refined parameters have been
+    restored to their values before the refinement.
+    """
+
+
+class RefinementTask:
+    """
+    Handle of a refinement running in a worker thread, as returned by `CalculatorInterface.refineAsync`. It can be
+    waited on, polled, cancelled and awaited from asyncio code. The results of the worker are collected by the first
+    call of `result` or by awaiting the task, in the thread which does so.
+    """
+
+    def __init__(self, future: Future, cancel_event: Event, collect: Optional[Callable[[Future], Any]] = None):
+        """
+        :param future: Future of the worker, which raises `RefinementCancelled` if the refinement was cancelled
+        :param cancel_event: Event which the calculator checks to stop the refinement
+        :param collect: Called once with the finished future to give the results, None to give the result of the future
+        """
+        self._future = future
+        self._cancel_event = cancel_event
+        self._collect = collect
+        self._collect_lock = Lock()
+        self._collected = False
+        self._result = None
+        self._error = None
+
+    def cancel(self) -> bool:
+        """
+        Ask the refinement to stop. The calculator is rolled back and the project dictionary is left unchanged.
+
+        :return: False if the refinement has already finished
+        """
+        if self._future.done():
+            return False
+        self._cancel_event.set()
+        return True
+
+    def cancelled(self) -> bool:
+        """
+        Has the refinement been stopped by `cancel`
+        """
+        return self._future.done() and isinstance(self._future.exception(), RefinementCancelled)
+
+    def running(self) -> bool:
+        """
+        Is the refinement in progress
+        """
+        return self._future.running()
+
+    def done(self) -> bool:
+        """
+        Has the refinement finished, been cancelled or failed
+        """
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None) -> dict:
+        """
+        Wait for the refinement to finish and collect its results. The project dictionary is updated by the first
+        call, in the calling thread.
+
+        :param timeout: Seconds to wait, None to wait for as long as it takes
+        :return: Refinement results dictionary, see `CalculatorInterface.refine`
+        :raises concurrent.futures.TimeoutError: If the refinement has not finished in time
+        """
+        self._future.exception(timeout)
+        return self._collectedResult()
+
+    def _collectedResult(self) -> Any:
+        """
+        Results of the finished worker, collected on the first call
+        """
+        with self._collect_lock:
+            if not self._collected:
+                self._collected = True
+                try:
+                    if self._collect is None:
+                        self._result = self._future.result()
+                    else:
+                        self._result = self._collect(self._future)
+                except Exception as ex:
+                    self._error = ex
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def addDoneCallback(self, fn: Callable[['RefinementTask'], Any]) -> NoReturn:
+        """
+        Call a function with the task when the refinement finishes. It is called in the worker thread, or straight
+        away if the refinement has already finished. Calling `result` from it updates the project dictionary in the
+        worker thread, so a GUI should rather schedule that call on its own thread.
+
+        :param fn: function taking the task
+        """
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def __await__(self):
+        return self._wait().__await__()
+
+    async def _wait(self) -> Any:
+        await asyncio.wait([asyncio.wrap_future(self._future)])
+        return self._collectedResult()
@@ -0,0 +1,37 @@
+"""
+Atom sites of the structure view
+================================
+
+Times `CryspyCalculator._calcAtomSites`, which expands the atoms of a phase to all their positions in the unit cell,
+for the Fe3O4 phase of the tests (Fd-3m, 192 symmetry operators) with its 3 atoms and with up to 1000 atoms in general
+positions.
+"""
+
+import os
+import time
+
+import numpy as np
+from cryspy.corecif.cl_atom_site import AtomSite, AtomSiteL
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+
+REPEATS = 5
+
+project_file = os.path.join(os.path.dirname(__file__), '..', '..', 'tests', 'Data', 'project.cif')
+calculator = CryspyCalculator(project_file)
+phase = calculator._cryspy_obj.crystals[0]
+CryspyCalculator._calcAtomSites(phase)
+
+rng = np.random.RandomState(0)
+for n_atoms in (None, 10, 100, 1000):
+    if n_atoms is not None:
+        phase.atom_site = AtomSiteL([AtomSite(label='Fe{}'.format(i), type_symbol='Fe3+', fract_x=x, fract_y=y,
+                                              fract_z=z, occupancy=1.0, adp_type='Uiso', u_iso_or_equiv=0.0)
+                                     for i, (x, y, z) in enumerate(rng.rand(n_atoms, 3))])
+    best = np.inf
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        sites = CryspyCalculator._calcAtomSites(phase)
+        best = min(best, time.perf_counter() - start)
+    print('{:5d} atoms: {:7d} positions in {:8.2f} ms'.format(len(phase.atom_site.label), len(sites['fract_x']),
+                                                              1000 * best))
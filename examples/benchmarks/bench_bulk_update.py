@@ -0,0 +1,57 @@
+"""
+Bulk updates of the project dictionary
+======================================
+
+Sets the value of every parameter of a phase of up to 1000 atoms with `UndoableDict.bulkUpdate`, as done when a
+refinement result is taken over, and undoes and redoes it. For comparison the same update is also made key by key
+with `setItemByPath` inside a bulk update.
+"""
+
+import time
+
+from easyInterface.Diffraction.DataClasses.PhaseObj.Atom import Atom
+from easyInterface.Diffraction.DataClasses.PhaseObj.Cell import Cell
+from easyInterface.Diffraction.DataClasses.PhaseObj.Phase import Phase
+from easyInterface.Diffraction.DataClasses.PhaseObj.SpaceGroup import SpaceGroup
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base
+from easyInterface.Utils.DictTools import UndoableDict
+
+
+def build_project(n_atoms):
+    atoms = [Atom.fromPars('Fe{}'.format(i), 'Fe3+', 0.945, (i % 10) / 10, (i % 7) / 7, (i % 3) / 3, 1.0, 'Uiso',
+                           0.01, ADp=[0.01, 0.0, 0.0, 0.01, 0.0, 0.01]) for i in range(n_atoms)]
+    phase = Phase.fromPars('big', SpaceGroup.default(), Cell.fromPars(8.0, 8.0, 8.0, 90, 90, 90))
+    phase['atoms'] = {atom['atom_site_label']: atom for atom in atoms}
+    return UndoableDict(phases={'big': phase})
+
+
+def parameter_paths(item, path):
+    if isinstance(item, Base):
+        if isinstance(item.value, float):
+            yield [*path, 'store', 'value']
+    elif hasattr(item, 'keys'):
+        for key in item.keys():
+            yield from parameter_paths(item[key], [*path, key])
+
+
+def key_by_key(d, keys, values):
+    d.startBulkUpdate('Key by key')
+    for key, value in zip(keys, values):
+        d.setItemByPath(key, value)
+    d.endBulkUpdate()
+
+
+for n_atoms in (100, 1000):
+    project = build_project(n_atoms)
+    keys = list(parameter_paths(project, []))
+    for name, update in (('key by key', key_by_key), ('bulkUpdate', UndoableDict.bulkUpdate)):
+        values = [project.getItemByPath(key) + 0.001 for key in keys]
+        start = time.perf_counter()
+        update(project, keys, values)
+        update_time = time.perf_counter() - start
+        start = time.perf_counter()
+        project.undo()
+        project.redo()
+        undo_time = time.perf_counter() - start
+        print('{:5d} atoms, {:6d} keys, {:10s}  update {:7.1f} ms, undo + redo {:7.1f} ms'.format(
+            n_atoms, len(keys), name, 1000 * update_time, 1000 * undo_time))
@@ -0,0 +1,39 @@
+"""
+Constructing data objects
+=========================
+
+Reports the time to construct atoms with `Atom.fromPars` and experiments with `Experiment.fromPars`. The experiments
+are built with a small background, a resolution and a measured pattern of 1000 points, so the numbers cover the
+containers as well as the parameters.
+"""
+
+import timeit
+
+import numpy as np
+
+from easyInterface.Diffraction.DataClasses.DataObj.Experiment import Background, Backgrounds, Experiment, \
+    MeasuredPattern, Resolution
+from easyInterface.Diffraction.DataClasses.PhaseObj.Atom import Atom
+
+REPEATS = 5
+NUMBER = 200
+
+x = np.linspace(10, 150, 1000)
+y = np.ones_like(x)
+
+
+def make_atom():
+    return Atom.fromPars('Fe1', 'Fe3+', 0.945, 0.125, 0.125, 0.125, 1.0, 'Uiso', 0.01,
+                         ADp=[0.01, 0.0, 0.0, 0.01, 0.0, 0.01])
+
+
+def make_experiment():
+    background = Backgrounds([Background.fromPars(ttheta, 100.0) for ttheta in (10.0, 80.0, 150.0)])
+    resolution = Resolution.fromPars(0.1, -0.1, 0.1, 0.0, 0.0)
+    pattern = MeasuredPattern(x, y, y)
+    return Experiment.fromPars('pd', 0.84, 0.0, 1.0, background, resolution, pattern)
+
+
+for name, function in (('Atom.fromPars', make_atom), ('Experiment.fromPars', make_experiment)):
+    best = min(timeit.repeat(function, number=NUMBER, repeat=REPEATS)) / NUMBER
+    print('{:20s} {:8.1f} us'.format(name, 1e6 * best))
@@ -0,0 +1,105 @@
+"""
+Loading measured powder data
+============================
+
+Reports load time and peak (python heap) memory for reading experiment cif files
+
+* `cryspy`: the whole file read into a string and parsed by `Pd.from_cif`
+* `calculator`: `CryspyCalculator.setExpsDefinition`, which memory-maps the file and parses the `_pd_meas_` loop
+  straight into numpy columns before building the cryspy measurement points
+* `columns`: only the memory-mapped loop parsing, i.e. what a consumer of the numpy columns pays
+
+for the bundled `examples/*/experiments.cif` files and for synthetic polarised datasets with millions of points. The
+cryspy measurement points are python objects, so the two full loads are skipped for the largest synthetic files.
+"""
+
+import glob
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from cryspy.cif_like.cl_pd import Pd
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Utils.CifTools import readLoop
+from easyInterface.Utils.Helpers import getExamplesDir
+
+SYNTHETIC_POINTS = [10 ** 5, 10 ** 6, 2 * 10 ** 6, 5 * 10 ** 6]
+# Largest datasets which are read in full by each method
+MAX_POINTS = {'cryspy': 10 ** 5, 'calculator': 10 ** 6, 'columns': None}
+
+data_dir = getExamplesDir()
+template_file = os.path.join(data_dir, 'Fe3O4_powder-1d_neutrons-pol_5C1(LLB)', 'experiments.cif')
+
+
+def cryspy_load(path):
+    with open(path, 'r') as f:
+        return Pd.from_cif(f.read())
+
+
+def calculator_load(path):
+    calculator = CryspyCalculator(None)
+    calculator.setExpsDefinition(path)
+    return calculator
+
+
+def columns_load(path):
+    return readLoop(path, '_pd_meas_')
+
+
+METHODS = {'cryspy': cryspy_load, 'calculator': calculator_load, 'columns': columns_load}
+
+
+def measure(method, path):
+    start = time.perf_counter()
+    result = method(path)
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = method(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def write_synthetic(path, points):
+    """
+    Fe3O4 parameter blocks with `points` polarised measurement points
+    """
+    with open(template_file, 'r') as f:
+        header = f.read().split('loop_\n_pd_meas_2theta')[0]
+    ttheta = np.linspace(4, 80, points)
+    intensity = 200 + 100 * np.sin(ttheta) ** 2
+    data = np.column_stack((ttheta, intensity, np.sqrt(intensity), intensity, np.sqrt(intensity)))
+    with open(path, 'w') as f:
+        f.write(header)
+        f.write('loop_\n_pd_meas_2theta\n_pd_meas_intensity_up\n_pd_meas_intensity_up_sigma\n'
+                '_pd_meas_intensity_down\n_pd_meas_intensity_down_sigma\n')
+        np.savetxt(f, data, fmt='%.4f')
+
+
+def report(name, path, points):
+    size = os.path.getsize(path) / 2 ** 20
+    for method_name, method in METHODS.items():
+        limit = MAX_POINTS[method_name]
+        if limit is not None and points > limit:
+            print('{:>28} {:>10} {:8.1f} MB {:>11} {:>14}'.format(name, method_name, size, 'skipped', ''))
+            continue
+        elapsed, peak = measure(method, path)
+        print('{:>28} {:>10} {:8.1f} MB {:8.0f} ms {:10.1f} MB'.format(name, method_name, size, 1000 * elapsed,
+                                                                     peak / 2 ** 20))
+
+
+print('{:>28} {:>10} {:>11} {:>11} {:>14}'.format('file', 'method', 'size', 'time', 'peak memory'))
+for experiment_file in sorted(glob.glob(os.path.join(data_dir, '*', 'experiments.cif'))):
+    points = len(readLoop(experiment_file, '_pd_meas_'))
+    report(os.path.basename(os.path.dirname(experiment_file))[:28], experiment_file, points)
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    for points in SYNTHETIC_POINTS:
+        synthetic_file = os.path.join(temp_dir, 'experiments.cif')
+        write_synthetic(synthetic_file, points)
+        report('synthetic {:,} points'.format(points), synthetic_file, points)
@@ -0,0 +1,35 @@
+"""
+Calculating many experiments
+============================
+
+Times `CryspyCalculator.getCalculations` for a project with several copies of the Fe3O4 experiment, serially and with
+thread and process pools. With enough cores the pooled wall time should approach the serial time divided by
+min(experiments, cores).
+"""
+
+import os
+import timeit
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Utils.Helpers import getExamplesDir
+
+REPEATS = 3
+EXPERIMENTS = 8
+EXAMPLE = 'Fe3O4_powder-1d_neutrons-pol_5C1(LLB)'
+
+data_dir = getExamplesDir()
+calculator = CryspyCalculator(None)
+calculator.setPhaseDefinition(os.path.join(data_dir, EXAMPLE, 'phases.cif'))
+calculator.setExpsDefinition(os.path.join(data_dir, EXAMPLE, 'experiments.cif'))
+for _ in range(EXPERIMENTS - 1):
+    calculator.addExpsDefinition(os.path.join(data_dir, EXAMPLE, 'experiments.cif'))
+
+print('{} experiments on {} cores'.format(EXPERIMENTS, os.cpu_count()))
+serial = None
+for executor in [None, 'thread', 'process']:
+    calculator.setCalculationExecutor(executor)
+    calculator.getCalculations()
+    elapsed = min(timeit.repeat(calculator.getCalculations, number=1, repeat=REPEATS))
+    serial = serial or elapsed
+    print('{:>8}: {:.0f} ms ({:.1f}x)'.format(str(executor), 1000 * elapsed, serial / elapsed))
+calculator.setCalculationExecutor(None)
@@ -0,0 +1,68 @@
+"""
+Memory of the parameters of a large phase
+=========================================
+
+Builds a phase of 500 atoms and reports the memory (python heap) it takes, per atom and per parameter (`Base`), along
+with the time to build, deep copy and compare it.
+"""
+
+import time
+import tracemalloc
+from copy import deepcopy
+
+from easyInterface.Diffraction.DataClasses.PhaseObj.Atom import Atom
+from easyInterface.Diffraction.DataClasses.PhaseObj.Cell import Cell
+from easyInterface.Diffraction.DataClasses.PhaseObj.Phase import Phase
+from easyInterface.Diffraction.DataClasses.PhaseObj.SpaceGroup import SpaceGroup
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base
+
+ATOMS = 500
+
+
+def build_phase(n_atoms):
+    atoms = [Atom.fromPars('Fe{}'.format(i), 'Fe3+', 0.945, (i % 10) / 10, (i % 7) / 7, (i % 3) / 3, 1.0, 'Uiso',
+                           0.01, ADp=[0.01, 0.0, 0.0, 0.01, 0.0, 0.01]) for i in range(n_atoms)]
+    phase = Phase.fromPars('big', SpaceGroup.default(), Cell.fromPars(8.0, 8.0, 8.0, 90, 90, 90))
+    phase['atoms'] = {atom['atom_site_label']: atom for atom in atoms}
+    return phase
+
+
+def count_parameters(item):
+    if isinstance(item, Base):
+        return 1
+    if hasattr(item, 'keys'):
+        return sum(count_parameters(item[key]) for key in item.keys())
+    return 0
+
+
+# Warm up caches (units, loggers)
+build_phase(1)
+
+tracemalloc.start()
+start = time.perf_counter()
+phase = build_phase(ATOMS)
+build_time = time.perf_counter() - start
+size, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+n_parameters = count_parameters(phase)
+print('{} atoms, {} parameters'.format(ATOMS, n_parameters))
+print('memory:    {:8.2f} MB, {:6.0f} B per atom, {:5.0f} B per parameter'.format(size / 2 ** 20, size / ATOMS,
+                                                                                  size / n_parameters))
+
+tracemalloc.start()
+parameters = [Base(float(i), 'ang') for i in range(n_parameters)]
+size, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print('parameter: {:5.0f} B per Base'.format(size / n_parameters))
+del parameters
+
+start = time.perf_counter()
+copy = deepcopy(phase)
+copy_time = time.perf_counter() - start
+start = time.perf_counter()
+keys, _, _ = phase.dictComparison(copy)
+compare_time = time.perf_counter() - start
+print('build:     {:8.1f} ms'.format(1000 * build_time))
+print('deepcopy:  {:8.1f} ms'.format(1000 * copy_time))
+print('compare:   {:8.1f} ms ({} differences)'.format(1000 * compare_time, len(keys)))
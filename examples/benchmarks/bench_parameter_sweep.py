@@ -0,0 +1,70 @@
+"""
+Parameter sweeps
+================
+
+Compares `CalculatorInterface.calculateSweep` with setting each point through `setPhaseValue`/`setExperimentValue`
+and reading back the calculations, for a sweep of the Fe3O4 scale and resolution (reflections can be reused) and a
+sweep of the lattice constant (reflections change at every point).
+"""
+
+import os
+import time
+
+import numpy as np
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Diffraction.Interface import CalculatorInterface
+from easyInterface.Utils.Helpers import getExamplesDir
+
+POINTS = 10
+EXAMPLE = 'Fe3O4_powder-1d_neutrons-pol_5C1(LLB)'
+
+data_dir = getExamplesDir()
+calculator = CryspyCalculator(None)
+calculator.setPhaseDefinition(os.path.join(data_dir, EXAMPLE, 'phases.cif'))
+calculator.setExpsDefinition(os.path.join(data_dir, EXAMPLE, 'experiments.cif'))
+interface = CalculatorInterface(calculator)
+phase_name = interface.phasesIds()[0]
+exp_name = interface.experimentsIds()[0]
+
+
+def set_value(path, value):
+    if path[0] == 'phases':
+        interface.setPhaseValue(path[1], path[2:], value)
+    else:
+        interface.setExperimentValue(path[1], path[2:], value)
+
+
+def one_by_one(paths, values):
+    originals = [interface.project_dict.getItemByPath(path).value for path in paths]
+    patterns = []
+    for row in values:
+        for path, value in zip(paths, row):
+            set_value(path, value)
+        patterns.append(interface.getCalculation(exp_name)['calculated_pattern']['y_calc_sum'])
+    for path, value in zip(paths, originals):
+        set_value(path, value)
+    return np.array(patterns)
+
+
+length_a = interface.project_dict['phases'][phase_name]['cell']['length_a'].value
+scale = interface.project_dict['experiments'][exp_name]['phase'][phase_name]['scale'].value
+u = interface.project_dict['experiments'][exp_name]['resolution']['u'].value
+sweeps = {
+    'scale and resolution': ([['experiments', exp_name, 'phase', phase_name, 'scale'],
+                              ['experiments', exp_name, 'resolution', 'u']],
+                             np.column_stack((np.linspace(0.5, 1.5, POINTS) * scale,
+                                              np.linspace(0.5, 1.5, POINTS) * u))),
+    'lattice constant': ([['phases', phase_name, 'cell', 'length_a']],
+                         np.linspace(0.99, 1.01, POINTS).reshape(-1, 1) * length_a)
+}
+
+for name, (paths, values) in sweeps.items():
+    start = time.perf_counter()
+    reference = one_by_one(paths, values)
+    middle = time.perf_counter()
+    patterns = interface.calculateSweep(paths, values)
+    end = time.perf_counter()
+    assert np.allclose(patterns, reference)
+    print('{}: one by one {:.0f} ms/point, sweep {:.0f} ms/point ({:.1f}x)'.format(
+        name, 1000 * (middle - start) / POINTS, 1000 * (end - middle) / POINTS, (middle - start) / (end - middle)))
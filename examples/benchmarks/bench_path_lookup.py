@@ -0,0 +1,53 @@
+"""
+Parameter access by path
+========================
+
+Throughput of reading and writing a parameter value of the bundled project: directly through `Base.value`, and by path
+through the project dictionary with and without its path index (`PathDict.indexPaths`), as done by `getPhaseValue`
+and the undo stack.
+"""
+
+import os
+import timeit
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Diffraction.Interface import CalculatorInterface
+
+NUMBER = 100000
+
+project_file = os.path.join(os.path.dirname(__file__), '..', '..', 'tests', 'Data', 'project.cif')
+interface = CalculatorInterface(CryspyCalculator(project_file))
+project = interface.project_dict
+path = ['phases', 'Fe3O4', 'atoms', 'Fe3A', 'fract_x', 'store', 'value']
+parameter = project.getItemByPath(path[:-2])
+value = parameter.value
+
+
+def value_get():
+    return parameter.value
+
+
+def value_set():
+    parameter.value = value
+
+
+def path_get():
+    return project.getItemByPath(path)
+
+
+def path_set():
+    project.getItemByPath(path[:-1])[path[-1]] = value
+
+
+def report(name, function):
+    best = min(timeit.repeat(function, number=NUMBER, repeat=5)) / NUMBER
+    print('{:28s} {:6.2f} us, {:8.0f} per s'.format(name, 1e6 * best, 1 / best))
+
+
+report('Base.value get', value_get)
+report('Base.value set', value_set)
+for enable in (False, True):
+    project.indexPaths(enable)
+    label = 'indexed' if enable else 'not indexed'
+    report('path get ({})'.format(label), path_get)
+    report('path set ({})'.format(label), path_set)
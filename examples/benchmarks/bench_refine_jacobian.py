@@ -0,0 +1,49 @@
+"""
+Least squares refinement
+========================
+
+Times `CryspyCalculator.refineLeastSquares` of the Fe3O4 cell, offset and resolution, with the finite-difference
+Jacobian columns evaluated in the calculator process and in pools of worker processes, and compares it with the BFGS
+`refine`. With enough cores the time per iteration should approach the serial time divided by min(parameters, cores).
+"""
+
+import os
+import time
+
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Utils.Helpers import getExamplesDir
+
+EXAMPLE = 'Fe3O4_powder-1d_neutrons-pol_5C1(LLB)'
+MAPPINGS = ['self._cryspy_obj.crystals[0].cell.length_a',
+            'self._cryspy_obj.experiments[0].setup.offset_ttheta',
+            'self._cryspy_obj.experiments[0].resolution.u',
+            'self._cryspy_obj.experiments[0].resolution.v',
+            'self._cryspy_obj.experiments[0].resolution.w']
+
+data_dir = getExamplesDir()
+
+
+def make_calculator():
+    calculator = CryspyCalculator(None)
+    calculator.setPhaseDefinition(os.path.join(data_dir, EXAMPLE, 'phases.cif'))
+    calculator.setExpsDefinition(os.path.join(data_dir, EXAMPLE, 'experiments.cif'))
+    return calculator
+
+
+print('{} parameters on {} cores'.format(len(MAPPINGS), os.cpu_count()))
+for processes in [None, 2, 4]:
+    calculator = make_calculator()
+    start = time.perf_counter()
+    _, res = calculator.refineLeastSquares(MAPPINGS, processes=processes)
+    elapsed = time.perf_counter() - start
+    print('{:>8}: {:.1f} s, {} iterations ({:.0f} ms each), {} evaluations, chi2 {:.3f}'.format(
+        str(processes), elapsed, res.nit, 1000 * elapsed / res.nit, res.nfev, calculator.getChiSq()[0]))
+
+calculator = make_calculator()
+for mapping in MAPPINGS:
+    calculator._mapping_cache.getItem(mapping).refinement = True
+start = time.perf_counter()
+_, res = calculator.refine()
+elapsed = time.perf_counter() - start
+print('{:>8}: {:.1f} s, {} iterations ({:.0f} ms each), {} evaluations, chi2 {:.3f}'.format(
+    'bfgs', elapsed, res.nit, 1000 * elapsed / res.nit, res.nfev, calculator.getChiSq()[0]))
@@ -0,0 +1,36 @@
+"""
+Setting the calculator from the project
+=======================================
+
+Times `CalculatorInterface.setCalculatorFromProject` on the bundled PbSO4 and Fe3O4 examples and compares it with the
+old behaviour of serialising the cryspy object to cif and parsing it back.
+"""
+
+import os
+import timeit
+
+from cryspy.scripts.cl_rhochi import RhoChi
+
+from easyInterface.Utils.Helpers import getExamplesDir
+from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Diffraction.Interface import CalculatorInterface
+
+REPEATS = 5
+EXAMPLES = ['PbSO4_powder-1d_neutrons-unpol_D1A(ILL)', 'Fe3O4_powder-1d_neutrons-pol_5C1(LLB)']
+
+data_dir = getExamplesDir()
+
+for example in EXAMPLES:
+    calculator = CryspyCalculator(None)
+    calculator.setPhaseDefinition(os.path.join(data_dir, example, 'phases.cif'))
+    calculator.setExpsDefinition(os.path.join(data_dir, example, 'experiments.cif'))
+    interface = CalculatorInterface(calculator)
+
+    def cif_round_trip():
+        interface.setCalculatorFromProject()
+        calculator._cryspy_obj = RhoChi().from_cif(calculator._cryspy_obj.to_cif())
+
+    direct = min(timeit.repeat(interface.setCalculatorFromProject, number=1, repeat=REPEATS))
+    round_trip = min(timeit.repeat(cif_round_trip, number=1, repeat=REPEATS))
+    print('{}: direct {:.1f} ms, with cif round trip {:.1f} ms ({:.1f}x)'.format(
+        example, 1000 * direct, 1000 * round_trip, round_trip / direct))
@@ -0,0 +1,44 @@
+"""
+Memory of the undo stack
+========================
+
+Replaces the atom sites (lists of 2000 coordinates) and a pattern of 100000 points a hundred times, changing a few
+items each time as a refinement of atom positions would, and reports the memory held by the undo stack. The delta
+encoding of arrays and lists is switched off for comparison by lowering `ARRAY_DELTA_FRACTION`.
+"""
+
+import time
+
+import numpy as np
+
+import easyInterface.Utils.DictTools as DictTools
+from easyInterface.Utils.DictTools import UndoableDict
+
+STEPS = 100
+SITES = 2000
+POINTS = 100000
+
+
+def session():
+    d = UndoableDict(dict(sites=dict(fract_x=[0.0] * SITES), pattern=dict(y=np.zeros(POINTS))))
+    d.clearUndoStack()
+    start = time.perf_counter()
+    for step in range(STEPS):
+        fract_x = list(d['sites']['fract_x'])
+        fract_x[step:SITES:STEPS] = [0.001 * step] * len(fract_x[step:SITES:STEPS])
+        y = d['pattern']['y'].copy()
+        y[step * 100:(step + 1) * 100] += 1.0
+        d.bulkUpdate([['sites', 'fract_x'], ['pattern', 'y']], [fract_x, y], 'Step {}'.format(step))
+    push_time = time.perf_counter() - start
+    start = time.perf_counter()
+    while d.canUndo():
+        d.undo()
+    undo_time = time.perf_counter() - start
+    return d.undoStackInfo()['bytes'], push_time, undo_time
+
+
+for name, fraction in (('whole values', 0.0), ('delta', DictTools.ARRAY_DELTA_FRACTION)):
+    DictTools.ARRAY_DELTA_FRACTION = fraction
+    size, push_time, undo_time = session()
+    print('{:13s} {:8.2f} MB, push {:6.1f} ms, undo {:6.1f} ms'.format(name, size / 2 ** 20, 1000 * push_time,
+                                                                       1000 * undo_time))
@@ -32,7 +32,6 @@ setup(
     long_description_content_type='text/markdown',
     install_requires=[
         'cryspy>=0.2.0',
-        'dictdiffer',
         'asteval'
     ],
     platforms=['any'],
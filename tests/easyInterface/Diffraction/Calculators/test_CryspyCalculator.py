@@ -1,7 +1,12 @@
+import copyreg
 import os
 import tempfile
+from threading import Event
 
+import numpy as np
 import pytest
+from cryspy.common.cl_data_constr import DataConstr
+from cryspy.common.cl_loop_constr import LoopConstr
 
 from easyInterface import logger, logging
 
@@ -10,6 +15,7 @@ logger.setLevel(logging.DEBUG)
 
 from easyInterface.Diffraction import DEFAULT_FILENAMES
 from easyInterface.Diffraction.Calculators import CryspyCalculator
+from easyInterface.Utils.RefineTools import RefinementCancelled
 
 test_data = os.path.join("tests", "Data")
 file_path = os.path.join(test_data, DEFAULT_FILENAMES['project'])
@@ -87,6 +93,30 @@ def test_add_exps_definition(cal):
     assert cal._experiment_names == ['pd', 'pd2']
 
 
+def test_read_experiment_cif(cal, file_io_fixture):
+    from cryspy.cif_like.cl_pd import Pd
+    file = os.path.join(test_data, 'experiments2.cif')
+    with open(file, 'r') as f:
+        content = f.read()
+    reference = Pd.from_cif(content)
+    experiment = cal._readExperimentCif(file)
+    assert experiment.to_cif() == reference.to_cif()
+    assert len(experiment.meas.item) == len(reference.meas.item)
+
+    # Missing values are left to cryspy
+    save_to = file_io_fixture(tempfile.gettempdir(), 'experiments_missing.cif')
+    lines = content.split('\n')
+    index = [i for i, line in enumerate(lines) if line.strip().startswith('_pd_meas_')][-1] + 1
+    values = lines[index].split()
+    values[-1] = '.'
+    lines[index] = ' '.join(values)
+    with open(save_to, 'w') as f:
+        f.write('\n'.join(lines))
+    experiment = cal._readExperimentCif(save_to)
+    assert experiment.meas.item[0].intensity_down_sigma is None
+    assert len(experiment.meas.item) == len(reference.meas.item)
+
+
 def test_remove_exps_definition(cal):
     cal.removeExpsDefinition('pd')
     assert cal._cryspy_obj.experiments is None
@@ -157,6 +187,43 @@ def test_save_cifs(cal, file_io_fixture):
     assert os.path.exists(exps_save_to)
 
 
+def test_set_calculation_executor(cal):
+    cal.addExpsDefinition(os.path.join(test_data, 'experiments2.cif'))
+    cal.addExpsDefinition(os.path.join(test_data, 'experiments2.cif'))
+    serial = cal.getCalculations()
+    for executor in ['thread', 'process']:
+        cal.setCalculationExecutor(executor, 2)
+        calculations = cal.getCalculations()
+        assert list(calculations.keys()) == ['pd', 'pd2', 'pd20']
+        assert calculations == serial
+    # cryspy objects are sent to the processes without changing how they are pickled elsewhere
+    assert not any(issubclass(cls, (LoopConstr, DataConstr)) for cls in copyreg.dispatch_table if isinstance(cls, type))
+    cal.setCalculationExecutor(None)
+    assert cal._executor is None
+    assert cal.getCalculations() == serial
+    with pytest.raises(KeyError):
+        cal.setCalculationExecutor('gpu')
+
+
+def test_calculate_sweep(cal):
+    mappings = ['self._cryspy_obj.experiments[0].phase.scale[0]', 'self._cryspy_obj.experiments[0].resolution.u']
+    scale = cal._cryspy_obj.experiments[0].phase.scale[0].value
+    u = cal._cryspy_obj.experiments[0].resolution.u.value
+    values = np.array([[scale, u], [scale / 2, u], [scale / 2, 2 * u]])
+    patterns = cal.calculateSweep(mappings, values)
+    assert patterns.shape == (3, len(cal._cryspy_obj.experiments[0].meas.ttheta))
+    assert np.array_equal(patterns[0], cal.getCalculations()['pd']['calculated_pattern']['y_calc_sum'])
+    assert cal._cryspy_obj.experiments[0].phase.scale[0].value == scale
+    assert cal._cryspy_obj.experiments[0].resolution.u.value == u
+    # The background is not scaled
+    assert np.all(patterns[1] <= patterns[0])
+    assert np.any(patterns[1] < patterns[0])
+    assert np.array_equal(cal.calculateSweep(mappings, values, processes=2), patterns)
+    assert np.array_equal(cal.calculateSweep(mappings[:1], values[:, 0]), patterns[:2, :].repeat([1, 2], axis=0))
+    with pytest.raises(ValueError):
+        cal.calculateSweep(mappings, values[:, 0])
+
+
 def test__create_proj_item_from_obj(cal):
     assert True
 
@@ -183,6 +250,27 @@ def test_get_phases(cal):
     assert not phases.getItemByPath(['Fe3O4', 'cell', 'length_c']).refine
 
 
+def test_get_phase_sites(cal):
+    sites = cal.getPhases()['Fe3O4']['sites']
+    fract_x, fract_y, fract_z = sites['fract_x'], sites['fract_y'], sites['fract_z']
+    assert isinstance(fract_x, np.ndarray)
+    assert sites['scat_length_neutron'].dtype == complex
+    # 8 Fe3A, 16 Fe3B and 32 O in the unit cell, plus 15 images of the Fe3B positions on x, y or z = 0
+    assert len(fract_x) == 71
+    assert np.sum(sites['scat_length_neutron'] == 0.5803) == 32
+    assert np.sum(sites['scat_length_neutron'] == 0.945) == 39
+    positions = set(zip(fract_x, fract_y, fract_z))
+    assert len(positions) == 71
+    assert (0.125, 0.125, 0.125) in positions
+    assert (0.0, 0.0, 0.0) not in positions
+    assert (0.5, 0.5, 0.5) in positions
+    # Far side images of a position on x = 0 and z = 0
+    assert (0.0, 0.5, 0.0) in positions
+    assert (1.0, 0.5, 0.0) in positions
+    assert (0.0, 0.5, 1.0) in positions
+    assert (1.0, 0.5, 1.0) in positions
+
+
 def test_get_experiments(cal):
     experiments = cal.getExperiments()
     assert len(experiments) == len(cal._cryspy_obj.experiments)
@@ -256,7 +344,14 @@ def test_set_experiments(cal):
 
 
 def test_set_obj_from_project_dicts(cal):
-    assert True
+    phases = cal.getPhases()
+    experiments = cal.getExperiments()
+    chi_sq, n_res = cal.getChiSq()
+    cal.setObjFromProjectDicts(phases, experiments)
+    assert cal._cryspy_obj.crystals[0].atom_site.type_symbol == ['Fe3+', 'Fe3+', 'O2-']
+    new_chi_sq, new_n_res = cal.getChiSq()
+    assert new_n_res == n_res
+    assert new_chi_sq == pytest.approx(chi_sq)
 
 
 def test_as_cif_dict(cal):
@@ -267,20 +362,138 @@ def test_refine(cal):
     assert True
 
 
-def test_get_chi_sq(cal):
-    assert True
+def test_refine_least_squares(cal):
+    mappings = ['self._cryspy_obj.crystals[0].cell.length_a', 'self._cryspy_obj.experiments[0].resolution.u']
+    chi_sq, n_res = cal.getChiSq()
+    steps = []
+    _, res = cal.refineLeastSquares(mappings, progress=steps.append)
+    assert cal.getChiSq()[0] < chi_sq
+    assert len(steps) == res.nit
+    assert np.allclose([cal._mapping_cache.getItem(mapping).value for mapping in mappings], res.x)
+    assert all(cal._mapping_cache.getItem(mapping).sigma > 0 for mapping in mappings)
+    # The Jacobian does not depend on the workers
+    parallel = CryspyCalculator(file_path)
+    _, parallel_res = parallel.refineLeastSquares(mappings, processes=2)
+    assert np.allclose(parallel_res.x, res.x)
+    assert parallel_res.nfev == res.nfev
+
+
+def test_refine_least_squares_constraints(cal):
+    cell = cal._cryspy_obj.crystals[0].cell
+    cal.refineLeastSquares(['self._cryspy_obj.crystals[0].cell.length_a'])
+    cal.getCalculations()
+    # The cubic cell keeps its tied lengths after the last step
+    assert cell.length_a.value != 8.36212
+    assert cell.length_b.value == cell.length_a.value
+    assert cell.length_c.value == cell.length_a.value
+
+
+def test_refine_least_squares_cancel(cal):
+    mapping = 'self._cryspy_obj.crystals[0].cell.length_a'
+    cancel = Event()
+    cancel.set()
+    with pytest.raises(RefinementCancelled):
+        cal.refineLeastSquares([mapping], cancel=cancel)
+    assert cal._mapping_cache.getItem(mapping).value == 8.36212
+    assert cal.refineLeastSquares([]) == ({'flag': True, 'res': None}, None)
+
+
+def test_get_chi_sq(cal, monkeypatch):
+    cal._applyConstraints()
+    experiment = cal._cryspy_obj.experiments[0]
+    chi_sq, n_res = experiment.calc_chi_sq(cal._cryspy_obj.crystals)
+    assert cal.getChiSqPerExperiment() == {experiment.data_name: (pytest.approx(chi_sq), n_res)}
+    assert cal.getChiSq() == (pytest.approx(chi_sq), n_res)
+    # The calculations are reused as long as nothing changes
+    cal.getCalculations()
+    def _calcProfiles(*args, **kwargs):
+        pytest.fail('profiles were recalculated although nothing changed')
+
+    with monkeypatch.context() as m:
+        m.setattr(cal, '_calcProfiles', _calcProfiles)
+        assert cal.getChiSq() == (pytest.approx(chi_sq), n_res)
+    cal._mappedValueUpdater('self._cryspy_obj.crystals[0].cell.length_a', 8.5)
+    assert cal.getChiSq()[0] != pytest.approx(chi_sq)
+
+
+def test_get_chi_sq_empty():
+    cal = CryspyCalculator(None)
+    assert cal.getChiSqPerExperiment() == {}
+    assert cal.getChiSq() == (0.0, 1)
 
 
 def test_final_chi_square(cal):
-    assert True
+    chi_sq, n_res = cal.getChiSq()
+    assert cal.final_chi_square == pytest.approx(chi_sq / n_res)
 
 
 def test__mapped_value_updater(cal):
-    assert True
+    mapping = 'self._cryspy_obj.crystals[0].cell.length_a'
+    cal._mappedValueUpdater(mapping, 9.0)
+    assert cal._cryspy_obj.crystals[0].cell.length_a.value == 9.0
+    mapping = 'self._cryspy_obj.crystals[0].atom_site.fract_x[1]'
+    cal._mappedValueUpdater(mapping, 0.25)
+    assert cal._cryspy_obj.crystals[0].atom_site.fract_x[1].value == 0.25
+    cal._mappedBulkValueUpdater([mapping, 'self._cryspy_obj.experiments[0].resolution.u'], [0.5, 0.1])
+    assert cal._cryspy_obj.crystals[0].atom_site.fract_x[1].value == 0.5
+    assert cal._cryspy_obj.experiments[0].resolution.u.value == 0.1
+    with pytest.raises(TypeError):
+        cal._mappedValueUpdater('self._cryspy_obj.crystals[10].cell.length_a', 1.0)
+    with pytest.raises(TypeError):
+        cal._mappedValueUpdater(None, 1.0)
+    # Handles are dropped when the structure changes
+    phase_name = cal.getPhaseNames()[0]
+    cal.removePhaseDefinition(phase_name)
+    with pytest.raises(TypeError):
+        cal._mappedValueUpdater('self._cryspy_obj.crystals[0].cell.length_a', 9.0)
+
+
+def test_get_changed_parameters(cal):
+    assert cal.getChangedParameters('phases') is None
+    mappings = ['self._cryspy_obj.crystals[0].cell.length_a', 'self._cryspy_obj.crystals[0].atom_site.fract_x[2]']
+    cal.trackParameters('phases', mappings)
+    assert cal.getChangedParameters('phases') == {}
+    cal._mappedValueUpdater(mappings[0], 8.5)
+    changed = cal.getChangedParameters('phases')
+    assert list(changed.keys()) == [mappings[0]]
+    assert changed[mappings[0]]['value'] == 8.5
+    assert cal.getChangedParameters('phases') == {}
+    # Setting the same value is not a change
+    cal._mappedValueUpdater(mappings[0], 8.5)
+    assert cal.getChangedParameters('phases') == {}
+    # Structural changes need a full rebuild
+    cal.removePhaseDefinition(cal.getPhaseNames()[0])
+    assert cal.getChangedParameters('phases') is None
+
+
+def test_apply_constraints(cal):
+    cal.getPhases()
+    info = cal.constraintInfo()
+    cal.getCalculations()
+    cal.getPhases()
+    assert cal.constraintInfo() == {'applied': info['applied'], 'skipped': info['skipped'] + 2}
+    # Experiment parameters are not constrained
+    cal._mappedValueUpdater('self._cryspy_obj.experiments[0].resolution.u', 0.1)
+    cal.getPhases()
+    assert cal.constraintInfo()['applied'] == info['applied']
+    # The cell is cubic, so the constraints set b from a
+    cal._mappedValueUpdater('self._cryspy_obj.crystals[0].cell.length_a', 8.5)
+    phases = cal.getPhases()
+    assert cal.constraintInfo()['applied'] == info['applied'] + 1
+    assert phases[cal.getPhaseNames()[0]]['cell']['length_b'].value == 8.5
+    # Structural changes
+    cal.setPhases(phases)
+    applied = cal.constraintInfo()['applied']
+    cal.getPhases()
+    assert cal.constraintInfo()['applied'] == applied
 
 
 def test__mapped_refine_updater(cal):
-    assert True
+    mapping = 'self._cryspy_obj.crystals[0].cell.length_a'
+    cal._mappedRefineUpdater(mapping, True)
+    assert cal._cryspy_obj.crystals[0].cell.length_a.refinement
+    cal._mappedRefineUpdater(mapping, False)
+    assert not cal._cryspy_obj.crystals[0].cell.length_a.refinement
 
 
 def test_get_project_name(cal):
@@ -116,6 +116,13 @@ def test_calculated_pattern():
     assert cp['y_calc_up'] == y_calc
     assert cp['y_diff_lower'] == y_diff_lower
     assert cp['y_diff_upper'] == y_diff_upper
+    assert isinstance(cp['y_calc_sum'], np.ndarray)
+    assert np.array_equal(cp['y_calc_sum'], y_calc)
+    assert len(cp['y_calc_down']) == 0
+    block, names = cp.asBlock()
+    assert block.shape == (6, len(x))
+    assert 'y_calc_down' not in names
+    assert np.shares_memory(block, cp.getArray('y_calc_sum'))
 
 
 def genericTestCalculation(cp_constructor, *args):
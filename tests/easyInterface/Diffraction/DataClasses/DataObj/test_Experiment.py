@@ -1,4 +1,10 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
 from easyInterface.Diffraction.DataClasses.DataObj.Experiment import *
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import snapshot
 from tests.easyInterface.Diffraction.DataClasses.Utils.Helpers import PathDictDerived
 
 
@@ -181,6 +187,59 @@ def test_measured_pattern_y_obs_lower():
     assert mp.y_obs_lower == [yy - ee for yy, ee in zip(y, err)]
 
 
+def test_measured_pattern_arrays():
+    x = list(range(0, 5))
+    y = list(range(1, 6))
+    err = [0.2] * len(x)
+    mp = MeasuredPattern(x, y, err)
+
+    assert mp.getArray('x').dtype == np.float64
+    assert mp.getArray('y_obs') is mp.getArray('y_obs')
+    # Item access stays list-like
+    assert mp['y_obs'] == y
+    assert mp['x'] + [5] == [*x, 5]
+    block, names = mp.asBlock()
+    assert block.shape == (3, 5)
+    assert names == ['x', 'y_obs', 'sy_obs']
+    for name in names:
+        assert np.shares_memory(block, mp.getArray(name))
+    assert mp.asBlock()[0] is block
+
+    # Replacing a column is picked up by the next block request
+    mp['y_obs'] = [2.0] * len(x)
+    assert not np.shares_memory(block, mp.getArray('y_obs'))
+    new_block, _ = mp.asBlock()
+    assert new_block is not block
+    assert np.shares_memory(new_block, mp.getArray('y_obs'))
+    assert np.array_equal(new_block[1], [2.0] * len(x))
+
+    as_dict = mp.asDict()
+    assert as_dict['x'] == [float(x_) for x_ in x]
+    assert as_dict['y_obs_up'] is None
+
+
+def test_measured_pattern_snapshot():
+    x = list(range(0, 5))
+    mp = MeasuredPattern(x, x, x)
+    block, _ = mp.asBlock()
+    mp2 = snapshot(mp)
+
+    # Columns are shared as read-only views
+    assert mp2.getArray('x') is not mp.getArray('x')
+    assert np.shares_memory(mp2.getArray('x'), mp.getArray('x'))
+    with pytest.raises(ValueError):
+        mp2.getArray('x')[0] = 10
+    assert mp2.asBlock()[0].base is block
+    # Replacing a column does not touch the original
+    mp2['y_obs'] = [2.0] * len(x)
+    assert mp2.getArray('y_obs').flags.writeable
+    assert mp['y_obs'] == x
+    assert mp.asBlock()[0] is block
+    # A deepcopy still owns its data
+    mp3 = deepcopy(mp)
+    assert not np.shares_memory(mp3['x'], mp['x'])
+
+
 def test_exp_phase_default():
     expected = ['name', 'scale']
     expected_type = [str, Base]
@@ -1,7 +1,13 @@
+import tracemalloc
+
 import numpy as np
 import pytest
 
-from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base, Data, Unit
+from easyInterface import logger
+from copy import deepcopy
+
+from easyInterface.Diffraction.DataClasses.Utils.BaseClasses import Base, Data, Details, LoggedPathDict, Unit, \
+    setDetails
 
 
 def data_checker(data):
@@ -71,6 +77,71 @@ def test_BaseClass():
     assert b['mapping'] is None
 
 
+def test_Base_logger_registry():
+    d = LoggedPathDict()
+    assert d._log is logger.getLogger(LoggedPathDict.__module__)
+    assert '_log' not in vars(d)
+    n_loggers = len(logger._loggers)
+    tracemalloc.start()
+    bases = [Base(i, 's') for i in range(10000)]
+    del bases
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(logger._loggers) == n_loggers
+    # Nothing is kept alive once the objects are gone
+    assert retained < 50000
+
+
+def test_Base_compact():
+    b = Base(2.0, 's')
+    assert not hasattr(b, '__dict__')
+    assert b.getItemByPath(['store', 'value']) == 2.0
+    # The store reads and writes the fields of the parameter
+    store = b['store']
+    store['value'] = 3.0
+    assert b.value == 3.0
+    b.setItemByPath(['store', 'refine'], True)
+    assert store['refine'] is True
+    # Limits stay those of the initial value
+    assert b.min == 1.6
+    assert b.max == 2.4
+    b.max = 5
+    assert b['store']['min'] == 1.6
+    assert b['store']['max'] == 5
+    # Parameters with the same unit share it
+    assert b['store']['unit'] is Base(1, 's')['store']['unit']
+    c = deepcopy(b)
+    assert c == b
+    c['store']['value'] = 4.0
+    assert b.value == 3.0
+    s = deepcopy(b['store'])
+    s['value'] = 5.0
+    assert b.value == 3.0
+    b['store'] = s
+    assert b.value == 5.0
+    assert b.asDict()['store']['value'] == 5.0
+    with pytest.raises(KeyError):
+        b['store']['foo'] = 1
+
+
+def test_Base_details():
+    entry = {'header': 'Lambda', 'tooltip': 'Wavelength', 'url': ''}
+    details = Details.fromTable(entry)
+    assert Details.fromTable(dict(entry)) is details
+    assert Details.fromTable(entry, header='x') == ('x', 'Wavelength', '')
+    container = LoggedPathDict(a=Base(1, 's'), b=Base(2, 's'))
+    setDetails(container, {'a': details, 'b': details})
+    assert container['a'].details is container['b'].details
+    assert container.getItemByPath(['a', 'header']) == 'Lambda'
+    assert container['b']['tooltip'] == 'Wavelength'
+    # Changing the details of one parameter leaves the shared ones alone
+    container.setItemByPath(['a', 'header'], 'Wavelength')
+    assert container['a']['header'] == 'Wavelength'
+    assert container['b']['header'] == 'Lambda'
+    assert details.header == 'Lambda'
+    assert deepcopy(container['b']).details is details
+
+
 def test_Base_get_value():
     b = Base(1, 's')
     assert b.value == 1
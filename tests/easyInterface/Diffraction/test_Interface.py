@@ -6,6 +6,7 @@ import pytest
 
 from copy import deepcopy
 from sys import platform
+from threading import Event
 
 # module for testing
 from tests.easyInterface.Diffraction.DataClasses.Utils.Helpers import PathDictDerived
@@ -16,6 +17,7 @@ from easyInterface.Diffraction.DataClasses.Utils.InfoObjs import Interface, App,
 from easyInterface.Diffraction.DataClasses.DataObj.Calculation import Calculation, Calculations
 from easyInterface.Diffraction.DataClasses.DataObj.Experiment import Experiments, Experiment
 from easyInterface.Diffraction.DataClasses.PhaseObj.Phase import Phases, Phase
+from easyInterface.Utils.DictTools import UNDO_STACK_SIZE
 
 test_data = os.path.join('tests', 'Data')
 
@@ -203,6 +205,17 @@ def test_setExperiment(cal):
     assert cal.project_dict['experiments']['pd']['wavelength'].value == 0.84
 
 
+def test_getExperiment_shared(cal):
+    experiment = cal.getExperiment('pd')
+    measured = cal.project_dict['experiments']['pd']['measured_pattern']
+    assert np.shares_memory(experiment['measured_pattern'].getArray('y_obs'), measured.getArray('y_obs'))
+    assert not experiment['measured_pattern'].getArray('y_obs').flags.writeable
+    experiment['name'] = 'Testing'
+    experiment['wavelength'].value = 2
+    assert cal.project_dict['experiments']['pd']['name'] == 'pd'
+    assert cal.project_dict['experiments']['pd']['wavelength'].value == 0.84
+
+
 def test_setExperiments(cal):
     experiment = cal.getExperiment('pd')
     experiments = Experiments(experiment)
@@ -475,12 +488,223 @@ def test_Redo(cal):
     assert pytest.approx(cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value, 8.561673117085581)
 
 
+def test_chiSquaredPerExperiment(cal):
+    chi_squared = cal.chiSquaredPerExperiment()
+    assert list(chi_squared.keys()) == cal.experimentsIds()
+    assert chi_squared[cal.experimentsIds()[0]] == pytest.approx(cal.final_chi_square)
+    assert cal.project_dict['info']['chi_squared'].value == pytest.approx(cal.final_chi_square)
+
+
+def test_setRefinementMethod(cal):
+    with pytest.raises(KeyError):
+        cal.setRefinementMethod('simplex')
+    exp_name = cal.experimentsIds()[0]
+    cal.setExperimentRefine(exp_name, ['resolution', 'u'])
+    assert cal._refinedMappings() == [cal.project_dict['phases']['Fe3O4']['cell']['length_a']['mapping'],
+                                      cal.project_dict['experiments'][exp_name]['resolution']['u']['mapping']]
+    chi_sq = cal.final_chi_square
+    cal.setRefinementMethod('least_squares', 2)
+    r = cal.refine()
+    assert r['num_refined_parameters'] == 2
+    assert r['final_chi_sq'] < chi_sq
+    assert cal.project_dict.undoText() == 'Refinement'
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a']['store']['error'] > 0
+
+
+def test_refineAsync(cal):
+    steps = []
+    started = Event()
+    proceed = Event()
+
+    def progress(step):
+        steps.append(step)
+        started.set()
+        proceed.wait()
+
+    text = cal.project_dict.undoText()
+    task = cal.refineAsync(progress)
+    started.wait()
+    # The project is locked while the refinement runs
+    with pytest.raises(RuntimeError):
+        cal.setPhaseValue('Fe3O4', ['cell', 'length_a'], 8.5)
+    with pytest.raises(RuntimeError):
+        cal.undo()
+    with pytest.raises(RuntimeError):
+        cal.refineAsync()
+    with pytest.raises(RuntimeError):
+        cal.final_chi_square
+    with pytest.raises(RuntimeError):
+        cal.chiSquaredPerExperiment()
+    finished = Event()
+    task.addDoneCallback(lambda _: finished.set())
+    proceed.set()
+    finished.wait()
+    # ... and until the results are collected, which updates the project in this thread
+    assert task.done()
+    assert cal.project_dict.undoText() == text
+    with pytest.raises(RuntimeError):
+        cal.updatePhases()
+    with pytest.raises(RuntimeError):
+        cal.final_chi_square
+    r = task.result()
+    assert task.done() and not task.cancelled()
+    assert r['num_refined_parameters'] == 1
+    assert [step['iteration'] for step in steps] == list(range(1, r['nit'] + 1))
+    assert steps[-1]['nfev'] <= r['nfev']
+    assert steps[-1]['parameters'][0] == pytest.approx(cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value)
+    assert cal.project_dict.undoText() == 'Refinement'
+    cal.undo()
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value == 8.36212
+
+
+def test_refine_progress(cal):
+    path = ['phases', 'Fe3O4', 'cell', 'length_a']
+    text = cal.project_dict.undoText()
+    steps = []
+
+    def progress(step):
+        # The project is only updated when the refinement has finished
+        assert cal.project_dict.getItemByPath(path).value == 8.36212
+        assert cal.project_dict.undoText() == text
+        steps.append(step)
+
+    r = cal.refine(progress, every=50, pattern_interval=0)
+    assert [step['nfev'] for step in steps] == list(range(50, r['nfev'] + 1, 50))
+    assert all(isinstance(step['pattern'], np.ndarray) for step in steps)
+    step = steps[-1]
+    pattern = cal.calculateSweep([path], step['parameters'][np.newaxis, :])[0]
+    assert np.allclose(step['pattern'], pattern)
+    # Patterns are throttled
+    steps.clear()
+    cal.undo()
+    cal.refine(progress, every=50, pattern_interval=3600)
+    assert steps[0]['pattern'] is not None
+    assert all(step['pattern'] is None for step in steps[1:])
+
+
+def test_refineAsync_cancel(cal):
+    text = cal.project_dict.undoText()
+    task = None
+    started = []
+    submitted = Event()
+
+    def progress(step):
+        started.append(step)
+        submitted.wait()
+        task.cancel()
+
+    task = cal.refineAsync(progress)
+    submitted.set()
+    assert task.result() == {'refinement_message': 'Refinement cancelled'}
+    assert task.cancelled()
+    assert len(started) == 1
+    assert not task.cancel()
+    assert cal.project_dict.undoText() == text
+    assert cal.calculator._cryspy_obj.crystals[0].cell.length_a.value == 8.36212
+
+
+def test_incrementalSync(cal):
+    mapping = cal.project_dict['phases']['Fe3O4']['atoms']['O']['fract_x']['mapping']
+    cal.calculator._mappedValueUpdater(mapping, 0.26)
+    exp_name = cal.experimentsIds()[0]
+    mapping = cal.project_dict['experiments'][exp_name]['resolution']['u']['mapping']
+    cal.calculator._mappedValueUpdater(mapping, 0.2)
+    cal.updatePhases()
+    cal.updateExperiments()
+    assert cal.project_dict['phases']['Fe3O4']['atoms']['O']['fract_x'].value == 0.26
+    assert cal.project_dict['experiments'][exp_name]['resolution']['u'].value == 0.2
+    # The result has to be the same as a full rebuild
+    keys, _, _ = cal.project_dict['phases'].dictComparison(cal.calculator.getPhases())
+    assert keys == []
+    keys, _, _ = cal.project_dict['experiments'].dictComparison(cal.calculator.getExperiments())
+    assert keys == []
+    assert cal.project_dict.undoText() == 'Bulk update of experiments'
+
+
+def test_calculateSweep(cal):
+    exp_name = cal.experimentsIds()[0]
+    length_a = cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value
+    scale = cal.project_dict['experiments'][exp_name]['phase']['Fe3O4']['scale'].value
+    cal.clearUndoStack()
+    paths = [['phases', 'Fe3O4', 'cell', 'length_a'], ['experiments', exp_name, 'phase', 'Fe3O4', 'scale']]
+    values = np.array([[length_a, scale], [length_a + 0.01, 2 * scale]])
+    patterns = cal.calculateSweep(paths, values)
+    # Nothing in the project has changed
+    assert not cal.canUndo()
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value == length_a
+    assert patterns.shape == (2, len(cal.getCalculation(exp_name)['calculated_pattern']['x']))
+    assert np.array_equal(patterns[0], cal.getCalculation(exp_name)['calculated_pattern']['y_calc_sum'])
+    cal.setPhaseValue('Fe3O4', ['cell', 'length_a'], length_a + 0.01)
+    cal.setExperimentValue(exp_name, ['phase', 'Fe3O4', 'scale'], 2 * scale)
+    assert np.array_equal(patterns[1], cal.getCalculation(exp_name)['calculated_pattern']['y_calc_sum'])
+    with pytest.raises(KeyError):
+        cal.calculateSweep([['phases', 'Fe3O4', 'cell']], [1])
+
+
+def test_projectState_cached(cal):
+    state = cal._groupState('phases')
+    experiments = cal._groupState('experiments')
+    measured = cal.project_dict['experiments']['pd']['measured_pattern']
+    digest = measured.digest()
+    assert measured.digest() is digest
+    # Unchanged groups are not walked again
+    assert cal._groupState('phases') is state
+    cal.setPhaseValue('Fe3O4', ['cell', 'length_a'], 8.4)
+    assert cal._groupState('phases') is not state
+    assert cal._groupState('experiments') is experiments
+    assert cal._groupState('phases')[0] == state[0]
+    assert cal._groupState('phases')[1] != state[1]
+    cal.undo()
+    assert cal._groupState('phases')[1] == state[1]
+    assert measured.digest() is digest
+
+
+def test_calculationCache(cal):
+    length_a = cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value
+    y_calc = cal.getCalculation('pd')['calculated_pattern']['y_calc_sum'].copy()
+    cal.setPhaseValue('Fe3O4', ['cell', 'length_a'], length_a + 0.01)
+    y_calc_new = cal.getCalculation('pd')['calculated_pattern']['y_calc_sum'].copy()
+    assert not np.array_equal(y_calc, y_calc_new)
+    info = cal.calculationCacheInfo()
+    assert info['entries'] == 2
+    # Undo/redo return to calculated states
+    cal.undo()
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value == length_a
+    assert np.array_equal(cal.getCalculation('pd')['calculated_pattern']['y_calc_sum'], y_calc)
+    cal.redo()
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value == length_a + 0.01
+    assert np.array_equal(cal.getCalculation('pd')['calculated_pattern']['y_calc_sum'], y_calc_new)
+    assert cal.calculationCacheInfo()['hits'] == info['hits'] + 2
+    assert cal.calculationCacheInfo()['misses'] == info['misses']
+    # The calculator follows the undo
+    cal.undo()
+    cal.clearCalculationCache()
+    cal.setCalculationCacheSize(0)
+    assert cal.calculationCacheInfo()['max_bytes'] == 0
+    assert np.array_equal(cal.calculator.getCalculations()['pd']['calculated_pattern']['y_calc_sum'], y_calc)
+
+
 def test_clearUndoStack(cal):
     assert cal.canUndo()
     cal.clearUndoStack()
     assert not cal.canUndo()
 
 
+def test_undoStackSize(cal):
+    info = cal.undoStackInfo()
+    assert info['max_bytes'] == UNDO_STACK_SIZE
+    assert info['redo'] == 0
+    for value in (8.3, 8.31, 8.32):
+        cal.setPhaseValue('Fe3O4', ['cell', 'length_a'], value)
+    assert cal.undoStackInfo()['undo'] == info['undo'] + 3
+    cal.compactUndoStack()
+    assert cal.undoStackInfo()['undo'] == info['undo'] + 1
+    cal.undo()
+    assert cal.project_dict['phases']['Fe3O4']['cell']['length_a'].value == pytest.approx(8.36212)
+    cal.setUndoStackSize(0)
+    assert cal.undoStackInfo()['undo'] == 1
+
+
 def test_setPhaseDefinition(cal):
     calc = CryspyCalculator('')
     interface = CalculatorInterface(calc)
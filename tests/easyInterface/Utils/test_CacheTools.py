@@ -0,0 +1,40 @@
+import numpy as np
+
+from easyInterface.Utils.CacheTools import LRUCache, sizeOf
+
+
+def test_sizeOf():
+    array = np.zeros(1000)
+    assert sizeOf(array) >= array.nbytes
+    block = np.zeros((2, 1000))
+    assert sizeOf(block[0]) >= block[0].nbytes
+    assert sizeOf({'a': array, 'b': [array, array]}) >= 3 * array.nbytes
+
+
+def test_LRUCache():
+    array = np.zeros(1000)
+    size = sizeOf(array)
+    cache = LRUCache(2 * size)
+    assert cache.get('a') is None
+    cache.put('a', array)
+    cache.put('b', np.ones(1000))
+    assert cache.get('a') is array
+    assert cache.info() == {'entries': 2, 'bytes': 2 * size, 'max_bytes': 2 * size, 'hits': 1, 'misses': 1}
+    # `b` is the least recently used entry
+    cache.put('c', np.ones(1000))
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    cache.put('a', np.ones(1000))
+    assert len(cache) == 2
+    assert cache.bytes == 2 * size
+    # Too large to be cached
+    cache.put('d', np.zeros(3000))
+    assert 'd' not in cache
+    cache.resize(size)
+    assert len(cache) == 1
+    assert 'a' in cache
+    cache.resize(0)
+    assert len(cache) == 0
+    assert cache.bytes == 0
+    cache.clear()
+    assert cache.info() == {'entries': 0, 'bytes': 0, 'max_bytes': 0, 'hits': 0, 'misses': 0}
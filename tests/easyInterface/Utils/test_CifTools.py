@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from easyInterface.Utils.CifTools import CifLoop, readLoop, readWithoutLoop
+
+CIF = """data_pd
+_setup_wavelength 0.84
+
+loop_
+_phase_label
+_phase_scale
+Fe3O4 0.02381
+
+loop_
+_pd_meas_2theta
+_pd_meas_intensity
+_pd_meas_intensity_sigma
+4.0 465.8 128.97
+4.2 323.78
+ 118.22
+4.4 -307.14 1.159e2
+
+_chi2_sum True
+"""
+
+
+@pytest.fixture
+def cif_file():
+    created_files = []
+
+    def _cif_file(content: str):
+        handle, path = tempfile.mkstemp(suffix='.cif')
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        created_files.append(path)
+        return path
+
+    yield _cif_file
+
+    for file in created_files:
+        if os.path.exists(file):
+            os.remove(file)
+
+
+@pytest.mark.parametrize('chunk_size', [3, 17, 1 << 22])
+def test_readLoop(cif_file, chunk_size):
+    path = cif_file(CIF)
+    loop = readLoop(path, '_pd_meas_', chunk_size=chunk_size)
+    assert isinstance(loop, CifLoop)
+    assert loop.tags == ['_pd_meas_2theta', '_pd_meas_intensity', '_pd_meas_intensity_sigma']
+    assert len(loop) == 3
+    assert loop.block.shape == (3, 3)
+    assert loop.block.dtype == np.float64
+    assert np.array_equal(loop['_pd_meas_2theta'], [4.0, 4.2, 4.4])
+    assert np.array_equal(loop['_pd_meas_intensity'], [465.8, 323.78, -307.14])
+    assert np.array_equal(loop['_pd_meas_intensity_sigma'], [128.97, 118.22, 115.9])
+
+
+def test_readLoop_missing(cif_file):
+    assert readLoop(cif_file(CIF), '_pd_proc_') is None
+    assert readLoop(cif_file(''), '_pd_meas_') is None
+    # Values which are not plain numbers
+    assert readLoop(cif_file(CIF.replace('323.78', '?')), '_pd_meas_') is None
+    assert readLoop(cif_file(CIF.replace('323.78', '323.78(5)')), '_pd_meas_') is None
+    # Incomplete last row
+    assert readLoop(cif_file(CIF.replace(' 1.159e2', '')), '_pd_meas_') is None
+
+
+def test_readWithoutLoop(cif_file):
+    path = cif_file(CIF)
+    loop = readLoop(path, '_pd_meas_')
+    content = readWithoutLoop(path, loop)
+    assert content.startswith('data_pd\n_setup_wavelength 0.84\n')
+    assert '_pd_meas_2theta\n_pd_meas_intensity\n_pd_meas_intensity_sigma\n4.0 465.8 128.97\n' in content
+    assert '323.78' not in content
+    assert content.endswith('\n_chi2_sum True\n')
+    assert '4.0' not in readWithoutLoop(path, loop, 0)
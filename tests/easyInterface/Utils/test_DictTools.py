@@ -1,5 +1,9 @@
+from copy import deepcopy
+
+import numpy as np
 import pytest
-from easyInterface.Utils.DictTools import PathDict, UndoableDict
+from easyInterface.Utils.DictTools import PathDict, UndoableDict, UndoStack, _commandSize, _SetItemCommand, \
+    _setItemCommand
 
 
 def test_PathDict():
@@ -18,6 +22,81 @@ def test_PathDict():
         d1.dictComparison(d2)
 
 
+def test_PathDict_dictComparison():
+    shared = dict(x=[1, 2])
+    d1 = PathDict(dict(a=[1, 2, 3], b=dict(c=1.0, d=float('nan')), e='x', s=shared, y=np.arange(4.0), r=1))
+    d2 = PathDict(dict(a=[1, 5], b=dict(c=1.0 + 1e-12, d=float('nan')), e='y', s=shared, y=np.arange(4.0), f={'g': 1}))
+    k, v, t = d1.dictComparison(d2)
+    assert k == [['a', 1], ['a', 2], ['e'], ['f'], ['r']]
+    assert v == [5, (), 'y', {'g': 1}, ()]
+    assert [m.__name__ for m in t] == ['setItemByPath', 'rmItemByPath', 'setItemByPath', 'setItemByPath',
+                                       'rmItemByPath']
+    # Added values are copies
+    assert v[3] is not d2['f']
+
+    # Lists which grow are replaced, arrays which differ are replaced as a whole
+    d2 = PathDict(dict(a=[1, 2, 3, 4], b=d1['b'], e='x', s=shared, y=np.arange(4.0) + 1, r=1))
+    k, v, t = d1.dictComparison(d2)
+    assert k == [['a'], ['y']]
+    assert v[0] == [1, 2, 3, 4]
+    assert v[1] is d2['y']
+    for key, value, modifier in zip(k, v, t):
+        modifier(key, value)
+    assert d1.dictComparison(d2) == ([], [], [])
+
+    k, _, _ = d1.dictComparison(PathDict(dict(d2, e='z', r=2)), ignore={'e'})
+    assert k == [['r']]
+
+
+def test_PathDict_version():
+    d = PathDict(dict(a=1, b=PathDict(c=PathDict(d=1)), e=PathDict(f=2)))
+    version = d.version
+    assert not d.changedSince(version)
+    d.setItemByPath(['b', 'c', 'd'], 2)
+    assert d.changedSince(version)
+    assert d['b'].changedSince(version)
+    assert d['b']['c'].changedSince(version)
+    assert not d['e'].changedSince(version)
+    assert d.version == d['b']['c'].version
+
+    # Changes made through a child are seen by its ancestors
+    version = d.version
+    d['e']['f'] = 3
+    assert d['e'].changedSince(version)
+    assert d.changedSince(version)
+    assert not d['b'].changedSince(version)
+    version = d.version
+    d['b']['c']['d'] = 3
+    assert d.changedSince(version)
+    assert d['b'].changedSince(version)
+    assert not d['e'].changedSince(version)
+
+    # Copies have their own ancestors, replaced children none
+    c = deepcopy(d)
+    version = d.version
+    c['b']['c']['d'] = 4
+    assert c.changedSince(version)
+    assert not d.changedSince(version)
+    b = d['b']
+    d['b'] = PathDict(c=1)
+    version = d.version
+    b['c'] = 2
+    assert not d.changedSince(version)
+
+    u = UndoableDict(dict(a=1, b=PathDict(c=1)))
+    version = u.version
+    u.setItemByPath(['b', 'c'], 2)
+    assert u['b'].changedSince(version)
+    version = u.version
+    u.undo()
+    assert u['b']['c'] == 1
+    assert u.changedSince(version)
+    assert u['b'].changedSince(version)
+    version = u.version
+    u.rmItemByPath(['b', 'c'])
+    assert u['b'].changedSince(version)
+
+
 def test_non_nested_dict():
     d = UndoableDict()
 
@@ -194,6 +273,198 @@ def test_bulk_update():
     assert d.undoText() == "Bulk update"
     assert d.redoText() == ""
 
+
+def test_undo_stack_size():
+    d = UndoableDict(dict(a=1, b=np.zeros(1000)))
+    d.clearUndoStack()
+    d['a'] = 2
+    d['a'] = 3
+    d['b'] = np.ones(1000)
+    d['a'] = 4
+    info = d.undoStackInfo()
+    assert info['undo'] == 4
+    assert info['redo'] == 0
+    assert info['bytes'] > 2 * np.zeros(1000).nbytes
+    assert info['max_bytes'] is None
+
+    # Consecutive edits of `a` are merged, the edit of `b` in between is kept
+    d.compactUndoStack()
+    assert d.undoStackInfo()['undo'] == 3
+    d['a'] = 5
+    d['a'] = 6
+    d.compactUndoStack()
+    assert d.undoStackInfo()['undo'] == 3
+    assert d.undoText() == "Setting: a = 6"
+    d.undo()
+    assert d['a'] == 3
+    assert np.all(d['b'] == 1)
+    d.undo()
+    assert np.all(d['b'] == 0)
+    d.undo()
+    assert d['a'] == 1
+    d.redo()
+    d.redo()
+
+    # The budget drops the oldest commands, but never the last one
+    d.setUndoStackSize(0)
+    assert d.undoStackInfo()['undo'] == 1
+    assert d.undoStackInfo()['redo'] == 0
+    d['b'] = np.zeros(1000)
+    assert d.undoStackInfo()['undo'] == 1
+    d.undo()
+    assert np.all(d['b'] == 1)
+    assert not d.canUndo()
+
+
+def test_setItemWithoutUndo():
+    d = UndoableDict(dict(a=1, b=dict(c=2)))
+    d.clearUndoStack()
+    version = d.version
+    d.setItemWithoutUndo('a', 3)
+    d.setItemWithoutUndo(['b', 'c'], 4)
+    d.setItemWithoutUndo('e', 5)
+    assert d == {'a': 3, 'b': {'c': 4}, 'e': 5}
+    assert not d.canUndo()
+    assert d.changedSince(version)
+
+
+def test_undo_stack_bytes():
+    stack = UndoStack(max_history=3)
+    d = UndoableDict(dict(a=1, b=np.zeros(100)))
+
+    def counted():
+        return sum(_commandSize(command) for command in (*stack.history, *stack._future))
+
+    for value in range(5):
+        stack.push(_SetItemCommand(d, 'a', value))
+        assert stack.bytes == counted()
+    stack.push(_setItemCommand(d, 'b', np.ones(100)))
+    stack.undo()
+    stack.undo()
+    assert stack.bytes == counted()
+    stack.redo()
+    assert stack.bytes == counted()
+    stack.beginMacro('Macro')
+    stack.push(_SetItemCommand(d, 'a', 10))
+    stack.push(_SetItemCommand(d, 'a', 11))
+    stack.endMacro()
+    assert stack.bytes == counted()
+    stack.compact()
+    assert stack.bytes == counted()
+    stack.resize(0)
+    assert stack.bytes == counted() > 0
+    stack.clear()
+    assert stack.bytes == 0
+
+
+def test_undo_array_delta():
+    d = UndoableDict(dict(a=dict(x=np.zeros(1000), sites=[0.0, 0.5, 1.0, 'O'])))
+    d.clearUndoStack()
+    for i in range(10):
+        x = d['a']['x'].copy()
+        x[i] = i + 1
+        d.setItemByPath(['a', 'x'], x)
+    d.setItemByPath(['a', 'sites'], [0.0, 0.25, 1.0, 'O'])
+    assert d.undoText() == "Setting: ['a', 'sites'] (1 of 4 items changed)"
+    # Only the changed items are kept
+    assert d.undoStackInfo()['bytes'] < np.zeros(1000).nbytes
+
+    d.undo()
+    assert d['a']['sites'] == [0.0, 0.5, 1.0, 'O']
+    d.undo()
+    assert d['a']['x'][9] == 0
+    assert d['a']['x'][8] == 9
+    d.redo()
+    d.redo()
+    assert d['a']['x'][9] == 10
+    assert d['a']['sites'][1] == 0.25
+
+    d.compactUndoStack()
+    assert d.undoStackInfo()['undo'] == 2
+    d.undo()
+    d.undo()
+    assert not d['a']['x'].any()
+    d.redo()
+    assert np.all(d['a']['x'][:10] == np.arange(1, 11))
+
+    # Arrays of another shape are stored as they are
+    d.setItemByPath(['a', 'x'], np.ones(10))
+    assert d.undoText() == "Setting: ['a', 'x'] = [1. 1. 1. 1. 1. 1. 1. 1. 1. 1.]"
+    d.undo()
+    assert d['a']['x'].shape == (1000,)
+
+
+def test_bulk_update_paths():
+    d = UndoableDict(dict(a=dict(b=dict(c=1, d=2), e=[1, 2, 3]), f=PathDict(g=1)))
+    d.clearUndoStack()
+    version = d['f'].version
+    d.bulkUpdate([['a', 'b', 'c'], ['a', 'b', 'd'], ['a', 'e'], ['a', 'b', 'new'], ['f', 'g'], ['a', 'b'],
+                  ['a', 'b', 'h'], ['f', 'g']],
+                 [10, (), [1, 5, 3], 4, 2, dict(x=0), 5, 3], 'Paths')
+    assert d == {'a': {'b': {'x': 0, 'h': 5}, 'e': [1, 5, 3]}, 'f': {'g': 3}}
+    assert d['f'].changedSince(version)
+    assert d.undoStackInfo()['undo'] == 1
+    assert d.undoText() == 'Paths'
+
+    d.undo()
+    assert d == {'a': {'b': {'c': 1, 'd': 2}, 'e': [1, 2, 3]}, 'f': {'g': 1}}
+    assert d.redoText() == 'Paths'
+    d.redo()
+    assert d == {'a': {'b': {'x': 0, 'h': 5}, 'e': [1, 5, 3]}, 'f': {'g': 3}}
+
+    # Inside a running bulk update the changes become part of it
+    d.startBulkUpdate('Outer')
+    d.bulkUpdate([['a', 'e']], [[0, 0, 0]], 'Inner')
+    d['f'] = 0
+    d.endBulkUpdate()
+    assert d.undoText() == 'Outer'
+    d.undo()
+    assert d['a']['e'] == [1, 5, 3]
+    assert d['f'] == {'g': 3}
+
+    # Items holding None are set back to None, only added items are removed
+    d = UndoableDict(dict(a=dict(x=None, y=1)))
+    d.bulkUpdate([['a', 'x'], ['a', 'y'], ['a', 'z']], [5, 2, None], 'None')
+    assert d == {'a': {'x': 5, 'y': 2, 'z': None}}
+    d.undo()
+    assert d == {'a': {'x': None, 'y': 1}}
+    d.redo()
+    assert d == {'a': {'x': 5, 'y': 2, 'z': None}}
+
+
+def test_PathDict_indexPaths():
+    d = UndoableDict(dict(a=PathDict(b=PathDict(c=1, d=[1, 2])), e=dict(f=2)))
+    d.indexPaths()
+    assert d.getItemByPath(['a', 'b', 'c']) == 1
+    assert d.getItemByPath(['a', 'b', 'd', 1]) == 2
+    assert d.getItemByPath(['e', 'f']) == 2
+    assert d.getItemByPath(['a', 'x', 'c']) is None
+    assert d.getItemByPath(['a', 'b', 'x'], 'default') == 'default'
+
+    # Values are looked up live
+    d.setItemByPath(['a', 'b', 'c'], 3)
+    assert d.getItemByPath(['a', 'b', 'c']) == 3
+    d['a']['b']['d'] = [5, 6]
+    assert d.getItemByPath(['a', 'b', 'd', 1]) == 6
+
+    # Replacing or removing a dictionary on an indexed path, also below the top level
+    d['a']['b'] = PathDict(c=4)
+    assert d.getItemByPath(['a', 'b', 'c']) == 4
+    d.setItemByPath(['a'], PathDict(b=PathDict(c=5)))
+    assert d.getItemByPath(['a', 'b', 'c']) == 5
+    del d['a']['b']
+    assert d.getItemByPath(['a', 'b', 'c']) is None
+    d.undo()
+    assert d.getItemByPath(['a', 'b', 'c']) == 4
+    d.bulkUpdate([['e']], [dict(f=7)], 'Replace e')
+    assert d.getItemByPath(['e', 'f']) == 7
+    d.undo()
+    assert d.getItemByPath(['e', 'f']) == 2
+
+    d.indexPaths(False)
+    assert d.getItemByPath(['a', 'b', 'c']) == 4
+
+
 # d1 = PathDict(dict(a=1, b=2, c=dict(d=3, e=dict(f=4, g=5))))
 #   d2 = PathDict(dict(a=1, b=2, c=dict(d=333, e=dict(f=4, g=555))))
 #   print("A", d1.dictComparison(d2))
@@ -1,3 +1,4 @@
+import logging
 import os
 import pytest
 from easyInterface.Utils.Helpers import *
@@ -57,6 +58,46 @@ def test_counted():
     assert fun.calls == 2
 
 
+def test_time_it():
+    @time_it
+    def fun(value):
+        return value
+
+    name = fun.__module__ + '.' + fun.__name__
+    timer = logging.getLogger('timer.' + name)
+    level = timer.level
+    time_statistics.reset()
+    try:
+        # Disabled timer, nothing is recorded
+        timer.setLevel(logging.INFO)
+        assert fun(1) == 1
+        assert name not in time_statistics.table()
+        timer.setLevel(logging.DEBUG)
+        for value in range(10):
+            assert fun(value) == value
+    finally:
+        timer.setLevel(level)
+    row = time_statistics.table()[name]
+    assert row['count'] == 10
+    assert 0 <= row['min'] <= row['p95'] <= row['max'] <= row['total']
+    assert name in time_statistics.dump()
+    time_statistics.reset()
+    assert time_statistics.table() == {}
+
+
+def test_TimeStatistics():
+    stats = TimeStatistics(samples=100)
+    for duration in range(1, 201):
+        stats.add('fun', duration * 1000000)
+    row = stats.table()['fun']
+    assert row['count'] == 200
+    assert row['total'] == sum(range(1, 201))
+    assert row['min'] == 1
+    assert row['max'] == 200
+    # Percentiles are taken over the most recent calls
+    assert row['p95'] == pytest.approx(195.05)
+
+
 def test_createReleaseNotes():
     def writeRL(*args):
         createReleaseNotes('easyInterface/Release.json', *args)
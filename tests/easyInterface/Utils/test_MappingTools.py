@@ -0,0 +1,68 @@
+import pytest
+
+from easyInterface.Utils.MappingTools import MappedItem, MappingCache
+
+
+class Parameter:
+    def __init__(self, value):
+        self.value = value
+        self.refinement = False
+
+
+class Node:
+    def __init__(self):
+        self.params = [Parameter(1), Parameter(2)]
+        self.single = Parameter(3)
+
+
+class Root:
+    def __init__(self):
+        self._obj = Node()
+
+
+def test_MappedItem():
+    root = Root()
+    item = MappedItem('self._obj.params[1]')
+    assert not item.isExpression
+    assert item.resolve(root) is root._obj.params[1]
+    parent, getter = item.resolveParent(root)
+    assert parent is root._obj.params
+    assert getter(parent) is root._obj.params[1]
+
+    item = MappedItem('self._obj.params[-1].value')
+    assert item.resolve(root) == 2
+
+    assert MappedItem('self._obj.params[0 + 1]').isExpression
+    assert MappedItem('self').isExpression
+
+    with pytest.raises(TypeError):
+        MappedItem(None)
+
+
+def test_MappingCache():
+    root = Root()
+    cache = MappingCache(root)
+    cache.setValue('self._obj.params[0]', 10)
+    assert root._obj.params[0].value == 10
+    assert 'self._obj.params[0]' in cache
+    cache.setRefine('self._obj.single', True)
+    assert root._obj.single.refinement
+    cache.setValues(['self._obj.params[0]', 'self._obj.params[1]'], [5, 6])
+    assert [p.value for p in root._obj.params] == [5, 6]
+    assert len(cache) == 3
+
+    # Expressions fall back to evaluation
+    cache.setValue('self._obj.params[0 + 1]', 7)
+    assert root._obj.params[1].value == 7
+
+    with pytest.raises(TypeError):
+        cache.setValue('self._obj.params[5]', 1)
+    with pytest.raises(TypeError):
+        cache.setValue('self._obj.missing', 1)
+
+    # Replaced objects are only picked up after invalidation
+    root._obj = Node()
+    cache.invalidate()
+    assert len(cache) == 0
+    cache.setValue('self._obj.params[0]', 20)
+    assert root._obj.params[0].value == 20
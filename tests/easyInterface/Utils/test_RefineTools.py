@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Event, current_thread
+
+from easyInterface.Utils.RefineTools import RefinementCancelled, RefinementTask
+
+
+def test_RefinementTask():
+    future = Future()
+    event = Event()
+    task = RefinementTask(future, event)
+    done = []
+    task.addDoneCallback(done.append)
+    assert not task.done()
+    assert task.cancel()
+    assert event.is_set()
+    future.set_exception(RefinementCancelled())
+    assert task.done() and task.cancelled()
+    assert done == [task]
+    assert not task.cancel()
+
+
+def test_RefinementTask_collect():
+    future = Future()
+    collected = []
+
+    def collect(finished):
+        collected.append(current_thread())
+        return dict(finished.result(), collected=len(collected))
+
+    task = RefinementTask(future, Event(), collect)
+    future.set_result({'nit': 1})
+    assert not collected
+    # The results are collected once, in the thread asking for them
+    assert task.result() == {'nit': 1, 'collected': 1}
+    assert task.result() == {'nit': 1, 'collected': 1}
+    assert collected == [current_thread()]
+    assert not task.cancelled()
+
+
+def test_RefinementTask_await():
+    future = Future()
+    task = RefinementTask(future, Event())
+
+    async def wait():
+        future.set_result({'nit': 1})
+        return await task
+
+    assert asyncio.get_event_loop().run_until_complete(wait()) == {'nit': 1}
+    assert not task.cancelled()